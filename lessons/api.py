@@ -0,0 +1,99 @@
+"""Read-only JSON API of the schedule, invoices and balance of a student or guardian.
+
+The same data as the show_schedule, show_invoices and balance pages, for the
+mobile app. Rows are read as plain values with QuerySet.values(), selecting
+only the fields asked for, and written out as compact JSON, so no model
+instances are made. Lists are paged with the keyset pagination of the admin
+lists, and answers are gzipped for clients that accept it. Like the pages,
+an unchanged answer is 304 Not Modified (see lessons.conditional), and the
+balance is served from the balance cache."""
+
+from django.core.exceptions import BadRequest
+from django.db.models import BooleanField, CharField, Exists, ExpressionWrapper, F, OuterRef, Q, Value
+from django.db.models.functions import Concat
+from django.http import JsonResponse
+from django.utils import timezone
+from functools import wraps
+from .models import Invoice, Lesson, Transfer, User
+from .pagination import keyset_page, page_size_from
+
+
+def _schedule(user_id):
+    # Only lessons still to come, like the schedule page
+    return Lesson.objects.filter(student_id=user_id, date__gte=timezone.now()).with_totals()
+
+
+def _invoices(user_id):
+    return Invoice.objects.filter(student_id=user_id).annotate(
+        reference_number=Concat('student_id', Value('-'), 'invoice_number', output_field=CharField()),
+        amount_pending=F('total_price') - F('total_paid'),
+        paid=ExpressionWrapper(
+            Q(total_paid__gte=F('total_price')) & Exists(Transfer.objects.filter(invoice=OuterRef('pk'))),
+            output_field=BooleanField(),
+        ),
+    )
+
+
+# The rows of each listed resource, the ordering they are paged in and the fields that can be asked for
+API_LISTS = {
+    'schedule': (_schedule, ['date', 'id'], ['id', 'date', 'duration', 'topic', 'teacher', 'lesson_price', 'invoice_id']),
+    'invoices': (_invoices, ['invoice_number', 'id'], [
+        'id', 'reference_number', 'invoice_number', 'date', 'total_price', 'total_paid', 'amount_pending', 'paid',
+    ]),
+}
+
+# Fields of the invoices listed in a balance, see lessons.balance_cache
+BALANCE_INVOICE_FIELDS = ['id', 'invoice_number', 'unique_reference_number', 'amount_pending']
+
+
+def selected_fields(request, fields):
+    """Returns the fields asked for in the fields parameter of the query string, in the order asked, all if none are
+    Raises BadRequest for a field that cannot be asked for"""
+    asked = [field for field in request.GET.get('fields', '').split(',') if field]
+    unknown = [field for field in asked if field not in fields]
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(unknown)}. Fields are {", ".join(fields)}')
+    return list(dict.fromkeys(asked)) or fields
+
+
+def api_response(payload, status=200):
+    """Returns the payload as compact JSON"""
+    return JsonResponse(payload, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def list_payload(request, name, user_id):
+    """Returns the page of a listed resource asked for by the query string, as results and the cursor of the next page"""
+    rows, ordering, fields = API_LISTS[name]
+    fields = selected_fields(request, fields)
+    # The ordering fields are read as well for the cursor of the next page
+    read_fields = list(dict.fromkeys(fields + [field.lstrip('-') for field in ordering]))
+    page = keyset_page(rows(user_id).values(*read_fields), ordering, request.GET.get('cursor'), page_size_from(request))
+    results = page.items
+    if read_fields != fields:
+        results = [{field: row[field] for field in fields} for row in results]
+    return {'results': results, 'next': page.next_cursor}
+
+
+def balance_payload(request, balance):
+    """Returns the total due and the fields asked for of each invoice owed on"""
+    fields = selected_fields(request, BALANCE_INVOICE_FIELDS)
+    return {
+        'total_due': balance['total_due'],
+        'invoices': [{field: invoice[field] for field in fields} for invoice in balance['invoices']],
+    }
+
+
+def api_view(view):
+    """Answers in JSON for students and guardians only, 401 when not logged in and 403 for admins,
+    and 400 for a bad query string"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_response({'error': 'Log in to use the API'}, status=401)
+        if request.user.type not in (User.Types.STUDENT, User.Types.GUARDIAN):
+            return api_response({'error': 'The API is for students and guardians'}, status=403)
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return api_response({'error': str(error)}, status=400)
+    return wrapper
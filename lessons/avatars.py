@@ -0,0 +1,97 @@
+"""Gravatar URLs of users.
+
+A Gravatar URL is the MD5 hash of the user's email with the image size and
+default image as parameters. Users store the hash of their email when saved
+(User.email_hash), and the URLs worked out are kept per process in a bounded
+least recently used cache keyed by email and size, so pages showing a user's
+picture, on every page in the navbar and once per card in the admin lists,
+neither hash nor build a URL again. The URLs of an email are dropped from the
+cache when a user's email changes."""
+
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from libgravatar import Gravatar, md5_hash, sanitize_email
+
+DEFAULT_GRAVATAR = 'mp'
+
+
+class _HashedGravatar(Gravatar):
+    """Gravatar of an email that is already hashed"""
+
+    def __init__(self, email_hash):
+        self.email_hash = email_hash
+
+
+class GravatarCache:
+    """Least recently used cache of Gravatar URLs by (email, size), holding at most maxsize URLs"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.urls = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            url = self.urls.get(key)
+            if url is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.urls.move_to_end(key)
+            return url
+
+    def put(self, key, url):
+        with self.lock:
+            self.urls[key] = url
+            self.urls.move_to_end(key)
+            while len(self.urls) > self.maxsize:
+                self.urls.popitem(last=False)
+
+    def forget(self, email):
+        with self.lock:
+            for key in [key for key in self.urls if key[0] == email]:
+                del self.urls[key]
+
+    def clear(self):
+        with self.lock:
+            self.urls.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.urls), 'maxsize': self.maxsize}
+
+
+_cache = GravatarCache(settings.GRAVATAR_CACHE_SIZE)
+
+
+def gravatar_hash(email):
+    """Returns the hash Gravatar knows an email by"""
+    return md5_hash(sanitize_email(email))
+
+
+def gravatar_url(email, size, email_hash=''):
+    """Returns the URL of the Gravatar of an email at the given size, using the hash of the email if given"""
+    key = (email, size)
+    url = _cache.get(key)
+    if url is None:
+        url = _HashedGravatar(email_hash or gravatar_hash(email)).get_image(size=size, default=DEFAULT_GRAVATAR)
+        _cache.put(key, url)
+    return url
+
+
+def forget_gravatars(email):
+    """Drops the cached URLs of an email"""
+    _cache.forget(email)
+
+
+def gravatar_cache_info():
+    """Returns the number of URLs served from the cache and worked out afresh, how many are cached, and how many can be"""
+    return _cache.info()
+
+
+def clear_gravatar_cache():
+    _cache.clear()
@@ -0,0 +1,116 @@
+"""Cached balances of students and guardians.
+
+The balance of a client (a student or a guardian booking for themselves) is
+what they owe: the full price of the invoices they have not paid at all and
+what is pending on the invoices they have only partly paid. It is worked out
+once and kept in the BALANCE_CACHE cache until one of their lessons, invoices
+or transfers changes (see lessons.signals), so the balance pages and the
+payment approval page do not go through every transfer of the client on each
+request. Hits and misses are counted in the same cache.
+
+Balances read inside a transaction may be rolled back, so like the term
+calendar they are only reused inside that same transaction."""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .models import Student
+from .terms import transaction_key
+
+HITS_KEY = 'balance_cache_hits'
+MISSES_KEY = 'balance_cache_misses'
+
+
+def _cache():
+    return caches[settings.BALANCE_CACHE]
+
+
+def _key(client_id, transaction_state=None):
+    if transaction_state is None:
+        return f'balance_{client_id}'
+    return f'balance_{client_id}_in_' + '_'.join(str(savepoint) for savepoint in transaction_state)
+
+
+def _count(key):
+    cache = _cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Deleted in between
+            cache.add(key, 1, timeout=None)
+
+
+def _invoice_entry(invoice):
+    return {
+        'id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'unique_reference_number': invoice.unique_reference_number,
+        'amount_pending': invoice.amount_pending,
+    }
+
+
+def compute_balance(client):
+    """Returns the balance of a student or guardian as a dictionary of
+    total_due, the total they owe,
+    invoices, the number, reference and pending amount of each invoice they still owe on, by id,
+    unpaid_ids, the ids of the invoices with no transfers at all, and
+    underpaid, the amount received so far for each partly paid invoice, by id"""
+    unpaid_invoices = list(client.unpaid_invoices)
+    underpaid_invoices = client.underpaid_invoices
+
+    # An unpaid invoice is due in full, a partly paid one whatever is still pending on it
+    total_due = sum(invoice.price for invoice in unpaid_invoices) + sum(invoice.amount_pending for invoice in underpaid_invoices)
+    invoices = sorted(unpaid_invoices + list(underpaid_invoices), key=lambda invoice: invoice.id)
+    return {
+        'total_due': total_due,
+        'invoices': [_invoice_entry(invoice) for invoice in invoices],
+        'unpaid_ids': [invoice.id for invoice in unpaid_invoices],
+        'underpaid': {invoice.id: paid_amount for invoice, paid_amount in underpaid_invoices.items()},
+    }
+
+
+def get_balance(client_id):
+    """Returns the balance of the student or guardian with the given id, see compute_balance
+    Served from the cache when it has not changed since it was last worked out"""
+    cache = _cache()
+    key = _key(client_id, transaction_key())
+    balance = cache.get(key)
+    if balance is not None:
+        _count(HITS_KEY)
+        return balance
+    _count(MISSES_KEY)
+    # Guardians book lessons under their own id just like students, and both proxies work out balances the same way
+    balance = compute_balance(Student.objects.get(id=client_id))
+    cache.set(key, balance, settings.BALANCE_CACHE_TIMEOUT)
+    return balance
+
+
+def invalidate_balances(client_ids):
+    """Drops the cached balances of the given students or guardians
+    Dropped again once the current transaction commits, in case another request cached them before it did"""
+    client_ids = list(client_ids)
+    keys = [_key(client_id) for client_id in client_ids]
+    transaction_state = transaction_key()
+    if transaction_state is not None:
+        # Balances cached in the enclosing savepoints are out of date too
+        keys += [
+            _key(client_id, transaction_state[:depth])
+            for client_id in client_ids for depth in range(len(transaction_state) + 1)
+        ]
+    _cache().delete_many(keys)
+    transaction.on_commit(lambda: _cache().delete_many([_key(client_id) for client_id in client_ids]))
+
+
+def balance_cache_stats():
+    """Returns the number of balance lookups served from the cache and worked out afresh, and the share served from the cache"""
+    cache = _cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else None}
+
+
+def reset_balance_cache_stats():
+    """Forgets the hit and miss counts"""
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
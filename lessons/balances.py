@@ -0,0 +1,63 @@
+"""Aggregate balance calculations for the lessons app.
+
+Each function here annotates a queryset in SQL, so a whole page of
+balances costs a single query instead of several queries per invoice."""
+
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from .models import Invoice, Lesson, Student, Transfer
+
+
+def _sum_subquery(queryset, group_by, expression):
+    """Returns a scalar subquery summing expression over queryset, 0 if there are no rows"""
+    total = queryset.order_by().values(group_by).annotate(total=Sum(expression)).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def invoice_price_expression(invoice_ref='pk'):
+    """Price of the invoice referenced by invoice_ref, worked out from its lessons
+    A lesson costs Lesson.price_per_minute (£1) per minute, so this is the sum of the lesson durations"""
+    return _sum_subquery(Lesson.objects.filter(invoice=OuterRef(invoice_ref)), 'invoice', 'duration')
+
+
+def invoice_paid_expression(invoice_ref='pk'):
+    """Amount received for the invoice referenced by invoice_ref, worked out from its transfers"""
+    return _sum_subquery(Transfer.objects.filter(invoice=OuterRef(invoice_ref)), 'invoice', 'amount_received')
+
+
+def refresh_invoice_totals(invoice_id):
+    """Recalculates the stored total_price and total_paid of an invoice with a single UPDATE"""
+    Invoice.objects.filter(pk=invoice_id).update(
+        total_price=invoice_price_expression(),
+        total_paid=invoice_paid_expression(),
+    )
+
+
+def refresh_invoices_paid(invoice_ids):
+    """Recalculates the stored total_paid of many invoices with a single UPDATE"""
+    Invoice.objects.filter(pk__in=invoice_ids).update(total_paid=invoice_paid_expression())
+
+
+def _partial_transfers():
+    """Transfers of the outer invoice that were each smaller than its price"""
+    return Transfer.objects.filter(invoice=OuterRef('pk'), amount_received__lt=F('invoice__total_price'))
+
+
+def outstanding_expression():
+    """Amount an invoice adds to its student's balance on the admin payments page
+    An invoice without transfers counts at full price. An invoice whose partial transfers
+    still fall short of its price counts what was received, as in Student.underpaid_invoices"""
+    partially_paid = _sum_subquery(_partial_transfers(), 'invoice', 'amount_received')
+    return Case(
+        When(~Exists(Transfer.objects.filter(invoice=OuterRef('pk'))), then=F('total_price')),
+        When(Exists(_partial_transfers()) & LessThan(partially_paid, F('total_price')), then=partially_paid),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def students_with_outstanding_balance():
+    """Every student annotated with their outstanding balance, computed in one query"""
+    invoices = Invoice.objects.filter(student=OuterRef('pk'))
+    return Student.objects.annotate(outstanding_balance=_sum_subquery(invoices, 'student', outstanding_expression()))
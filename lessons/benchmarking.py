@@ -0,0 +1,221 @@
+"""Timing of the busiest views and helpers, used by the benchmark command.
+
+Every view is requested through the Django test client as the kind of user it
+is meant for, picking the student and guardian with the most invoices, and
+every helper is called directly. Each is run once to warm up, then timed over
+a number of repeats along with the SQL queries it runs. The views whose
+templates cache fragments are also timed with fragment caching off and on.
+Reports read the seeded primary database, never the reporting snapshot.
+
+The concurrency benchmark runs reader and writer threads against the database
+at the same time, each thread on its own connection, and counts the reads and
+writes each kind gets through, once for every set of SQLite pragmas compared."""
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from .balance_cache import compute_balance
+from .helpers import find_next_available_student_number, find_next_available_invoice_number_for_student, find_next_available_transfer_id,\
+    are_there_any_terms, are_all_terms_outdated, get_next_term, does_date_fall_in_an_existing_term, check_lessons_fit_in_given_dates,\
+    calculate_how_many_lessons_fit_in_given_dates, score_lesson_options
+from .instrumentation import QueryCounter, counting_queries
+from .models import User, Admin, Invoice, Student, Transfer
+import random
+import statistics
+import threading
+import time
+
+# Views timed, as (name of the view, name of its URL, kind of user requesting it)
+BENCHMARKED_VIEWS = [
+    ('all_student_balances', 'payments', User.Types.ADMIN),
+    ('balance', 'balance', User.Types.STUDENT),
+    ('guardian_balance', 'guardian_balance', User.Types.GUARDIAN),
+    ('admin_lessons', 'admin_lessons', User.Types.ADMIN),
+    ('admin_transfers', 'admin_transfers', User.Types.ADMIN),
+    ('show_schedule', 'show_schedule', User.Types.STUDENT),
+]
+
+# Views whose templates cache fragments, timed with fragment caching off and on
+FRAGMENT_CACHED_VIEWS = [
+    ('admin_lessons', 'admin_lessons', User.Types.ADMIN),
+    ('show_invoices', 'show_invoices', User.Types.STUDENT),
+    ('show_schedule', 'show_schedule', User.Types.STUDENT),
+]
+
+DAYS_OF_THE_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class BenchmarkError(Exception):
+    """Raised when something being benchmarked does not work"""
+
+
+def time_call(function, repeat):
+    """Calls the function once to warm up, then repeat more times
+    Returns the median, fastest and slowest times in milliseconds and the SQL queries run by the last call"""
+    function()
+    timings = []
+    for _ in range(repeat):
+        query_counter = QueryCounter()
+        with counting_queries(query_counter):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'queries': query_counter.queries,
+        'sql_ms': query_counter.sql_time * 1000,
+    }
+
+
+def busiest_user(user_type):
+    """Returns the user of the given type with the most invoices, the first one if none have any"""
+    busiest = (Invoice.objects.filter(student__type=user_type).values('student_id')
+               .annotate(invoice_count=Count('id')).order_by('-invoice_count', 'student_id').first())
+    if busiest:
+        return User.objects.get(id=busiest['student_id'])
+    return User.objects.filter(type=user_type).order_by('id').first()
+
+
+def benchmark_views(repeat, views=BENCHMARKED_VIEWS):
+    """Times every view in BENCHMARKED_VIEWS, or in the given list, returns the timings keyed by view name
+    Reporting views read from the primary database, which holds the seeded data, however fresh a snapshot is"""
+    with override_settings(REPORTING_FORCE_PRIMARY=True):
+        return _benchmark_views(repeat, views)
+
+
+def _benchmark_views(repeat, views):
+    users = {user_type: busiest_user(user_type) for user_type in User.Types.values}
+    client = Client()
+    results = {}
+    for view_name, url_name, user_type in views:
+        if users[user_type] is None:
+            raise BenchmarkError(f'There is no {user_type.lower()} user to request {view_name} as')
+        client.force_login(users[user_type])
+        url = reverse(url_name)
+
+        def get_view():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise BenchmarkError(f'{view_name} responded with status {response.status_code}')
+
+        results[view_name] = time_call(get_view, repeat)
+    return results
+
+
+def benchmark_fragment_caching(repeat):
+    """Times every view in FRAGMENT_CACHED_VIEWS with fragment caching turned off, then on
+    The warm up call caches the fragments, so the timed calls with caching on are cache hits"""
+    with override_settings(FRAGMENT_CACHE_TIMEOUT=0):
+        uncached = benchmark_views(repeat, FRAGMENT_CACHED_VIEWS)
+    return {'uncached': uncached, 'cached': benchmark_views(repeat, FRAGMENT_CACHED_VIEWS)}
+
+
+def benchmark_helpers(repeat):
+    """Times the helpers used when booking lessons and recording transfers, returns the timings keyed by helper name"""
+    student = busiest_user(User.Types.STUDENT)
+    term = get_next_term()
+    if student is None or term is None:
+        raise BenchmarkError('The helpers need at least one student and one term to run')
+    now = timezone.now()
+    lesson_options = [(day, interval, None) for day in DAYS_OF_THE_WEEK for interval in range(1, 5)]
+
+    helpers = {
+        'find_next_available_student_number': find_next_available_student_number,
+        'find_next_available_invoice_number_for_student': lambda: find_next_available_invoice_number_for_student(student),
+        'find_next_available_transfer_id': find_next_available_transfer_id,
+        'are_there_any_terms': are_there_any_terms,
+        'are_all_terms_outdated': are_all_terms_outdated,
+        'get_next_term': get_next_term,
+        'does_date_fall_in_an_existing_term': lambda: does_date_fall_in_an_existing_term(now),
+        'check_lessons_fit_in_given_dates': lambda: check_lessons_fit_in_given_dates(term.start_date, term.end_date, 5, 1, 'Monday'),
+        'calculate_how_many_lessons_fit_in_given_dates': lambda: calculate_how_many_lessons_fit_in_given_dates(term.start_date, term.end_date, 50, 1, 'Monday'),
+        'score_lesson_options': lambda: score_lesson_options(term, 5, lesson_options),
+    }
+    return {name: time_call(helper, repeat) for name, helper in helpers.items()}
+
+
+def _read(generator, student_ids):
+    """Reads what the busiest admin and student pages read"""
+    list(Transfer.objects.with_related().order_by('-date_received', '-id')[:50])
+    compute_balance(Student.objects.get(id=generator.choice(student_ids)))
+
+
+def _write(generator, invoice_ids, verifier):
+    """Records a payment the way approve_transaction does"""
+    with transaction.atomic():
+        Transfer.objects.create(
+            date_received=timezone.now(),
+            transfer_id=find_next_available_transfer_id(),
+            amount_received=1,
+            verifier=verifier,
+            invoice_id=generator.choice(invoice_ids),
+        )
+
+
+def _run_workers(readers, writers, seconds):
+    """Runs reader and writer threads for the given number of seconds
+    Returns the operations done and failed by each kind of thread"""
+    student_ids = list(Invoice.objects.values_list('student_id', flat=True).distinct())
+    invoice_ids = list(Invoice.objects.values_list('id', flat=True))
+    verifier = Admin.admins.first()
+    if not student_ids or verifier is None:
+        raise BenchmarkError('The concurrency benchmark needs invoices and an admin to run')
+    # Every thread opens its own connection, with the pragmas in force
+    connection.close()
+
+    counts = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(kind, operation, seed):
+        generator = random.Random(seed)
+        done = failed = 0
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    operation(generator)
+                    done += 1
+                except OperationalError:
+                    # The database stayed locked for longer than the busy timeout
+                    failed += 1
+        finally:
+            connection.close()
+        with lock:
+            counts[f'{kind}s'] += done
+            counts[f'{kind}_errors'] += failed
+
+    threads = [
+        threading.Thread(target=work, args=('read', lambda generator: _read(generator, student_ids), index))
+        for index in range(readers)
+    ] + [
+        threading.Thread(target=work, args=('write', lambda generator: _write(generator, invoice_ids, verifier), readers + index))
+        for index in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        **counts,
+        'seconds': elapsed,
+        'reads_per_second': counts['reads'] / elapsed,
+        'writes_per_second': counts['writes'] / elapsed,
+    }
+
+
+def benchmark_concurrency(pragma_sets, readers, writers, seconds):
+    """Runs readers and writers concurrently once with each named set of SQLite pragmas
+    Returns the throughput of each run keyed by the name of its pragmas"""
+    results = {}
+    for name, pragmas in pragma_sets.items():
+        with override_settings(SQLITE_PRAGMAS=pragmas, REPORTING_FORCE_PRIMARY=True):
+            results[name] = {'pragmas': pragmas, **_run_workers(readers, writers, seconds)}
+        connection.close()
+    return results
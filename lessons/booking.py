@@ -0,0 +1,185 @@
+"""Booking of lesson requests into invoices and lessons."""
+
+from collections import Counter
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .balance_cache import invalidate_balances
+from .balances import refresh_invoice_totals
+from .conditional import mark_pages_changed
+from .fragment_cache import bump_fragment_versions
+from .helpers import find_next_available_invoice_number_for_student, reserve_invoice_numbers_for_student, get_next_given_day_of_week_after_date_given,\
+    check_lessons_fit_in_given_dates, calculate_how_many_lessons_fit_in_given_dates
+from .models import Invoice, Lesson, LessonRequest
+from .occupancy import OccupancyIndex, get_occupancy_index, record_lessons
+import datetime
+import pytz
+
+
+def generate_lesson_dates(start_date, time, day, interval_between_lessons, number_of_lessons):
+    """Returns the dates of a series of lessons
+    The first lesson is on the first given day of the week from the start date, at the given time,
+    and the rest follow every interval_between_lessons weeks"""
+    #combines the start date picked and the time each day into one dateTime object
+    first_date = datetime.datetime(start_date.year,start_date.month,start_date.day,time.hour,time.minute,tzinfo=pytz.UTC)
+    first_date = get_next_given_day_of_week_after_date_given(first_date,day)
+    tdelta = datetime.timedelta(weeks=interval_between_lessons)
+    return [first_date + tdelta * i for i in range(number_of_lessons)]
+
+
+def book_lessons(student, start_date, time, day, interval_between_lessons, number_of_lessons, duration, topic, teacher, lesson_request=None):
+    """Creates an invoice and its series of lessons for a student in one transaction
+    The lessons are written with a single bulk insert and the fulfilled lesson request, if given, is deleted
+    Returns the new invoice"""
+    lesson_dates = generate_lesson_dates(start_date, time, day, interval_between_lessons, number_of_lessons)
+
+    with transaction.atomic():
+        #generate an invoice for the lessons we will generate
+        invoice = Invoice.objects.create(
+            student=student,
+            date=datetime.datetime.now(tz=pytz.UTC),
+            invoice_number=find_next_available_invoice_number_for_student(student),
+        )
+        lessons = [
+            Lesson(
+                student=student,
+                invoice=invoice,
+                date=lesson_date,
+                duration=duration,
+                topic=topic,
+                teacher=teacher
+            )
+            for lesson_date in lesson_dates
+        ]
+        Lesson.objects.bulk_create(lessons)
+        # bulk_create does not send post_save, so the stored invoice totals are refreshed
+        # and the teacher and student marked busy here
+        refresh_invoice_totals(invoice.id)
+        record_lessons(lessons)
+        mark_pages_changed([student.id])
+        bump_fragment_versions(['lessons', 'invoices'], [student.id])
+        invoice.total_price = sum(lesson.price for lesson in lessons)
+
+        if lesson_request is not None:
+            lesson_request.delete()
+
+    return invoice
+
+
+def book_lesson_requests(request_ids, term, day, time, batch_size=500):
+    """Books many lesson requests into a term, all on the same day of the week and at the same time
+    Each request keeps its own number of lessons, interval, duration, topic and teacher
+    The requests are checked against the given term and the valid ones are booked in bulk,
+    batch_size requests per transaction
+    Returns a dictionary of booked request ids to their invoices and a dictionary of failed request ids to the reason"""
+    failed = {}
+    lesson_requests = LessonRequest.objects.in_bulk(request_ids)
+    now = timezone.now()
+    start_date = max(term.start_date, now)
+
+    bookable_requests = []
+    for request_id in request_ids:
+        lesson_request = lesson_requests.get(request_id)
+        if lesson_request is None:
+            failed[request_id] = 'This lesson request does not exist'
+        elif term.end_date < now:
+            failed[request_id] = f'{term.name} is out of date! Pick an in date term'
+        elif not lesson_request.teacher:
+            failed[request_id] = 'No teacher was requested, book this request on its own'
+        elif not check_lessons_fit_in_given_dates(start_date,term.end_date,lesson_request.lessonNum,lesson_request.interval,day):
+            failed[request_id] = (f'Cannot fit {lesson_request.lessonNum} lessons every {lesson_request.interval} weeks in {term.name}!'
+                                  f' Maximum number of lessons with this interval is '
+                                  f'{calculate_how_many_lessons_fit_in_given_dates(start_date,term.end_date,lesson_request.lessonNum,lesson_request.interval,day)}')
+        else:
+            bookable_requests.append(lesson_request)
+
+    # Lessons already booked, and those placed by this call, which are only added to the shared index once booked
+    occupancy = get_occupancy_index(term)
+    placed = OccupancyIndex(term.start_date, term.end_date)
+    placements = []
+    for lesson_request in bookable_requests:
+        lesson_dates = generate_lesson_dates(start_date, time, day, lesson_request.interval, lesson_request.lessonNum)
+        clash = _first_clash(lesson_dates, lesson_request, occupancy, 'already has') \
+            or _first_clash(lesson_dates, lesson_request, placed, 'is booked by an earlier request in this batch for')
+        if clash:
+            failed[lesson_request.id] = clash
+            continue
+        for lesson_date in lesson_dates:
+            placed.add(None, lesson_request.teacher, lesson_request.author_id, lesson_date, lesson_request.duration)
+        placements.append((lesson_request, lesson_dates))
+
+    booked, booking_failed = book_placements(placements, batch_size)
+    failed.update(booking_failed)
+    return booked, failed
+
+
+def _first_clash(lesson_dates, lesson_request, occupancy, verb):
+    """Returns why the lessons of a request clash with those in the occupancy index, None if they do not"""
+    clashes = occupancy.series_clashes(lesson_dates, lesson_request.duration, lesson_request.teacher, lesson_request.author_id)
+    if not clashes:
+        return None
+    (owner, _), clash_start, clash_end = clashes[0]
+    who = lesson_request.teacher if owner == 'teacher' else 'The student'
+    return f'{who} {verb} a lesson from {clash_start:%H:%M} to {clash_end:%H:%M} on {clash_start:%Y-%m-%d}'
+
+
+def book_placements(placements, batch_size=500):
+    """Books lesson requests, each given with the dates of its lessons, in bulk, batch_size requests per transaction
+    The requests are expected to be validated already, so only a database error stops a batch being booked
+    Returns a dictionary of booked request ids to their invoices and a dictionary of failed request ids to the reason"""
+    booked = {}
+    failed = {}
+    for batch_start in range(0, len(placements), batch_size):
+        batch = placements[batch_start:batch_start + batch_size]
+        try:
+            booked.update(_book_batch(batch))
+        except DatabaseError as error:
+            for lesson_request, _ in batch:
+                failed[lesson_request.id] = f'Booking failed: {error}'
+    return booked, failed
+
+
+def _book_batch(placements):
+    """Books a batch of already validated lesson requests, each with the dates of its lessons, in one transaction
+    Returns a dictionary of request ids to their new invoices"""
+    requests_per_student = Counter(lesson_request.author_id for lesson_request, _ in placements)
+    invoice_numbers = {
+        student_id: iter(reserve_invoice_numbers_for_student(student_id, count))
+        for student_id, count in requests_per_student.items()
+    }
+    invoice_date = timezone.now()
+
+    invoices = {}
+    lessons = []
+    for lesson_request, lesson_dates in placements:
+        invoice = Invoice(
+            student_id=lesson_request.author_id,
+            date=invoice_date,
+            invoice_number=next(invoice_numbers[lesson_request.author_id]),
+        )
+        request_lessons = [
+            Lesson(
+                student_id=lesson_request.author_id,
+                invoice=invoice,
+                date=lesson_date,
+                duration=lesson_request.duration,
+                topic=lesson_request.topic,
+                teacher=lesson_request.teacher
+            )
+            for lesson_date in lesson_dates
+        ]
+        # bulk_create does not send signals, so the stored total is filled in here
+        invoice.total_price = sum(lesson.price for lesson in request_lessons)
+        invoices[lesson_request.id] = invoice
+        lessons += request_lessons
+
+    with transaction.atomic():
+        Invoice.objects.bulk_create(invoices.values())
+        Lesson.objects.bulk_create(lessons)
+        LessonRequest.objects.filter(id__in=invoices.keys()).delete()
+        # Nor does it drop the balances of the students booked for, or mark them and their teachers busy
+        invalidate_balances(requests_per_student.keys())
+        record_lessons(lessons)
+        mark_pages_changed(requests_per_student.keys())
+        bump_fragment_versions(['lessons', 'invoices', 'requests'], requests_per_student.keys())
+
+    return invoices
@@ -0,0 +1,156 @@
+"""iCalendar (.ics) feeds of the lessons of a student or a teacher.
+
+Calendar apps subscribe to a feed URL and poll it every few minutes, without
+logging in, so each feed URL holds a secret token: an HMAC of the student id
+or teacher name under the SECRET_KEY, which needs nothing stored and is only
+revoked by changing the key.
+
+A feed lists every lesson, past ones included, so calendar apps keep them.
+Lessons are read as plain values with QuerySet.iterator() and written out as
+they are read, a chunk of events at a time, and the whole feed is kept in the
+CALENDAR_FEED_CACHE cache once streamed. It is cached under the fragment
+versions of what it shows (see lessons.fragment_cache), the student for a
+student's feed and the lessons and users tables for a teacher's, so it is
+served from the cache until one of its lessons, or the name of a student,
+changes. Logging in does not move the users table on. The same versions are
+the feed's ETag, so a poll of an unchanged feed is answered 304 Not Modified
+without reading the cache or the database."""
+
+from datetime import timedelta
+from hashlib import md5
+from itertools import islice
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .fragment_cache import fragment_versions
+from .models import Lesson
+import pytz
+
+# Number of lessons read from the database, and events written out, at a time
+FEED_CHUNK_SIZE = 2000
+
+FEED_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+# What each kind of feed is of, its lessons, the fragment versions it is cached under and its calendar name
+FEED_KINDS = {
+    'student': (
+        lambda student_id: Lesson.objects.filter(student_id=student_id),
+        lambda student_id: fragment_versions([], student_id),
+        lambda student_id: 'MSMS lessons',
+    ),
+    'teacher': (
+        lambda teacher: Lesson.objects.filter(teacher=teacher),
+        lambda teacher: fragment_versions(['lessons', 'users']),
+        lambda teacher: f'MSMS lessons taught by {teacher}',
+    ),
+}
+
+LESSON_FIELDS = ['id', 'date', 'duration', 'topic', 'teacher', 'student__first_name', 'student__last_name']
+
+
+def feed_token(kind, key):
+    """Returns the secret token of the feed of the given kind of a student id or teacher name"""
+    return salted_hmac('lessons.calendar_feeds', f'{kind}:{key}').hexdigest()
+
+
+def feed_path(kind, key):
+    """Returns the path of the feed of the given kind of a student id or teacher name, token included"""
+    return reverse(f'{kind}_calendar_feed', args=[key, feed_token(kind, key)])
+
+
+def check_feed_token(kind, key, token):
+    """Raises Http404 unless the token is that of the feed"""
+    if kind not in FEED_KINDS or not constant_time_compare(feed_token(kind, key), token):
+        raise Http404
+
+
+def feed_cache():
+    return caches[settings.CALENDAR_FEED_CACHE]
+
+
+def _escape(text):
+    """Escapes text for an iCalendar property value"""
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Splits a content line into lines of at most 75 octets, as iCalendar requires, each continued by a space"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a UTF-8 character
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _ics_date(date):
+    return date.astimezone(pytz.UTC).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(lesson, stamp):
+    description = f'{lesson["teacher"]} teaching {lesson["student__first_name"]} {lesson["student__last_name"]}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:lesson-{lesson["id"]}@msms',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{_ics_date(lesson["date"])}',
+        f'DTEND:{_ics_date(lesson["date"] + timedelta(minutes=lesson["duration"]))}',
+        f'SUMMARY:{_escape(lesson["topic"])}',
+        f'DESCRIPTION:{_escape(description)}',
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+def _feed_lines(name, lessons):
+    stamp = _ics_date(timezone.now())
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//MSMS//Lessons//EN', 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_escape(name)}',
+    ])
+    for lesson in lessons:
+        yield _event(lesson, stamp)
+    yield _fold('END:VCALENDAR')
+
+
+def stream_feed(kind, key, cache_key=None):
+    """Yields the feed of the given kind of a student id or teacher name, FEED_CHUNK_SIZE events at a time
+    The whole feed is cached under the cache key once it has all been streamed"""
+    lessons = FEED_KINDS[kind][0](key).order_by('date', 'id').values(*LESSON_FIELDS).iterator(chunk_size=FEED_CHUNK_SIZE)
+    lines = _feed_lines(FEED_KINDS[kind][2](key), lessons)
+    chunks = []
+    while chunk := ''.join(islice(lines, FEED_CHUNK_SIZE)).encode():
+        chunks.append(chunk)
+        yield chunk
+    if cache_key is not None:
+        feed_cache().set(cache_key, b''.join(chunks), settings.CALENDAR_FEED_CACHE_TIMEOUT)
+
+
+def feed_response(request, kind, key):
+    """Returns the feed of the given kind of a student id or teacher name, with its versions as ETag
+    Answered 304 Not Modified if the client has the current feed, from the cache if it was streamed since it changed"""
+    versions = md5(f'{kind}:{key}:{FEED_KINDS[kind][1](key)}'.encode()).hexdigest()
+    etag = quote_etag(versions)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'calendar_feed_{versions}'
+        feed = feed_cache().get(cache_key)
+        if feed is not None:
+            response = HttpResponse(feed, content_type=FEED_CONTENT_TYPE)
+        else:
+            response = StreamingHttpResponse(stream_feed(kind, key, cache_key), content_type=FEED_CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{kind}.ics"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
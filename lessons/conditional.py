@@ -0,0 +1,69 @@
+"""Conditional GETs of the pages students and guardians poll.
+
+Every user stores when the lessons, invoices and transfers booked under them
+last changed (User.pages_changed_at), moved on by the model signals and the
+bulk writes in lessons.booking and lessons.reconciliation, and by saving the
+user themselves, whose name the pages show. The user is loaded for every
+request anyway, so the ETag and Last-Modified of their pages cost no query,
+and a page that has not changed since the copy the browser holds is answered
+304 Not Modified before the view runs any of its queries.
+
+Pages listing only what is still to come, like the lesson schedule, also
+change as time passes, so their validators move on every TIME_DEPENDENT_PERIOD
+as well, and so do the fragments of them cached by lessons.fragment_cache."""
+
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from functools import wraps
+from .models import User
+import datetime
+
+TIME_DEPENDENT_PERIOD = datetime.timedelta(minutes=15)
+
+
+def mark_pages_changed(student_ids):
+    """Records that the pages of the given students have changed"""
+    student_ids = set(student_ids)
+    if student_ids:
+        User.objects.filter(id__in=student_ids).update(pages_changed_at=timezone.now())
+
+
+def _period_start(now):
+    return now - datetime.timedelta(seconds=now.timestamp() % TIME_DEPENDENT_PERIOD.total_seconds())
+
+
+def current_period():
+    """Returns when the current TIME_DEPENDENT_PERIOD started"""
+    return _period_start(timezone.now())
+
+
+def pages_last_modified(user, time_dependent=False):
+    """Returns when the pages of a user last changed"""
+    last_modified = user.pages_changed_at
+    if time_dependent:
+        last_modified = max(last_modified, current_period())
+    return last_modified
+
+
+def pages_etag(user, time_dependent=False):
+    """Returns the ETag of the pages of a user, as it stands"""
+    return f'{user.id}-{int(pages_last_modified(user, time_dependent).timestamp() * 1_000_000)}'
+
+
+def conditional_page(time_dependent=False):
+    """Answers requests for an unchanged page of the user with 304 Not Modified, without running the view
+    Responses are marked private and to be revalidated on every use, so browsers ask with their ETag"""
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: pages_etag(request.user, time_dependent),
+            last_modified_func=lambda request, *args, **kwargs: pages_last_modified(request.user, time_dependent),
+        )(view)
+
+        @wraps(view)
+        def private_view(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return private_view
+    return decorator
@@ -0,0 +1,40 @@
+"""Tuning of SQLite connections.
+
+Every new connection to an SQLite database is given the pragmas in
+settings.SQLITE_PRAGMAS (see lessons.signals), or the PRAGMAS of its entry in
+settings.DATABASES if it has any. With the default settings
+writers append to a write-ahead log instead of locking out readers, commits
+only wait for the log to reach the disk at checkpoints, more of the database
+is cached in memory and memory mapped, and a connection finding the database
+locked waits for it rather than failing straight away."""
+
+from django.conf import settings
+
+# SQLite's own defaults, for comparing against in benchmarks
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'busy_timeout': 5000,
+}
+
+
+def apply_sqlite_pragmas(connection, pragmas):
+    """Sets each pragma on an SQLite connection, returns the value each was set to, None if it does not apply
+    In-memory databases keep their journal in memory whatever journal mode is asked for"""
+    applied = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            # Pragmas that do not apply to the database, such as mmap_size in memory, read back nothing
+            applied[name] = row[0] if row else None
+    return applied
+
+
+def tune_connection(connection):
+    """Gives a new connection the pragmas of its database, or those in settings.SQLITE_PRAGMAS, if it is to an SQLite database"""
+    if connection.vendor == 'sqlite':
+        apply_sqlite_pragmas(connection, connection.settings_dict.get('PRAGMAS', settings.SQLITE_PRAGMAS))
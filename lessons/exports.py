@@ -0,0 +1,118 @@
+"""Streaming exports of transfers, invoices and lessons as CSV or NDJSON.
+
+Rows are read as plain values with QuerySet.iterator(), a chunk at a time, and
+written out as they are read, so the memory an export takes does not grow with
+the number of rows exported. Date and term filters are applied in SQL."""
+
+from datetime import datetime, time, timedelta
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from .models import Invoice, Lesson, Transfer
+import csv
+import json
+
+# Number of rows read from the database, and written out, at a time
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _transfers():
+    return Transfer.objects.with_totals().annotate(
+        student_id=F('invoice__student_id'),
+        invoice_number=F('invoice__invoice_number'),
+    )
+
+
+def _invoices():
+    return Invoice.objects.with_totals().annotate(
+        reference_number=Concat('student_id', Value('-'), 'invoice_number', output_field=CharField()),
+        amount_pending=F('total_price') - F('total_paid'),
+    )
+
+
+def _lessons():
+    return Lesson.objects.with_totals().annotate(invoice_number=F('invoice__invoice_number'))
+
+
+# The rows of each export, the date field its date and term filters apply to and the columns exported
+EXPORTS = {
+    'transfers': (_transfers, 'date_received', [
+        'transfer_id', 'date_received', 'amount_received', 'verifier_id',
+        'student_id', 'invoice_number', 'invoice_price', 'invoice_paid',
+    ]),
+    'invoices': (_invoices, 'date', [
+        'reference_number', 'student_id', 'invoice_number', 'date', 'lesson_count', 'transfer_count',
+        'total_price', 'total_paid', 'amount_pending',
+    ]),
+    'lessons': (_lessons, 'date', [
+        'id', 'student_id', 'invoice_number', 'date', 'duration', 'topic', 'teacher', 'lesson_price',
+    ]),
+}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(kind, start=None, end=None, term=None):
+    """Returns the rows of an export as a values queryset, ordered by id
+    Only rows dated within the term and from the start date to the end date, both included, if given"""
+    rows, date_field, fields = EXPORTS[kind]
+    queryset = rows().order_by('id').values(*fields)
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': _start_of_day(start)})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lt': _start_of_day(end + timedelta(days=1))})
+    if term:
+        queryset = queryset.filter(**{f'{date_field}__gte': term.start_date, f'{date_field}__lte': term.end_date})
+    return queryset
+
+
+class _Echo:
+    """File-like object handing back what is written to it, so csv.writer formats lines without storing them"""
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Free text typed by students, such as topics and teachers, is kept as text
+        return "'" + value
+    return value
+
+
+def _csv_lines(fields, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in fields])
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(kind, export_format, start=None, end=None, term=None):
+    """Yields an export of the filtered rows of the given kind in the given format, EXPORT_CHUNK_SIZE lines at a time"""
+    rows = export_rows(kind, start, end, term).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if export_format == 'csv':
+        lines = _csv_lines(EXPORTS[kind][2], rows)
+    else:
+        lines = _ndjson_lines(rows)
+    while chunk := ''.join(islice(lines, EXPORT_CHUNK_SIZE)):
+        yield chunk
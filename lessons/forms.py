@@ -4,10 +4,14 @@ from django.utils import timezone
 from .models import User, Student, StudentProfile, LessonRequest, Lesson, Guardian, Term, Transfer
 
 from django.db.models import Max
-from .helpers import find_next_available_student_number, day_of_the_week_validator,\
+from .helpers import find_next_available_student_number, find_next_available_guardian_number, day_of_the_week_validator,\
     does_date_fall_in_an_existing_term, is_a_term_validator,does_date_fall_in_given_term,\
     get_next_term, are_all_terms_outdated, are_there_any_terms, check_lessons_fit_in_given_dates,\
     calculate_how_many_lessons_fit_in_given_dates
+from .terms import get_term_calendar
+from .booking import generate_lesson_dates
+from .occupancy import get_occupancy_index
+from .exports import EXPORT_FORMATS
 from django.contrib.admin.widgets import AdminDateWidget
 from django.forms.fields import DateTimeField
 from django.core.exceptions import ValidationError
@@ -58,8 +62,9 @@ class BookLessonRequestForm(forms.ModelForm):
             self.fields['term'].initial = "No Upcoming terms found, you need to create one first!"
 
         # Auto fill in rest of fields from lesson request
+        self.lesson_request = None
         if lesson_request_id:
-            lesson_request = LessonRequest.objects.get(id=lesson_request_id)
+            lesson_request = self.lesson_request = LessonRequest.objects.get(id=lesson_request_id)
             self.fields['duration'].initial = lesson_request.duration
             self.fields['topic'].initial = lesson_request.topic
             self.fields['teacher'].initial = lesson_request.teacher
@@ -68,14 +73,14 @@ class BookLessonRequestForm(forms.ModelForm):
 
     def clean(self):
         super().clean()
-        if Term.objects.count() == 0:
+        if not are_there_any_terms():
             self.add_error('term','You have currently created no terms. You will need to create a term before booking a lesson')
 
         if are_all_terms_outdated():
             self.add_error('term','All your terms are outdated, add some new ones')
 
         start_date = self.cleaned_data.get('start_date')
-        term_chosen = Term.objects.filter(name=self.cleaned_data.get('term')).first()
+        term_chosen = get_term_calendar().term_named(self.cleaned_data.get('term'))
         if start_date and term_chosen:
             if not does_date_fall_in_given_term(start_date,term_chosen):
                 self.add_error('start_date', f'This date does not fall in the term given! '
@@ -105,6 +110,64 @@ class BookLessonRequestForm(forms.ModelForm):
                 self.add_error('number_of_lessons', f'You cannot fit this number of lessons with the given interval in between the start and end dates!'
                                f' Maximum number of lessons with this interval and dates is {calculate_how_many_lessons_fit_in_given_dates(start_date,end_date,number_of_lessons,interval,day)}')
 
+        # Checking that neither the teacher nor the student already has a lesson at any of these times
+        time = self.cleaned_data.get('time')
+        duration = self.cleaned_data.get('duration')
+        teacher = self.cleaned_data.get('teacher')
+        if not self.errors and term_chosen and start_date and time and day and number_of_lessons and interval and duration and teacher:
+            self.check_for_clashes(term_chosen,generate_lesson_dates(start_date,time,day,interval,number_of_lessons),duration,teacher)
+
+    def check_for_clashes(self,term,lesson_dates,duration,teacher):
+        student_id = self.lesson_request.author_id if self.lesson_request else None
+        occupancy = get_occupancy_index(term)
+        clashes = occupancy.series_clashes(lesson_dates,duration,teacher,student_id)
+        if not clashes:
+            return
+        (owner, _), clash_start, clash_end = clashes[0]
+        who = teacher if owner == 'teacher' else 'The student'
+        free_times = occupancy.free_times(lesson_dates,duration,teacher,student_id)
+        suggestion = (f' Nearest free times that day: {", ".join(free_time.strftime("%H:%M") for free_time in free_times)}'
+                      if free_times else ' No time that day is free for every lesson.')
+        self.add_error('time', f'{who} already has a lesson from {clash_start:%H:%M} to {clash_end:%H:%M} on {clash_start:%Y-%m-%d}.{suggestion}')
+
+class BatchBookLessonRequestsForm(forms.Form):
+    """Form for booking many lesson requests into the same term at once"""
+    lesson_requests = forms.ModelMultipleChoiceField(
+        label="Lesson requests",
+        queryset=LessonRequest.objects.select_related('author'),
+        widget=forms.CheckboxSelectMultiple,
+    )
+    term = forms.ModelChoiceField(label="Term",queryset=Term.objects.all(),to_field_name='name')
+    day = forms.CharField(label="Day of the week",validators=[day_of_the_week_validator])
+    time = forms.TimeField(label="Time")
+
+    def __init__(self,*args,**kwargs):
+        super(BatchBookLessonRequestsForm, self).__init__(*args,**kwargs)
+        self.fields['lesson_requests'].label_from_instance = lambda lesson_request: \
+            f'{lesson_request.topic} for {lesson_request.author.full_name()}: {lesson_request.lessonNum} lessons every {lesson_request.interval} weeks'
+        if not self.is_bound:
+            self.fields['term'].initial = get_next_term()
+
+class ExportForm(forms.Form):
+    """Form for choosing the format of an export and the dates of the rows in it"""
+    format = forms.ChoiceField(choices=[(name, name) for name in EXPORT_FORMATS], initial='csv', required=False)
+    start = forms.DateField(label="From", required=False)
+    end = forms.DateField(label="To", required=False)
+    term = forms.ModelChoiceField(queryset=Term.objects.all(), to_field_name='name', required=False)
+
+    def clean(self):
+        super().clean()
+        if not self.cleaned_data.get('format'):
+            self.cleaned_data['format'] = 'csv'
+        start = self.cleaned_data.get('start')
+        end = self.cleaned_data.get('end')
+        if start and end and end < start:
+            self.add_error('end', 'End date must be after start date')
+
+class StatementUploadForm(forms.Form):
+    """Form for uploading a bank statement to reconcile against invoices"""
+    statement = forms.FileField(label="Statement CSV", help_text="Columns date, reference and amount, one line per payment received")
+
 class EditForm(forms.ModelForm):
     """Form to update lesson request"""
     class Meta:
@@ -196,10 +259,7 @@ class GuardianSignUpForm(forms.ModelForm):
 
     def save(self):
         """Create a new guardian."""
-        if Guardian.objects.last():
-            random_number = Guardian.objects.last().id + 1
-        else:
-            random_number = 1
+        random_number = find_next_available_guardian_number()
 
         super().save(commit=False)
         guardian = Guardian.objects.create_user(
@@ -0,0 +1,71 @@
+"""Versions of the data shown in cached template fragments.
+
+Fragments of the list and dashboard templates are cached with the
+versioned_cache tag (see lessons.templatetags.fragments) under keys holding
+the versions of what they show: a version per table (lessons, invoices,
+transfers, requests, users) and one per student covering everything of
+theirs. Saving or deleting a row bumps the versions it belongs to (see
+lessons.signals, and the bulk writes in lessons.booking and
+lessons.reconciliation), so the next render misses the cache and the stale
+fragments are never read again and age out.
+
+Versions start from the time they are first needed rather than from 1, so a
+version evicted from the cache never comes back as a number that stale
+fragments were cached under. Like the balances, fragments rendered inside a
+transaction are only reused inside it, and versions bumped inside one are
+bumped again once it commits, in case another request cached a fragment of
+the data from before the commit."""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .terms import transaction_key
+import time
+
+TABLES = ['lessons', 'invoices', 'transfers', 'requests', 'users']
+
+
+def fragment_cache():
+    return caches[settings.FRAGMENT_CACHE]
+
+
+def _key(scope):
+    return f'fragment_version_{scope}'
+
+
+def _student_scope(student_id):
+    return f'student_{student_id}'
+
+
+def fragment_versions(tables=(), student_id=None):
+    """Returns the versions of the given tables and of everything of the given student, as part of a cache key"""
+    scopes = list(tables) + ([_student_scope(student_id)] if student_id is not None else [])
+    cache = fragment_cache()
+    versions = cache.get_many([_key(scope) for scope in scopes])
+    for scope in scopes:
+        if _key(scope) not in versions:
+            cache.add(_key(scope), time.time_ns(), timeout=None)
+            versions[_key(scope)] = cache.get(_key(scope))
+    parts = [f'{scope}{versions[_key(scope)]}' for scope in scopes]
+    transaction_state = transaction_key()
+    if transaction_state is not None:
+        parts.append('in_' + '_'.join(str(savepoint) for savepoint in transaction_state))
+    return '.'.join(parts)
+
+
+def _bump(scopes):
+    cache = fragment_cache()
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            # Not cached yet, or evicted, so no fragment is cached under it
+            pass
+
+
+def bump_fragment_versions(tables=(), student_ids=()):
+    """Makes the cached fragments showing the given tables or anything of the given students out of date
+    Bumped again once the current transaction commits"""
+    scopes = list(tables) + [_student_scope(student_id) for student_id in set(student_ids)]
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
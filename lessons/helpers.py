@@ -1,30 +1,66 @@
-from .models import Admin, Student, User, Invoice, Transfer, Term
+from .models import Admin, Student, Guardian, User, Invoice, Transfer, Term, Sequence
+from .terms import get_term_calendar
 from django.shortcuts import redirect
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 import datetime
 
 
+def reserve_sequence_values(name, count=1, last_used_value=lambda: 0):
+    """Reserves count consecutive values of the named sequence and returns them as a range
+    The counter row is incremented before it is read, so concurrent callers never get the same values
+    A sequence is created on first use and carries on from last_used_value()"""
+    with transaction.atomic():
+        if not Sequence.objects.filter(name=name).update(value=F('value') + count):
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(name=name, value=last_used_value() + count)
+            except IntegrityError:
+                # Another request created the sequence first
+                Sequence.objects.filter(name=name).update(value=F('value') + count)
+        value = Sequence.objects.values_list('value', flat=True).get(name=name)
+    return range(value - count + 1, value + 1)
+
+def reserve_student_numbers(count):
+    """Will reserve count consecutive student numbers for new students"""
+    def last_student_number():
+        last_student = Student.students.last()
+        return last_student.id if last_student else 0
+    return reserve_sequence_values('student_number', count, last_student_number)
+
 def find_next_available_student_number():
-    """Will find the next available student number for a new student"""
-    if(Student.students.last()):
-        return Student.students.last().id + 1 
-    return 1
+    """Will reserve the next available student number for a new student"""
+    return reserve_student_numbers(1)[0]
+
+def find_next_available_guardian_number():
+    """Will reserve the next available number for a new guardian's username"""
+    def last_guardian_number():
+        last_user = Guardian.objects.last()
+        return last_user.id if last_user else 0
+    return reserve_sequence_values('guardian_number', last_used_value=last_guardian_number)[0]
+
+def reserve_invoice_numbers_for_student(student_id, count):
+    """Will reserve count consecutive invoice numbers for a given student"""
+    def last_invoice_number():
+        return Invoice.objects.filter(student_id=student_id).aggregate(Max('invoice_number'))['invoice_number__max'] or 0
+    return reserve_sequence_values(f'invoice_number_{student_id}', count, last_invoice_number)
 
 def find_next_available_invoice_number_for_student(student):
-    """Will find the next available invoice number for a given student"""
-    invoices_for_student = Invoice.objects.filter(student=student)
-    if(invoices_for_student.last()):
-        return invoices_for_student.last().invoice_number + 1
-    return 1
+    """Will reserve the next available invoice number for a given student"""
+    return reserve_invoice_numbers_for_student(student.id, 1)[0]
+
+def reserve_transfer_ids(count):
+    """Will reserve count consecutive transfer ids"""
+    def last_transfer_id():
+        return Transfer.objects.aggregate(Max('transfer_id'))['transfer_id__max'] or 0
+    return reserve_sequence_values('transfer_id', count, last_transfer_id)
 
 def find_next_available_transfer_id():
-    """Will find the next available invoice number for a given student"""
-    next_transfer_id = 1
-    if Transfer.objects.first():
-        next_transfer_id += Transfer.objects.first().transfer_id
-    return next_transfer_id
+    """Will reserve the next available transfer id"""
+    return reserve_transfer_ids(1)[0]
 
 '''decorator for preventing admins from accessing student pages'''
 def all_students(view_function):
@@ -86,24 +122,19 @@ def day_of_the_week_validator(value):
 
 def is_a_term_validator(value):
     """Validates that the input is a term existing in the database"""
-    all_terms = Term.objects.all()
-    for term in all_terms:
-        if value == term.name:
-            return
+    if get_term_calendar().term_named(value):
+        return
     validation_string = f'You need to input a valid school term!'
-    if get_next_term():
-        validation_string += f' The next upcoming/current term is: {get_next_term().name}'
+    next_term = get_next_term()
+    if next_term:
+        validation_string += f' The next upcoming/current term is: {next_term.name}'
     raise ValidationError(
         _(validation_string)
     )
 
 def does_date_fall_in_an_existing_term(date_to_check):
     """Returns true if a date falls inside an existing term, false otherwise"""
-    terms = Term.objects.all()
-    for term in terms:
-        if term.start_date <= date_to_check <= term.end_date:
-            return True
-    return False
+    return get_term_calendar().term_containing(date_to_check) is not None
 
 def does_date_fall_in_given_term(date_to_check,term):
     """Returns true if a date falls inside given term, false otherwise"""
@@ -114,72 +145,51 @@ def does_date_fall_in_given_term(date_to_check,term):
 def are_all_terms_outdated():
     """Returns true if every term is outdated, false otherwise
     Will need to run a check to make sure there are terms first"""
-    date_to_check = datetime.datetime.now().timestamp()
-    for term in Term.objects.all():
-        if term.end_date.timestamp() > date_to_check:
-            return False
-    return True
+    return get_term_calendar().all_outdated()
 
 def are_there_any_terms():
     """Returns false if there are no terms created,true otherwise"""
-    if Term.objects.count() == 0: return False
-    else : return True
+    return len(get_term_calendar()) > 0
 
 def get_next_given_day_of_week_after_date_given(date,day):
     """Takes a date and a day of the week and returns the first date after passed in date on that day
     If the date passed in is on the passed in day of the week then just return"""
     weekday_dict = {"Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3, "Friday": 4, "Saturday": 5, "Sunday": 6}
-    while date.weekday() != weekday_dict[day]:
-        tdelta = datetime.timedelta(days=1)
-        date = date + tdelta
-    return date
+    days_until_day = (weekday_dict[day] - date.weekday()) % 7
+    return date + datetime.timedelta(days=days_until_day)
 
 def get_next_term():
     """Gets the next upcoming term
     If already in a term, return the term we are currently in
     Return None if there are no terms"""
-    if Term.objects.count() == 0:
-        return None
-
-    all_terms = Term.objects.all()
-    next_term = None
-    now = datetime.datetime.now()
-
-    for term in all_terms:
-        if term.start_date.timestamp() <= now.timestamp() <= term.end_date.timestamp():
-            # We are currently in this term so return it
-            return term
-
-        time_until_term = term.start_date.timestamp() - now.timestamp()
-        if time_until_term >= 0:
-            if next_term == None or time_until_term < (next_term.start_date.timestamp() - now.timestamp()):
-                next_term = term
-
-    return next_term
+    return get_term_calendar().next_term()
 
 def check_lessons_fit_in_given_dates(start_date,end_date,number_of_lessons,interval,day_of_the_week):
     """Returns true if you can fit all the lessons between the given dates at the given interval"""
-    tdelta = datetime.timedelta(weeks=interval)
-    current_date = get_next_given_day_of_week_after_date_given(start_date,day_of_the_week)
-    # Range - 1 as we can assume a lesson is booked on the start date
-    for i in range(number_of_lessons):
-        current_date = current_date + tdelta
-        if current_date > end_date:
-            return False
-    return True
+    return calculate_how_many_lessons_fit_in_given_dates(start_date,end_date,number_of_lessons,interval,day_of_the_week) == number_of_lessons
 
 def calculate_how_many_lessons_fit_in_given_dates(start_date,end_date,number_of_lessons,interval,day_of_the_week):
-    """Returns how many lessons fit with given params"""
+    """Returns how many lessons fit with given params
+    Counts the intervals that fit between the first lesson and the end date, so it takes the same time for any number of lessons"""
     tdelta = datetime.timedelta(weeks=interval)
-    current_date = get_next_given_day_of_week_after_date_given(start_date,day_of_the_week)
-    # Range - 1 as we can assume a lesson is booked on the start date
-    counter = 0
-    for i in range(number_of_lessons):
-        current_date = current_date + tdelta
-        if current_date > end_date:
-            return counter
-        counter += 1
-    return counter
+    first_date = get_next_given_day_of_week_after_date_given(start_date,day_of_the_week)
+    if first_date > end_date:
+        return 0
+    return min(number_of_lessons, (end_date - first_date) // tdelta)
+
+def score_lesson_options(term,number_of_lessons,options):
+    """Scores many (day of the week, interval, start date) options for booking lessons in a term at once
+    A start date of None means the start of the term
+    Returns (day, interval, start date, how many lessons fit) for every option, best fitting and earliest starting first,
+    so a booking page can suggest the options that fit"""
+    scored_options = []
+    for day, interval, start_date in options:
+        start_date = start_date or term.start_date
+        lessons_that_fit = calculate_how_many_lessons_fit_in_given_dates(start_date,term.end_date,number_of_lessons,interval,day)
+        first_date = get_next_given_day_of_week_after_date_given(start_date,day)
+        scored_options.append((lessons_that_fit, first_date, (day, interval, start_date, lessons_that_fit)))
+    scored_options.sort(key=lambda scored_option: (-scored_option[0], scored_option[1]))
+    return [option for lessons_that_fit, first_date, option in scored_options]
 
 
 def redirect_user_after_login(request):
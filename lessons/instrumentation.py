@@ -0,0 +1,192 @@
+"""Per-view timing and SQL query instrumentation.
+
+PerformanceMiddleware records, per URL name, the wall time of every request, the
+number of SQL queries it ran on every database, the reporting snapshot
+included, and the time spent running them. The latest samples of each URL name
+are kept in a rolling window so percentiles can be read from the admin
+performance page or the performance_stats command.
+
+Each process keeps its own samples and regularly copies them into the
+PERFORMANCE_STATS_CACHE cache, so the page and the command can combine the
+samples of every process when that cache is shared between them."""
+
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+PROCESSES_KEY = 'performance_stats_processes'
+
+
+def percentile(values, point):
+    """Returns the nearest-rank percentile of a list of values, None if it is empty"""
+    if not values:
+        return None
+    ordered_values = sorted(values)
+    rank = max(1, -(-point * len(ordered_values) // 100))
+    return ordered_values[rank - 1]
+
+
+class ViewStats:
+    """Rolling window of the latest samples recorded for one URL name"""
+
+    def __init__(self, window, count=0, over_budget=0, samples=()):
+        self.count = count
+        self.over_budget = over_budget
+        self.samples = deque(samples, maxlen=window)
+
+    def record(self, wall_time, queries, sql_time, over_budget):
+        self.count += 1
+        self.over_budget += over_budget
+        self.samples.append((wall_time, queries, sql_time))
+
+    def merge(self, other):
+        self.count += other.count
+        self.over_budget += other.over_budget
+        self.samples.extend(other.samples)
+
+    def summary(self):
+        """Percentiles of the samples in the window, times in milliseconds"""
+        columns = {
+            'wall_time_ms': [sample[0] * 1000 for sample in self.samples],
+            'queries': [sample[1] for sample in self.samples],
+            'sql_time_ms': [sample[2] * 1000 for sample in self.samples],
+        }
+        summary = {'requests': self.count, 'over_query_budget': self.over_budget}
+        for name, values in columns.items():
+            summary[name] = {f'p{point}': percentile(values, point) for point in (50, 90, 99)}
+            summary[name]['max'] = max(values, default=None)
+        return summary
+
+
+class PerformanceRecorder:
+    """Samples recorded by this process, keyed by URL name"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.stats = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, url_name, wall_time, queries, sql_time, over_budget):
+        with self.lock:
+            if url_name not in self.stats:
+                self.stats[url_name] = ViewStats(settings.PERFORMANCE_STATS_WINDOW)
+            self.stats[url_name].record(wall_time, queries, sql_time, over_budget)
+        if time.monotonic() - self.last_flush >= settings.PERFORMANCE_STATS_FLUSH_SECONDS:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                url_name: {'count': stats.count, 'over_budget': stats.over_budget, 'samples': list(stats.samples)}
+                for url_name, stats in self.stats.items()
+            }
+
+    def flush(self):
+        """Copies the samples of this process into the shared cache"""
+        self.last_flush = time.monotonic()
+        cache = caches[settings.PERFORMANCE_STATS_CACHE]
+        process_key = f'performance_stats_{os.getpid()}'
+        cache.set(process_key, self.snapshot(), settings.PERFORMANCE_STATS_TIMEOUT)
+        process_keys = cache.get(PROCESSES_KEY, [])
+        if process_key not in process_keys:
+            cache.set(PROCESSES_KEY, process_keys + [process_key], None)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+
+recorder = PerformanceRecorder()
+
+
+def collected_stats():
+    """Combines the samples of every process that flushed to the shared cache with those of this process
+    Returns a summary per URL name"""
+    cache = caches[settings.PERFORMANCE_STATS_CACHE]
+    own_process_key = f'performance_stats_{os.getpid()}'
+    snapshots = [recorder.snapshot()]
+    for process_key, snapshot in cache.get_many(cache.get(PROCESSES_KEY, [])).items():
+        if process_key != own_process_key:
+            snapshots.append(snapshot)
+
+    combined_stats = {}
+    for snapshot in snapshots:
+        for url_name, stats in snapshot.items():
+            combined_stats.setdefault(url_name, ViewStats(None)).merge(
+                ViewStats(None, stats['count'], stats['over_budget'], stats['samples'])
+            )
+    return {url_name: stats.summary() for url_name, stats in sorted(combined_stats.items())}
+
+
+def reset_stats():
+    """Forgets the samples of this process and of every process in the shared cache"""
+    cache = caches[settings.PERFORMANCE_STATS_CACHE]
+    cache.delete_many(cache.get(PROCESSES_KEY, []))
+    cache.delete(PROCESSES_KEY)
+    recorder.reset()
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries run and the time spent running them"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+@contextmanager
+def counting_queries(query_counter):
+    """Counts the queries run inside on every database, the reporting snapshot included"""
+    with ExitStack() as stack:
+        for database in connections.all():
+            stack.enter_context(database.execute_wrapper(query_counter))
+        yield query_counter
+
+
+class PerformanceMiddleware:
+    """Times every request, counts its SQL queries and adds them as Server-Timing headers
+    Only used when settings.PERFORMANCE_INSTRUMENTATION is on"""
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_counter = QueryCounter()
+        start = time.perf_counter()
+        with counting_queries(query_counter):
+            response = self.get_response(request)
+        wall_time = time.perf_counter() - start
+
+        url_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        over_budget = query_counter.queries > settings.PERFORMANCE_QUERY_BUDGET
+        if over_budget:
+            logger.warning(
+                '%s ran %d SQL queries, over the budget of %d (%s %s)',
+                url_name, query_counter.queries, settings.PERFORMANCE_QUERY_BUDGET, request.method, request.path,
+            )
+        recorder.record(url_name, wall_time, query_counter.queries, query_counter.sql_time, over_budget)
+
+        response['Server-Timing'] = (
+            f'total;dur={wall_time * 1000:.1f}, '
+            f'db;dur={query_counter.sql_time * 1000:.1f};desc="{query_counter.queries} queries"'
+        )
+        return response
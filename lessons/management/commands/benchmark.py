@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from lessons.benchmarking import BenchmarkError, benchmark_fragment_caching, benchmark_views, benchmark_helpers
+from lessons.scale_seeding import seed_at_scale
+import json
+import subprocess
+import time
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database with the given number of students and proportional data, '
+            'then times the busiest views and helpers and writes the timings and query counts as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000, help='Number of students to seed, e.g. 1000, 10000 or 100000')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of timed calls of each view and helper')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per insert when seeding')
+        parser.add_argument('--output', default='-', help='File to write the JSON results to, - for standard output')
+
+    def handle(self, *args, **options):
+        if options['scale'] < 1 or options['repeat'] < 1:
+            raise CommandError('--scale and --repeat must be at least 1')
+
+        setup_test_environment()
+        old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seeding_start = time.perf_counter()
+            created = seed_at_scale(options['scale'], batch_size=options['batch_size'])
+            seeding_time = time.perf_counter() - seeding_start
+            results = {
+                'commit': self.current_commit(),
+                'scale': options['scale'],
+                'repeat': options['repeat'],
+                'created': created,
+                'seeding_seconds': seeding_time,
+                'views': benchmark_views(options['repeat']),
+                'helpers': benchmark_helpers(options['repeat']),
+                'fragment_caching': benchmark_fragment_caching(options['repeat']),
+            }
+        except BenchmarkError as error:
+            raise CommandError(error)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+            self.stdout.write(f'Wrote benchmark results to {options["output"]}')
+
+    def current_commit(self):
+        """Returns the hash of the checked out git commit, None outside of a git checkout"""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
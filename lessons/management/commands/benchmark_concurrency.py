@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from lessons.benchmarking import BenchmarkError, benchmark_concurrency
+from lessons.database import DEFAULT_SQLITE_PRAGMAS
+from lessons.scale_seeding import seed_at_scale
+import json
+import os
+import tempfile
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database file with the given number of students, then runs reader and writer threads '
+            'against it, first with SQLite\'s default pragmas and then with settings.SQLITE_PRAGMAS, '
+            'and writes the throughput of each as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000, help='Number of students to seed')
+        parser.add_argument('--readers', type=int, default=4, help='Number of reader threads')
+        parser.add_argument('--writers', type=int, default=2, help='Number of writer threads')
+        parser.add_argument('--seconds', type=float, default=5, help='Number of seconds each set of pragmas is run for')
+        parser.add_argument('--output', default='-', help='File to write the JSON results to, - for standard output')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The concurrency benchmark compares SQLite pragmas, so needs an SQLite database')
+        if options['scale'] < 1 or options['readers'] + options['writers'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--scale, --seconds and the number of threads must be above 0')
+
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as directory:
+            # An in-memory database has no journal to compare, so the test database is a file
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            old_test_name = test_settings.get('NAME')
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                created = seed_at_scale(options['scale'])
+                results = {
+                    'scale': options['scale'],
+                    'readers': options['readers'],
+                    'writers': options['writers'],
+                    'created': created,
+                    'runs': benchmark_concurrency(
+                        {'before': DEFAULT_SQLITE_PRAGMAS, 'after': settings.SQLITE_PRAGMAS},
+                        options['readers'], options['writers'], options['seconds'],
+                    ),
+                }
+            except BenchmarkError as error:
+                raise CommandError(error)
+            finally:
+                connection.creation.destroy_test_db(old_database_name, verbosity=0)
+                test_settings['NAME'] = old_test_name
+                teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+            self.stdout.write(f'Wrote concurrency benchmark results to {options["output"]}')
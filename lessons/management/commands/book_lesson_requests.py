@@ -0,0 +1,45 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from lessons.booking import book_lesson_requests
+from lessons.helpers import day_of_the_week_validator, get_next_term
+from lessons.models import LessonRequest, Term
+from django.core.exceptions import ValidationError
+
+
+class Command(BaseCommand):
+    help = 'Books many lesson requests into the same term, on the same day of the week and at the same time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('request_ids', nargs='*', type=int, help='Ids of the lesson requests to book')
+        parser.add_argument('--all', action='store_true', help='Book every open lesson request')
+        parser.add_argument('--term', help='Name of the term to book into, defaults to the next upcoming/current term')
+        parser.add_argument('--day', required=True, help='Day of the week for the lessons, e.g. Monday')
+        parser.add_argument('--time', required=True, help='Time of the lessons as HH:MM')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of requests booked per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            day_of_the_week_validator(options['day'])
+            time = datetime.strptime(options['time'], '%H:%M').time()
+        except (ValidationError, ValueError):
+            raise CommandError('--day must be a day of the week and --time must be of the form HH:MM')
+
+        if options['term']:
+            term = Term.objects.filter(name=options['term']).first()
+        else:
+            term = get_next_term()
+        if term is None:
+            raise CommandError('No such term, you need to create one first!')
+
+        request_ids = options['request_ids']
+        if options['all']:
+            request_ids = list(LessonRequest.objects.order_by('id').values_list('id', flat=True))
+        if not request_ids:
+            raise CommandError('Give some lesson request ids or use --all')
+
+        booked, failed = book_lesson_requests(request_ids, term, options['day'], time, batch_size=options['batch_size'])
+        for request_id, invoice in booked.items():
+            self.stdout.write(f'Booked request {request_id} as invoice {invoice.student_id}-{invoice.invoice_number}')
+        for request_id, reason in failed.items():
+            self.stdout.write(f'Could not book request {request_id}: {reason}')
+        self.stdout.write(f'Booked {len(booked)} of {len(request_ids)} lesson requests into {term.name}')
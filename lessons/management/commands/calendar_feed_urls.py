@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from lessons.calendar_feeds import feed_path
+from lessons.models import Lesson
+
+
+class Command(BaseCommand):
+    help = 'Lists the iCalendar feed of each teacher with lessons, to hand out to them, or of the given teachers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('teachers', nargs='*', help='Names of the teachers, every teacher with lessons if none are given')
+        parser.add_argument('--base-url', default='', help='Address of the site the feeds are served from, e.g. https://msms.example.org')
+
+    def handle(self, *args, **options):
+        teachers = options['teachers'] or Lesson.objects.order_by('teacher').values_list('teacher', flat=True).distinct()
+        for teacher in teachers:
+            if '/' in teacher:
+                self.stderr.write(f'{teacher}: names with a / in them cannot have a feed')
+                continue
+            self.stdout.write(f'{teacher}: {options["base_url"].rstrip("/")}{feed_path("teacher", teacher)}')
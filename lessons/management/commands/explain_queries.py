@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from lessons.query_plans import explain_hot_queries
+
+
+class Command(BaseCommand):
+    help = 'Shows the query plan of each hot query and whether it reads a whole table without an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Fail if any hot query scans a whole table')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Plans are read by the {connection.vendor} planner, full table scans are only spotted on SQLite')
+
+        scanning_queries = []
+        for name, explained in explain_hot_queries().items():
+            self.stdout.write(f'{name}:')
+            for line in explained['plan'].splitlines():
+                self.stdout.write(f'    {line}')
+            if explained['full_table_scans']:
+                scanning_queries.append(name)
+                self.stdout.write(f'    Scans a whole table: {", ".join(explained["full_table_scans"])}')
+
+        if scanning_queries and options['check']:
+            raise CommandError(f'{len(scanning_queries)} hot queries scan a whole table: {", ".join(scanning_queries)}')
+        self.stdout.write(f'{len(scanning_queries)} hot queries scan a whole table')
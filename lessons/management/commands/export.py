@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.exports import EXPORTS, EXPORT_FORMATS, stream_export
+from lessons.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = 'Streams the transfers, invoices or lessons, optionally only those dated within a term or date range, as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv', help='Format of the export')
+        parser.add_argument('--start', help='Only rows dated on or after this date, as YYYY-MM-DD')
+        parser.add_argument('--end', help='Only rows dated on or before this date, as YYYY-MM-DD')
+        parser.add_argument('--term', help='Only rows dated within the term with this name')
+        parser.add_argument('--output', default='-', help='File to write the export to, - for standard output')
+
+    def handle(self, *args, **options):
+        form = ExportForm({name: options[name] for name in ['format', 'start', 'end', 'term'] if options[name]})
+        if not form.is_valid():
+            raise CommandError('; '.join(f'{field}: {" ".join(errors)}' for field, errors in form.errors.items()))
+
+        chunks = stream_export(
+            options['kind'], form.cleaned_data['format'],
+            form.cleaned_data['start'], form.cleaned_data['end'], form.cleaned_data['term'],
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
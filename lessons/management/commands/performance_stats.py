@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from lessons.instrumentation import collected_stats, reset_stats
+import json
+
+
+class Command(BaseCommand):
+    help = 'Dumps the response time and SQL query percentiles recorded for each URL name as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Forget every recorded sample after dumping them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(collected_stats(), indent=2))
+        if options['reset']:
+            reset_stats()
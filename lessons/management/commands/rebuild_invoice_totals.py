@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+from lessons.balance_cache import invalidate_balances
+from lessons.balances import invoice_paid_expression, invoice_price_expression
+from lessons.conditional import mark_pages_changed
+from lessons.fragment_cache import bump_fragment_versions
+from lessons.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the stored total_price and total_paid of every invoice from its lessons and transfers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report invoices with incorrect totals, without fixing them')
+
+    def handle(self, *args, **options):
+        incorrect_invoices = self.incorrect_invoices()
+        incorrect_count = incorrect_invoices.count()
+        for invoice in incorrect_invoices.select_related('student'):
+            self.stdout.write(
+                f'Invoice {invoice.unique_reference_number}: stored price £{invoice.total_price} paid £{invoice.total_paid}, '
+                f'expected price £{invoice.expected_price} paid £{invoice.expected_paid}'
+            )
+
+        if options['check']:
+            if incorrect_count:
+                raise CommandError(f'{incorrect_count} invoices have incorrect totals')
+            self.stdout.write('All invoice totals are correct')
+            return
+
+        affected_students = set(incorrect_invoices.values_list('student_id', flat=True))
+        Invoice.objects.update(total_price=invoice_price_expression(), total_paid=invoice_paid_expression())
+        invalidate_balances(affected_students)
+        mark_pages_changed(affected_students)
+        bump_fragment_versions(['invoices'], affected_students)
+        if self.incorrect_invoices().exists():
+            raise CommandError('Invoice totals are still incorrect after rebuilding')
+        self.stdout.write(f'Rebuilt totals for {Invoice.objects.count()} invoices, {incorrect_count} were incorrect')
+
+    def incorrect_invoices(self):
+        return Invoice.objects.annotate(
+            expected_price=invoice_price_expression(),
+            expected_paid=invoice_paid_expression(),
+        ).filter(~Q(total_price=F('expected_price')) | ~Q(total_paid=F('expected_paid')))
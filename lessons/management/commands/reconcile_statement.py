@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.models import Admin
+from lessons.reconciliation import StatementError, reconcile_statement
+import json
+
+
+class Command(BaseCommand):
+    help = 'Creates a transfer for every line of a bank statement CSV paying an invoice and reports the lines that could not be paid in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path of the statement CSV, with date, reference and amount columns')
+        parser.add_argument('--verifier', required=True, help='Email of the admin verifying the transfers')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of statement lines reconciled per transaction')
+
+    def handle(self, *args, **options):
+        verifier = Admin.admins.filter(email=options['verifier']).first()
+        if verifier is None:
+            raise CommandError(f'No admin has the email {options["verifier"]}')
+
+        try:
+            with open(options['statement'], encoding='utf-8-sig', newline='') as statement:
+                report = reconcile_statement(statement, verifier, batch_size=options['batch_size'])
+        except (OSError, StatementError, UnicodeDecodeError) as error:
+            raise CommandError(str(error))
+
+        for category in ['unmatched', 'overpaid', 'duplicates']:
+            for line in getattr(report, category):
+                self.stdout.write(f'{category}: line {line["line"]} {line["reference"]} £{line["amount"]}: {line["detail"]}')
+        self.stdout.write(json.dumps(report.summary(), indent=2))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from lessons.reporting import ReportingError, refresh_snapshot, snapshot_path
+import time
+
+
+class Command(BaseCommand):
+    help = 'Copies the database to the snapshot the admin reports read from'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help='Keep refreshing the snapshot every this many seconds, until stopped')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        if every is not None and every <= 0:
+            raise CommandError('--every must be a positive number of seconds')
+        if every is not None and every >= settings.REPORTING_MAX_STALENESS:
+            self.stderr.write(
+                f'Refreshing every {every:g}s, reports will read from the primary database '
+                f'whenever the snapshot is older than {settings.REPORTING_MAX_STALENESS}s'
+            )
+        while True:
+            try:
+                seconds = refresh_snapshot()
+            except ReportingError as error:
+                raise CommandError(str(error))
+            self.stdout.write(f'Refreshed {snapshot_path()} in {seconds:.2f}s')
+            if every is None:
+                return
+            time.sleep(every)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.helpers import get_next_term
+from lessons.models import Term
+from lessons.scheduling import schedule_term
+
+
+class Command(BaseCommand):
+    help = 'Schedules every open lesson request into a term, picking a day and time for each that its teacher and student are free at'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', help='Name of the term to schedule into, defaults to the next upcoming/current term')
+        parser.add_argument('--dry-run', action='store_true', help='Only show where each request would go, without booking anything')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of requests booked per transaction')
+
+    def handle(self, *args, **options):
+        if options['term']:
+            term = Term.objects.filter(name=options['term']).first()
+        else:
+            term = get_next_term()
+        if term is None:
+            raise CommandError('No such term, you need to create one first!')
+
+        placements, booked, failed = schedule_term(term, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for lesson_request, lesson_dates in placements:
+            if options['dry_run'] or lesson_request.id in booked:
+                self.stdout.write(f'Request {lesson_request.id}: {len(lesson_dates)} lessons with {lesson_request.teacher} '
+                                  f'on {lesson_dates[0]:%A}s at {lesson_dates[0]:%H:%M} from {lesson_dates[0]:%Y-%m-%d}')
+        for request_id, reason in failed.items():
+            self.stdout.write(f'Could not schedule request {request_id}: {reason}')
+        scheduled = len(placements) if options['dry_run'] else len(booked)
+        self.stdout.write(f'{"Would schedule" if options["dry_run"] else "Scheduled"} {scheduled} of {scheduled + len(failed)} lesson requests into {term.name}')
@@ -1,11 +1,14 @@
 import pytz
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.db.utils import IntegrityError
 from django.utils import timezone
 from django.urls import reverse
 from faker import Faker
 from lessons.models import Student, StudentProfile, Admin, LessonRequest, Term, Guardian, Invoice, Lesson, GuardianProfile, User, Transfer
-from lessons.helpers import find_next_available_student_number, find_next_available_transfer_id, find_next_available_invoice_number_for_student, get_next_given_day_of_week_after_date_given
+from lessons.helpers import find_next_available_student_number, find_next_available_transfer_id
+from lessons.booking import book_lessons
+from lessons.scale_seeding import seed_at_scale
 from datetime import datetime, timedelta
 from django.core.management import call_command
 import pytz
@@ -32,9 +35,20 @@ class Command(BaseCommand, TestCase):
         self.faker = Faker('en_GB')
 
 
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, help='Seed this many students, with proportional guardians, requests, invoices, lessons and transfers, in bulk')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows written per insert with --scale')
+        parser.add_argument('--processes', type=int, default=1, help='Number of processes generating the rows in parallel with --scale')
+
     def handle(self, *args, **options):
         call_command('unseed')
 
+        if options.get('scale'):
+            created = seed_at_scale(options['scale'], batch_size=options['batch_size'], password=Command.PASSWORD, processes=options['processes'])
+            for model_name, count in created.items():
+                print(f'Seeded {count} {model_name}')
+            return
+
         self.seedusers()
         self.seedterms()
         default_clients = User.objects.filter(email__in=["john.doe@example.org", "alice.doe@example.org", "bob.doe@example.org"])
@@ -58,7 +72,9 @@ class Command(BaseCommand, TestCase):
                 client_children = 0
                 if self.faker.random.random() < Command.PROBABILITY_OF_CLIENT_HAVING_CHILDREN:
                     client_children = self.faker.random.randint(1, 3)
-                self._create_client(children=client_children)
+                # Savepoint so a clashing fake email only rolls back this client
+                with transaction.atomic():
+                    self._create_client(children=client_children)
             except (IntegrityError):
                 continue
             user_count += 1
@@ -90,7 +106,8 @@ class Command(BaseCommand, TestCase):
             print(f'Seeding user {lesson_count}',  end='\r')
             try:
                 # seeds 1 admin after 100 students
-                self._create_lesson()
+                with transaction.atomic():
+                    self._create_lesson()
             except (IntegrityError):
                 continue
             lesson_count += 1
@@ -98,33 +115,17 @@ class Command(BaseCommand, TestCase):
         print('Seeded ' + str(LessonRequest.objects.count()) + ' requests')
 
     def book_request(self, student, start_date, interval_between_lessons, number_of_lessons, duration, topic, teacher, day, time):
-            #combines the start date picked and the time each day into one dateTime object
-            new_date = datetime(start_date.year,start_date.month,start_date.day,time.hour,time.minute,tzinfo=pytz.UTC)
-            new_date = get_next_given_day_of_week_after_date_given(new_date,day)
-
-            #generate an invoice for the lessons we will generate
-            new_invoice_number = find_next_available_invoice_number_for_student(student)
-            invoice = Invoice.objects.create(
+            invoice = book_lessons(
                 student=student,
-                date=datetime.now(tz=pytz.UTC),
-                invoice_number=new_invoice_number,
+                start_date=start_date,
+                time=time,
+                day=day,
+                interval_between_lessons=interval_between_lessons,
+                number_of_lessons=number_of_lessons,
+                duration=duration,
+                topic=topic,
+                teacher=teacher,
             )
-            invoice.save()
-
-            #we will generate a lesson every lesson interval weeks at the time given
-            tdelta = timedelta(weeks=interval_between_lessons)
-            for i in range(number_of_lessons):
-                lesson = Lesson.objects.create(
-                    student=student,
-                    invoice=invoice,
-                    date=new_date,
-                    duration=duration,
-                    topic=topic,
-                    teacher=teacher
-                )
-                lesson.save()
-                new_date = new_date + tdelta
-            
             return Lesson.objects.filter(invoice=invoice)
     
     def seedfulfilledrequests(self):
@@ -261,7 +262,6 @@ class Command(BaseCommand, TestCase):
         
     '''uname stands for username'''
     def _create_named_client_user(self, firstname, lastname, email, uname, password, children=0):
-        studentnumber = find_next_available_student_number()
         created_client = Guardian.objects.create_user(
             first_name=firstname,
             last_name=lastname,
@@ -1,12 +1,13 @@
 from django.core.management.base import BaseCommand, CommandError
-from lessons.models import User, LessonRequest, Term, Lesson, Transfer,  Invoice
+from django.db import transaction
+from lessons.models import User, LessonRequest, Term, Invoice
 
 class Command(BaseCommand):
     def handle(self, *args, **options):
-        User.objects.filter(is_staff=False, is_superuser=False).delete()
-        LessonRequest.objects.all().delete()
-        Lesson.objects.all().delete()
-        Transfer.objects.all().delete()
-        Invoice.objects.all().delete()
-        Term.objects.filter(name__in=['Term one','Term two','Term three','Term four','Term five','Term six']).delete()
-
+        with transaction.atomic():
+            # Deleting the invoices deletes their lessons and transfers too, sending the signals that
+            # drop the cached balances, occupancy indexes and fragments of everyone they belonged to
+            Invoice.objects.all().delete()
+            LessonRequest.objects.all().delete()
+            User.objects.filter(is_staff=False, is_superuser=False).delete()
+            Term.objects.filter(name__in=['Term one','Term two','Term three','Term four','Term five','Term six']).delete()
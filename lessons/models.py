@@ -4,8 +4,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy
-from libgravatar import Gravatar
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .avatars import forget_gravatars, gravatar_hash, gravatar_url
 import pytz
 from django.utils import timezone
 
@@ -25,6 +25,16 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=50, blank=False)
     last_name = models.CharField(max_length=50, blank=False)
     email = models.EmailField(unique=True, blank=False)
+    # Hash of the email for Gravatar, filled in when the user is saved (see lessons/avatars.py)
+    email_hash = models.CharField(max_length=32, blank=True, editable=False)
+    # When the user, or the lessons, invoices or transfers booked under them, last changed (see lessons/conditional.py)
+    pages_changed_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._saved_email = user.__dict__.get('email')
+        return user
 
     def full_name(self):
         """Return the full name of the student"""
@@ -32,9 +42,7 @@ class User(AbstractUser):
 
     def gravatar(self, size=120):
         """Return a URL to the user's gravatar."""
-        gravatar_object = Gravatar(self.email)
-        gravatar_url = gravatar_object.get_image(size=size, default='mp')
-        return gravatar_url
+        return gravatar_url(self.email, size, self.email_hash)
 
     def mini_gravatar(self):
         """Return a URL to a miniature version of the user's gravatar."""
@@ -43,7 +51,20 @@ class User(AbstractUser):
     def save(self, *args, **kwargs):
         if not self.id:
             self.type = self.base_role
-        return super().save(*args, **kwargs)
+        saved_email = getattr(self, '_saved_email', None)
+        if self.email != saved_email or not self.email_hash:
+            self.email_hash = gravatar_hash(self.email)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'email' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'email_hash'}
+            if saved_email is not None:
+                forget_gravatars(saved_email)
+        self.pages_changed_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'pages_changed_at'}
+        result = super().save(*args, **kwargs)
+        self._saved_email = self.email
+        return result
 
 
 '''Student users'''
@@ -84,7 +105,8 @@ class Student(User):
 
     @property
     def underpaid_invoices(self):
-        transfer_list = self.transfers
+        # The invoices come with their transfers, ready to be shown
+        transfer_list = self.transfers.select_related('invoice').prefetch_related('invoice__transfer_set')
 
         underpaid_invoices = {}
         for transfer in transfer_list:
@@ -142,7 +164,8 @@ class Guardian(User):
 
     @property
     def underpaid_invoices(self):
-        transfer_list = self.transfers
+        # The invoices come with their transfers, ready to be shown
+        transfer_list = self.transfers.select_related('invoice').prefetch_related('invoice__transfer_set')
 
         underpaid_invoices = {}
         for transfer in transfer_list:
@@ -238,14 +261,46 @@ class LessonRequest(models.Model):
 
 
 
+def _count_of(model):
+    """Returns the number of rows of the model belonging to the outer invoice, as a subquery"""
+    counts = model.objects.filter(invoice=models.OuterRef('pk')).order_by().values('invoice').annotate(count=models.Count('id'))
+    return models.functions.Coalesce(models.Subquery(counts.values('count')), 0)
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def with_related(self):
+        """Fetches the student of each invoice in the same query and all their transfers in one more"""
+        return self.select_related('student').prefetch_related('transfer_set')
+
+    def with_totals(self):
+        """Annotates each invoice with how many lessons and transfers it has
+        Each is counted in its own subquery, as joining both would count every lesson once per transfer"""
+        return self.annotate(
+            lesson_count=_count_of(Lesson),
+            transfer_count=_count_of(Transfer),
+        )
+
+
 class Invoice(models.Model):
     """Models an invoice for a set of lessons"""
+    class Meta:
+        constraints = [
+            # Invoices are looked up by student and invoice number, ie by their unique reference number
+            models.UniqueConstraint(fields=['student', 'invoice_number'], name='unique_invoice_number_per_student'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='invoice_date_idx'),
+        ]
+
+    objects = InvoiceQuerySet.as_manager()
 
     # Invoice who student is for
+    # Not indexed on its own, the unique constraint on student and invoice number serves lookups by student
     student = models.ForeignKey(
         Student,
         on_delete = models.CASCADE,
         blank = False,
+        db_index = False,
     )
 
     # Date and time when invoice was generated
@@ -258,11 +313,23 @@ class Invoice(models.Model):
         blank = False,
     )
 
+    # Sum of the prices of the lessons, kept up to date by lessons.signals
+    total_price = models.IntegerField(
+        default = 0,
+        editable = False,
+    )
+
+    # Sum of the amounts received by transfers, kept up to date by lessons.signals
+    total_paid = models.IntegerField(
+        default = 0,
+        editable = False,
+    )
+
     # Unique reference number which can be used to identify individual invoices
     # Is of the form student_number-invoice number
     @property
     def unique_reference_number(self):
-        return f'{self.student.id}-{self.invoice_number}'
+        return f'{self.student_id}-{self.invoice_number}'
 
     @property
     def lessons(self):
@@ -273,53 +340,68 @@ class Invoice(models.Model):
     def price(self):
         """Returns the total price associated with this invoice
         Sum of the prices of the lessons"""
-        price = 0
-        for lesson in self.lessons:
-            price += lesson.price
-        return price
+        return self.total_price
         
     @property
     def paid(self):
-        transfer = self.associated_transfers
-        if transfer:
+        if self.at_least_partially_paid:
             return self.amount_paid >= self.price
         else:
             return False
     
     @property
     def at_least_partially_paid(self):
-        transfer = self.associated_transfers
-        if transfer:
-            return True
-        else:
-            return False
+        # Counted by InvoiceQuerySet.with_totals()
+        if hasattr(self, 'transfer_count'):
+            return self.transfer_count > 0
+        return self.associated_transfers.exists()
 
     @property
     def associated_transfers(self):
-        return Transfer.objects.filter(invoice=self)
+        # Served from the transfers prefetched by InvoiceQuerySet.with_related(), if any
+        return self.transfer_set.all()
 
     @property
     def amount_paid(self):
-        amount = 0
-        for transfer in Transfer.objects.filter(invoice=self):
-            amount += transfer.amount_received
-        
-        return amount
+        """Returns the total amount received by transfers for this invoice"""
+        return self.total_paid
     
     @property
     def amount_pending(self):
         return self.price - self.amount_paid
 
 
+# Cost of a lesson per minute in pounds/£
+PRICE_PER_MINUTE = 1
+
+
 def present_or_past_date(value):
     if value > timezone.now():
         raise ValidationError("The date cannot be in the future!")
     return value
 
+class TransferQuerySet(models.QuerySet):
+    def with_related(self):
+        """Fetches the invoice of each transfer and its student in the same query"""
+        return self.select_related('invoice__student')
+
+    def with_totals(self):
+        """Annotates each transfer with the total price of its invoice and the total paid towards it"""
+        return self.annotate(invoice_price=models.F('invoice__total_price'), invoice_paid=models.F('invoice__total_paid'))
+
+
 class Transfer(models.Model):
     """Models a transfer completed by a student"""
     class Meta:
         ordering = ['-date_received']
+        indexes = [
+            # Transfers of an invoice, newest first
+            models.Index(fields=['invoice', '-date_received'], name='transfer_invoice_date_idx'),
+            # Every transfer, newest first
+            models.Index(fields=['date_received'], name='transfer_date_idx'),
+        ]
+
+    objects = TransferQuerySet.as_manager()
     
     # The date and time when the transfer was received 
     date_received = models.DateTimeField(blank=False, default=timezone.now, validators=[present_or_past_date])
@@ -338,10 +420,12 @@ class Transfer(models.Model):
         blank = False,
     )
 
+    # Not indexed on its own, transfer_invoice_date_idx serves lookups by invoice
     invoice = models.ForeignKey(
         Invoice, 
         on_delete = models.CASCADE,
-        blank = False
+        blank = False,
+        db_index = False,
     )
     
     @property
@@ -349,14 +433,38 @@ class Transfer(models.Model):
         return Lesson.objects.filter(invoice=self.invoice())
 
 
+class LessonQuerySet(models.QuerySet):
+    def with_related(self):
+        """Fetches the student and invoice of each lesson in the same query"""
+        return self.select_related('student', 'invoice')
+
+    def with_totals(self):
+        """Annotates each lesson with its price and the total price of its invoice"""
+        return self.annotate(
+            lesson_price=models.F('duration') * PRICE_PER_MINUTE,
+            invoice_price=models.F('invoice__total_price'),
+        )
+
+
 class Lesson(models.Model):
     """Models a booked lesson for a student"""
+    class Meta:
+        indexes = [
+            # Schedule of a student
+            models.Index(fields=['student', 'date'], name='lesson_student_date_idx'),
+            # Every lesson in date order
+            models.Index(fields=['date'], name='lesson_date_idx'),
+        ]
+
+    objects = LessonQuerySet.as_manager()
 
     # Lesson who the student is for, Lesson can't exist without an associated student
+    # Not indexed on its own, lesson_student_date_idx serves lookups by student
     student = models.ForeignKey(
         Student,
         on_delete = models.CASCADE,
         blank = False,
+        db_index = False,
     )
 
     # Invoice lesson is part of, Lesson can't exist without an associated invoice
@@ -402,7 +510,7 @@ class Lesson(models.Model):
     @property
     def price_per_minute(self):
         """Returns the cost of this lesson per minute in pounds/£"""
-        return 1
+        return PRICE_PER_MINUTE
 
 
 class Term(models.Model):
@@ -426,11 +534,19 @@ class Term(models.Model):
     )
 
 
+class Sequence(models.Model):
+    """Models a named counter used to hand out unique numbers,
+    such as student numbers, invoice numbers and transfer ids"""
 
+    # Name of the sequence, ie 'transfer_id'
+    name = models.CharField(
+        max_length = 50,
+        unique = True,
+        blank = False,
+    )
 
-
-
-
-
-
-
+    # Last value handed out by the sequence
+    value = models.IntegerField(
+        blank = False,
+        default = 0,
+    )
@@ -0,0 +1,187 @@
+"""Occupancy of teachers and students, for catching clashing lessons.
+
+The OccupancyIndex of a term holds the lessons in it as intervals, sorted by
+start time, for every teacher and every student. A new lesson clashes with a
+booked one if it starts before that one ends and ends after it starts. No
+lesson is longer than the longest in the index, so only the lessons starting
+that long before the new one or later, up to its end, can clash, and they are
+found by binary search instead of a scan of the term.
+
+An index is loaded once per term and kept up to date as lessons are saved,
+deleted or booked in bulk (see lessons.signals and lessons.booking). Like the
+term calendar, indexes loaded inside a transaction are only reused inside it,
+and changes made inside a transaction reach the indexes shared outside it once
+it commits. Each process keeps its own indexes, reloaded every
+settings.OCCUPANCY_INDEX_MAX_AGE seconds to catch up with other processes."""
+
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db import transaction
+from .models import Lesson
+from .terms import transaction_key
+import datetime
+import time
+
+# Free times are suggested this far apart
+SLOT_STEP = datetime.timedelta(minutes=15)
+# Lessons starting this long before a term are still loaded, in case they run into it
+TERM_MARGIN = datetime.timedelta(days=1)
+
+
+def _teacher(name):
+    return ('teacher', name)
+
+
+def _student(student_id):
+    return ('student', student_id)
+
+
+class OccupancyIndex:
+    """Lessons of every teacher and student between two dates, as (start, end, lesson id) intervals sorted by start"""
+
+    def __init__(self, start_date, end_date, lessons=()):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.loaded_at = time.monotonic()
+        self.schedules = {}
+        self.lessons = {}
+        self.longest = datetime.timedelta(0)
+        for lesson_id, teacher, student_id, date, duration in lessons:
+            self.add(lesson_id, teacher, student_id, date, duration)
+
+    @classmethod
+    def for_term(cls, term):
+        """Returns the index of the lessons in a term, loaded in one query"""
+        lessons = Lesson.objects.filter(date__range=(term.start_date - TERM_MARGIN, term.end_date)) \
+            .order_by().values_list('id', 'teacher', 'student_id', 'date', 'duration')
+        return cls(term.start_date, term.end_date, lessons)
+
+    def covers(self, date):
+        return self.start_date - TERM_MARGIN <= date <= self.end_date
+
+    def add(self, lesson_id, teacher, student_id, date, duration):
+        length = datetime.timedelta(minutes=duration)
+        interval = (date, date + length, lesson_id or 0)
+        for owner in (_teacher(teacher), _student(student_id)):
+            insort(self.schedules.setdefault(owner, []), interval)
+        if lesson_id is not None:
+            self.lessons[lesson_id] = (teacher, student_id, interval)
+        self.longest = max(self.longest, length)
+
+    def remove(self, lesson_id):
+        if lesson_id not in self.lessons:
+            return
+        teacher, student_id, interval = self.lessons.pop(lesson_id)
+        for owner in (_teacher(teacher), _student(student_id)):
+            schedule = self.schedules[owner]
+            del schedule[bisect_left(schedule, interval)]
+
+    def clashes(self, date, duration, teacher=None, student_id=None):
+        """Returns who the teacher or student is, and the start and end, of each lesson clashing with the given one"""
+        end = date + datetime.timedelta(minutes=duration)
+        clashes = []
+        owners = ([_teacher(teacher)] if teacher is not None else []) + ([_student(student_id)] if student_id is not None else [])
+        for owner in owners:
+            schedule = self.schedules.get(owner, [])
+            # A 1-tuple sorts before every (start, end, id) interval starting at the same time
+            position = bisect_left(schedule, (date - self.longest,))
+            while position < len(schedule) and schedule[position][0] < end:
+                booked_start, booked_end, _ = schedule[position]
+                if booked_end > date:
+                    clashes.append((owner, booked_start, booked_end))
+                position += 1
+        return clashes
+
+    def series_clashes(self, dates, duration, teacher=None, student_id=None):
+        """Returns the clashes of every lesson in a series"""
+        return [clash for date in dates for clash in self.clashes(date, duration, teacher, student_id)]
+
+    def is_free(self, dates, duration, teacher=None, student_id=None):
+        """Returns true if no lesson of a series clashes, stopping at the first that does"""
+        return not any(self.clashes(date, duration, teacher, student_id) for date in dates)
+
+    def free_times(self, dates, duration, teacher=None, student_id=None, count=3):
+        """Returns up to count times of day, nearest to that of the series first, that every lesson of the series is free at
+        The series keeps to the same day, only moving by multiples of SLOT_STEP"""
+        first_date = dates[0]
+        free_times = []
+        for step in range(1, int(datetime.timedelta(days=1) / SLOT_STEP)):
+            for offset in (-SLOT_STEP * step, SLOT_STEP * step):
+                if (first_date + offset).date() != first_date.date():
+                    continue
+                if self.is_free([date + offset for date in dates], duration, teacher, student_id):
+                    free_times.append((first_date + offset).time())
+                    if len(free_times) == count:
+                        return free_times
+        return free_times
+
+
+# Indexes by transaction state, then by term id
+_cached_indexes = {}
+
+
+def _transaction_state():
+    """Savepoints the connection is inside, None outside any transaction
+    Atomic blocks without a savepoint cannot roll back on their own, so they are left out"""
+    key = transaction_key()
+    if key is None:
+        return None
+    return tuple(savepoint for savepoint in key if savepoint is not None)
+
+
+def _encloses(outer_state, state):
+    return outer_state is not None and state is not None and state[:len(outer_state)] == outer_state
+
+
+def _indexes_for(state):
+    # Indexes changed inside savepoints that have since ended may hold rolled back lessons
+    for stale_state in [cached_state for cached_state in _cached_indexes if cached_state is not None and not _encloses(cached_state, state)]:
+        del _cached_indexes[stale_state]
+    return _cached_indexes.setdefault(state, {})
+
+
+def get_occupancy_index(term):
+    """Returns the occupancy index of a term, loading its lessons from the database only when needed"""
+    indexes = _indexes_for(_transaction_state())
+    index = indexes.get(term.id)
+    if index is None or (index.start_date, index.end_date) != (term.start_date, term.end_date) \
+            or time.monotonic() - index.loaded_at > settings.OCCUPANCY_INDEX_MAX_AGE:
+        index = indexes[term.id] = OccupancyIndex.for_term(term)
+    return index
+
+
+def _apply(change):
+    """Applies a change to the indexes of the current transaction and the savepoints enclosing it,
+    and to the shared indexes once the transaction commits"""
+    state = _transaction_state()
+    for cached_state, indexes in list(_cached_indexes.items()):
+        if _encloses(cached_state, state):
+            for index in indexes.values():
+                change(index)
+    if state is None:
+        for index in _cached_indexes.get(None, {}).values():
+            change(index)
+    else:
+        transaction.on_commit(lambda: [change(index) for index in _cached_indexes.get(None, {}).values()])
+
+
+def record_lessons(lessons):
+    """Adds new or changed lessons to the indexes"""
+    lessons = [(lesson.id, lesson.teacher, lesson.student_id, lesson.date, lesson.duration) for lesson in lessons]
+
+    def change(index):
+        for lesson in lessons:
+            index.remove(lesson[0])
+            if index.covers(lesson[3]):
+                index.add(*lesson)
+    _apply(change)
+
+
+def forget_lesson(lesson_id):
+    """Removes a deleted lesson from the indexes"""
+    _apply(lambda index: index.remove(lesson_id))
+
+
+def invalidate_occupancy_indexes():
+    """Drops every index so the next lookup reloads the lessons"""
+    _cached_indexes.clear()
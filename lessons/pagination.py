@@ -0,0 +1,118 @@
+"""Keyset (cursor) pagination for the long admin lists.
+
+A page is the next page_size rows after the last row of the previous page in
+a stable ordering that ends in a unique field, so each page is one indexed
+range query however deep into the list it is, and rows added or removed while
+paging never shift what comes next. The position is passed between pages as
+an opaque cursor holding the ordering values of the last row shown."""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _ordering_value(item, field):
+    # Rows read with QuerySet.values() are dictionaries
+    return item[field] if isinstance(item, dict) else getattr(item, field)
+
+
+class KeysetPage:
+    """One page of rows and the cursor of the page after it, None on the last page
+    The rows are only fetched when first used, so a page rendered into a cached fragment costs no query"""
+
+    def __init__(self, queryset, ordering, page_size):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+
+    @cached_property
+    def _rows(self):
+        # One row more than the page shows whether there is a next page
+        items = list(self.queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[:self.page_size]
+            last_item = items[-1]
+            next_cursor = encode_cursor([_ordering_value(last_item, field.lstrip('-')) for field in self.ordering])
+        return items, next_cursor
+
+    @property
+    def items(self):
+        return self._rows[0]
+
+    @property
+    def next_cursor(self):
+        return self._rows[1]
+
+    @property
+    def next_query(self):
+        """Returns the query string of the next page, at the size of this one"""
+        return urlencode({'cursor': self.next_cursor, 'page_size': self.page_size})
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    """Returns an opaque cursor holding the given ordering values"""
+    return urlsafe_b64encode(json.dumps([str(value) for value in values]).encode()).decode()
+
+
+def decode_cursor(cursor, model, ordering):
+    """Returns the ordering values held in a cursor, converted back to the types of their model fields
+    Raises BadRequest if the cursor was not made for this ordering"""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [model._meta.get_field(field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)]
+    except (ValueError, TypeError, ValidationError):
+        raise BadRequest('Invalid page cursor')
+
+
+def rows_after(values, ordering):
+    """Returns a filter matching the rows that come after the given ordering values
+    For an ordering (a, b) that is a > x or (a = x and b > y), with < for descending fields"""
+    condition = None
+    for field_name, value in reversed(list(zip(ordering, values))):
+        field = field_name.lstrip('-')
+        lookup = 'lt' if field_name.startswith('-') else 'gt'
+        after = Q(**{f'{field}__{lookup}': value})
+        condition = after if condition is None else after | (Q(**{field: value}) & condition)
+    return condition
+
+
+def page_size_from(request, default=DEFAULT_PAGE_SIZE):
+    """Returns the page size asked for in the query string, between 1 and MAX_PAGE_SIZE"""
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Returns the page of the queryset after the cursor, the first page if there is no cursor
+    The ordering is a list of field names, optionally prefixed with - for descending, ending in a unique field"""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(rows_after(decode_cursor(cursor, queryset.model, ordering), ordering))
+    return KeysetPage(queryset, ordering, page_size)
+
+
+def keyset_page_from(request, queryset, ordering, default_page_size=DEFAULT_PAGE_SIZE):
+    """Returns the page of the queryset asked for by the cursor and page_size in the query string"""
+    return keyset_page(queryset, ordering, request.GET.get('cursor'), page_size_from(request, default_page_size))
@@ -0,0 +1,44 @@
+"""Query plans of the queries the busiest pages run.
+
+Each hot query is explained with the database's own planner (EXPLAIN QUERY PLAN
+on SQLite), and a query whose plan scans a whole table without an index is
+flagged, so a missing or unused index shows up before the table grows."""
+
+from django.utils import timezone
+from .exports import export_rows
+from .models import User, GuardianProfile, Invoice, Lesson, Transfer
+from .pagination import DEFAULT_PAGE_SIZE
+
+
+def _hot_queries():
+    """Returns each hot query by the page or helper that runs it
+    The ids looked up only need to be of the right type, the plans do not depend on them"""
+    now = timezone.now()
+    return {
+        'log in by email': User.objects.filter(email='johndoe@example.org'),
+        'show_schedule': Lesson.objects.filter(student_id=1, date__gte=now).with_related(),
+        'show_invoices': Invoice.objects.filter(student=1).with_totals(),
+        'approve_transaction invoice': Invoice.objects.filter(student_id=1, invoice_number=1),
+        'reconcile_statement invoices': Invoice.objects.filter(student_id__in=[1, 2], invoice_number__in=[1, 2]),
+        'transfers of an invoice': Transfer.objects.filter(invoice_id=1).order_by('-date_received'),
+        'student transfers': Transfer.objects.filter(invoice__student_id=1).with_related(),
+        'admin_transfers page': Transfer.objects.with_related().order_by('-date_received', '-id')[:DEFAULT_PAGE_SIZE + 1],
+        'admin_lessons page': Lesson.objects.with_related().order_by('date', 'id')[:DEFAULT_PAGE_SIZE + 1],
+        'guardian student by email': GuardianProfile.objects.filter(student_email='johndoe@example.org'),
+        'export transfers of a month': export_rows('transfers', start=now.date().replace(day=1), end=now.date()),
+    }
+
+
+def full_table_scans(plan):
+    """Returns the steps of a query plan that read every row of a table without an index"""
+    steps = [line.split(' ', 3)[-1] for line in plan.splitlines()]
+    return [step for step in steps if step.startswith('SCAN ') and ' USING ' not in step]
+
+
+def explain_hot_queries():
+    """Returns the query plan of each hot query, and the steps of it scanning a whole table"""
+    plans = {}
+    for name, queryset in _hot_queries().items():
+        plan = queryset.explain()
+        plans[name] = {'plan': plan, 'full_table_scans': full_table_scans(plan)}
+    return plans
@@ -0,0 +1,173 @@
+"""Reconciliation of bank statements against invoices.
+
+A statement is a CSV file with date, reference and amount columns, one line per
+payment received, the reference being the unique reference number of the
+invoice paid (<student id>-<invoice number>). The statement is read a batch of
+lines at a time. The invoices of a whole batch are looked up in one query, and
+the transfers of the matched lines are created in bulk, in one transaction.
+Every line that is not turned into a transfer, or that pays more than its
+invoice is due, goes in the report."""
+
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from .balance_cache import invalidate_balances
+from .balances import refresh_invoices_paid
+from .conditional import mark_pages_changed
+from .fragment_cache import bump_fragment_versions
+from .helpers import reserve_transfer_ids
+from .models import Invoice, Transfer
+import csv
+
+STATEMENT_COLUMNS = ['date', 'reference', 'amount']
+STATEMENT_DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+
+
+class StatementError(Exception):
+    """Raised when a statement cannot be read at all"""
+
+
+class ReconciliationReport:
+    """Outcome of reconciling a statement
+    Each reported line is a dictionary of its line number, date, reference and amount, and a detail saying why it is reported"""
+
+    def __init__(self):
+        self.transfers_created = 0
+        self.amount_received = 0
+        self.unmatched = []
+        self.overpaid = []
+        self.duplicates = []
+
+    def report(self, category, line, detail):
+        getattr(self, category).append({**line, 'detail': detail})
+
+    def summary(self):
+        return {
+            'transfers_created': self.transfers_created,
+            'amount_received': self.amount_received,
+            'unmatched': len(self.unmatched),
+            'overpaid': len(self.overpaid),
+            'duplicates': len(self.duplicates),
+        }
+
+
+def _parse_date(value):
+    for date_format in STATEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'{value!r} is not a date')
+
+
+def _parse_amount(value):
+    try:
+        amount = Decimal(value.strip().lstrip('£'))
+    except InvalidOperation:
+        raise ValueError(f'{value!r} is not an amount')
+    if amount != amount.to_integral_value():
+        raise ValueError('Amounts are in whole pounds')
+    if amount <= 0:
+        raise ValueError('Not a payment received')
+    return int(amount)
+
+
+def _parse_reference(value):
+    """Returns the student id and invoice number of a unique reference number"""
+    student_id, separator, invoice_number = value.strip().partition('-')
+    if not separator or not student_id.isdigit() or not invoice_number.isdigit():
+        raise ValueError(f'{value!r} is not an invoice reference')
+    return int(student_id), int(invoice_number)
+
+
+def read_statement(statement):
+    """Yields the lines of a statement CSV, read from an iterable of text lines, as dictionaries
+    Raises StatementError if the statement does not have the date, reference and amount columns"""
+    reader = csv.DictReader(statement)
+    missing_columns = set(STATEMENT_COLUMNS) - set(reader.fieldnames or [])
+    if missing_columns:
+        raise StatementError(f'The statement has no {", ".join(sorted(missing_columns))} column')
+    for row in reader:
+        yield {'line': reader.line_num, **{column: (row[column] or '').strip() for column in STATEMENT_COLUMNS}}
+
+
+def reconcile_statement(statement, verifier, batch_size=1000):
+    """Creates a transfer, verified by the given admin, for each line of a statement paying an invoice
+    Lines that match no invoice, or that repeat an earlier line or transfer paying the same amount towards the same invoice
+    on the same day, are skipped. Lines taking an invoice over its price are still paid in and reported
+    Returns a ReconciliationReport"""
+    report = ReconciliationReport()
+    lines = read_statement(statement)
+    while batch := list(islice(lines, batch_size)):
+        _reconcile_batch(batch, verifier, report)
+    return report
+
+
+def _reconcile_batch(batch, verifier, report):
+    parsed_lines = []
+    for line in batch:
+        try:
+            parsed_lines.append((line, _parse_reference(line['reference']), _parse_date(line['date']), _parse_amount(line['amount'])))
+        except ValueError as error:
+            report.report('unmatched', line, str(error))
+
+    # One lookup for the invoices of the whole batch, narrowed down to the exact references here
+    references = {reference for _, reference, _, _ in parsed_lines}
+    invoices = {
+        (invoice.student_id, invoice.invoice_number): invoice
+        for invoice in Invoice.objects.filter(
+            student_id__in={student_id for student_id, _ in references},
+            invoice_number__in={invoice_number for _, invoice_number in references},
+        )
+        if (invoice.student_id, invoice.invoice_number) in references
+    }
+    already_received = {
+        (invoice_id, timezone.localtime(date_received).date(), amount_received)
+        for invoice_id, date_received, amount_received in Transfer.objects.filter(invoice__in=invoices.values())
+            .order_by().values_list('invoice_id', 'date_received', 'amount_received')
+    }
+
+    transfers = []
+    paid = {invoice.id: invoice.total_paid for invoice in invoices.values()}
+    today = timezone.localdate()
+    for line, reference, date, amount in parsed_lines:
+        invoice = invoices.get(reference)
+        if invoice is None:
+            report.report('unmatched', line, 'No invoice has this reference')
+            continue
+        if date > today:
+            report.report('unmatched', line, 'The payment is dated in the future')
+            continue
+        payment = (invoice.id, date, amount)
+        if payment in already_received:
+            report.report('duplicates', line, f'£{amount} was already received for invoice {line["reference"]} on {date}')
+            continue
+        already_received.add(payment)
+
+        paid[invoice.id] += amount
+        if paid[invoice.id] > invoice.total_price:
+            report.report('overpaid', line, f'Invoice {line["reference"]} is overpaid by £{paid[invoice.id] - invoice.total_price}')
+        transfers.append(Transfer(
+            invoice=invoice,
+            date_received=timezone.make_aware(datetime.combine(date, time.min)),
+            amount_received=amount,
+            verifier=verifier,
+        ))
+
+    if not transfers:
+        return
+    with transaction.atomic():
+        for transfer, transfer_id in zip(transfers, reserve_transfer_ids(len(transfers))):
+            transfer.transfer_id = transfer_id
+        Transfer.objects.bulk_create(transfers)
+        # bulk_create does not send post_save, so the stored invoice totals are refreshed
+        # and the balances of the students paying dropped here
+        refresh_invoices_paid({transfer.invoice_id for transfer in transfers})
+        student_ids = {transfer.invoice.student_id for transfer in transfers}
+        invalidate_balances(student_ids)
+        mark_pages_changed(student_ids)
+        bump_fragment_versions(['transfers', 'invoices'], student_ids)
+    report.transfers_created += len(transfers)
+    report.amount_received += sum(transfer.amount_received for transfer in transfers)
@@ -0,0 +1,127 @@
+"""Reporting snapshot of the database.
+
+The heavy admin reports, such as the balances of every student and the total
+of every transfer, read from a copy of the database instead of the primary one,
+so they do not hold up the bookings and payments being written to it. The copy
+is taken with SQLite's online backup API by refresh_snapshot(), run every so
+often by the refresh_reporting_snapshot command.
+
+Views marked with reporting_view read from the snapshot through
+ReportingRouter as long as it is no older than settings.REPORTING_MAX_STALENESS
+seconds, and from the primary database when it is older, missing, or when
+settings.REPORTING_FORCE_PRIMARY is set. Writes always go to the primary."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+import os
+import sqlite3
+import time
+
+REPORTING_DATABASE = 'reporting'
+
+# Database the reads of the current request go to, None for the primary
+_read_database = ContextVar('read_database', default=None)
+
+
+class ReportingError(Exception):
+    """Raised when the reporting snapshot cannot be taken"""
+
+
+def snapshot_path():
+    return str(connections[REPORTING_DATABASE].settings_dict['NAME'])
+
+
+def snapshot_age():
+    """Returns the number of seconds since the snapshot was taken, None if there is no snapshot"""
+    try:
+        return max(0.0, time.time() - os.path.getmtime(snapshot_path()))
+    except OSError:
+        return None
+
+
+def snapshot_is_fresh():
+    """Returns true if reports may read from the snapshot"""
+    if settings.REPORTING_FORCE_PRIMARY:
+        return False
+    age = snapshot_age()
+    return age is not None and age <= settings.REPORTING_MAX_STALENESS
+
+
+@contextmanager
+def reporting_reads():
+    """Sends the reads inside to the snapshot, if it is fresh enough"""
+    token = _read_database.set(REPORTING_DATABASE if snapshot_is_fresh() else None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Sends the reads inside to the primary database, even within reporting_reads"""
+    token = _read_database.set(None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+def reporting_view(view_function):
+    """Decorator for read-only report views, making them read from the snapshot when it is fresh enough"""
+    @wraps(view_function)
+    def wrapper(request, *args, **kwargs):
+        with reporting_reads():
+            return view_function(request, *args, **kwargs)
+    return wrapper
+
+
+class ReportingRouter:
+    """Routes the reads of reporting views to the snapshot and everything else to the primary database"""
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The snapshot holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The snapshot gets its tables from the primary when it is taken
+        return db != REPORTING_DATABASE
+
+
+def refresh_snapshot():
+    """Copies the primary database to the snapshot with SQLite's online backup API
+    The copy is written next to the snapshot and moved over it once complete, so reports never see half a copy,
+    and in rollback journal mode, so reports reading the old snapshot share no files with the new one
+    Returns the number of seconds the copy took"""
+    primary = connections[DEFAULT_DB_ALIAS]
+    path = snapshot_path()
+    if primary.vendor != 'sqlite':
+        raise ReportingError('The reporting snapshot is taken with the SQLite backup API, so needs an SQLite primary database')
+    if path == str(primary.settings_dict['NAME']):
+        raise ReportingError('The reporting database is the primary database, there is nothing to copy it to')
+    if primary.in_atomic_block:
+        raise ReportingError('The reporting snapshot cannot be taken inside a transaction, it would copy changes that may be rolled back')
+
+    start = time.perf_counter()
+    copy_path = f'{path}.copying'
+    primary.ensure_connection()
+    copy = sqlite3.connect(copy_path)
+    try:
+        primary.connection.backup(copy)
+        copy.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        copy.close()
+    os.replace(copy_path, path)
+    # This thread's connection still has the old snapshot open, others are reopened with each request
+    # as the reporting database never has persistent connections (CONN_MAX_AGE is 0)
+    connections[REPORTING_DATABASE].close()
+    return time.perf_counter() - start
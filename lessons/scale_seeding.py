@@ -0,0 +1,274 @@
+"""Bulk seeding of a database at a chosen scale.
+
+Every row is generated in memory and written with bulk_create in batches, so
+seeding takes a number of queries proportional to the number of batches rather
+than the number of rows. Passwords are hashed once and the hash is shared by
+every seeded user.
+
+Rows are generated in chunks of CHUNK_SIZE clients, each chunk from its own
+random seed, so the chunks can be generated in parallel worker processes and
+the same random seed always generates the same rows, dated relative to today,
+whatever the number of processes. Only the main process touches the database."""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from .avatars import gravatar_hash
+from .booking import generate_lesson_dates
+from .helpers import reserve_student_numbers, reserve_transfer_ids
+from .models import User, Student, StudentProfile, Guardian, GuardianProfile, Admin, LessonRequest, Invoice, Lesson, Transfer, Term
+import random
+
+DAYS_OF_THE_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Number of clients whose rows are generated together
+CHUNK_SIZE = 1000
+
+# Proportions of the generated data, for every student
+GUARDIANS_PER_STUDENT = 0.1
+LESSON_REQUESTS_PER_STUDENT = 0.3
+MAX_INVOICES_PER_CLIENT = 4
+MAX_LESSONS_PER_INVOICE = 5
+
+# Chances of an invoice being paid in each way, as in the seed command
+OVERPAID_PROBABILITY = 0.2
+UNDERPAID_PROBABILITY = 0.3
+UNPAID_PROBABILITY = 0.5
+
+
+def seed_at_scale(students, batch_size=1000, random_seed=0, password='Password123', processes=1):
+    """Seeds the given number of students with proportional guardians, lesson requests, invoices, lessons and transfers
+    Along with six terms around today and the admin Petra Pickles verifying the transfers
+    Rows are generated in the given number of processes
+    Returns the number of rows created for each model"""
+    password_hash = make_password(password)
+    now = timezone.now()
+    guardian_count = max(1, round(students * GUARDIANS_PER_STUDENT))
+
+    with _chunk_mapper(processes) as map_chunks:
+        student_chunks = _chunks(students)
+        guardian_chunks = _chunks(guardian_count)
+        student_fields = _flatten(map_chunks(
+            _generate_users,
+            ['student'] * len(student_chunks),
+            student_chunks,
+            [f'{random_seed}-students-{chunk.start}' for chunk in student_chunks],
+        ))
+        guardian_fields = _flatten(map_chunks(
+            _generate_users,
+            ['guardian'] * len(guardian_chunks),
+            guardian_chunks,
+            [f'{random_seed}-guardians-{chunk.start}' for chunk in guardian_chunks],
+        ))
+
+        with transaction.atomic():
+            terms = _seed_terms(now)
+            admin = Admin(
+                type=User.Types.ADMIN, first_name='Petra', last_name='Pickles',
+                email='petra.pickles@example.org', email_hash=gravatar_hash('petra.pickles@example.org'),
+                username='@PetraPickles', password=password_hash,
+            )
+            Admin.objects.bulk_create([admin])
+
+            seeded_students = [Student(type=User.Types.STUDENT, password=password_hash, **fields) for fields in student_fields]
+            Student.objects.bulk_create(seeded_students, batch_size=batch_size)
+            StudentProfile.objects.bulk_create([
+                StudentProfile(user=student, student_number=student_number)
+                for student, student_number in zip(seeded_students, reserve_student_numbers(len(seeded_students)))
+            ], batch_size=batch_size)
+
+            guardians = [Guardian(type=User.Types.GUARDIAN, password=password_hash, **fields) for fields in guardian_fields]
+            Guardian.objects.bulk_create(guardians, batch_size=batch_size)
+            GuardianProfile.objects.bulk_create(
+                _guardian_profiles(random.Random(f'{random_seed}-guardian-profiles'), guardians, seeded_students),
+                batch_size=batch_size,
+            )
+
+            # Both students and guardians book lessons
+            client_ids = [client.id for client in seeded_students + guardians]
+            client_chunks = [client_ids[chunk.start:chunk.stop] for chunk in _chunks(len(client_ids))]
+            term_dates = [(term.start_date, term.end_date) for term in terms]
+            generated_chunks = map_chunks(
+                _generate_bookings,
+                client_chunks,
+                [term_dates] * len(client_chunks),
+                [now] * len(client_chunks),
+                [f'{random_seed}-bookings-{index}' for index in range(len(client_chunks))],
+            )
+            created = {'lesson_requests': 0, 'invoices': 0, 'lessons': 0, 'transfers': 0}
+            for lesson_requests, invoices, lessons, transfers in generated_chunks:
+                _write_bookings(lesson_requests, invoices, lessons, transfers, admin, batch_size)
+                created['lesson_requests'] += len(lesson_requests)
+                created['invoices'] += len(invoices)
+                created['lessons'] += len(lessons)
+                created['transfers'] += len(transfers)
+
+    return {
+        'terms': len(terms),
+        'students': len(seeded_students),
+        'guardians': len(guardians),
+        'admins': 1,
+        **created,
+    }
+
+
+@contextmanager
+def _chunk_mapper(processes):
+    """Yields a map function running over chunks, in a pool of worker processes when there is more than one"""
+    if processes <= 1:
+        yield map
+        return
+    with ProcessPoolExecutor(processes) as executor:
+        yield executor.map
+
+
+def _chunks(count):
+    return [range(start, min(start + CHUNK_SIZE, count)) for start in range(0, count, CHUNK_SIZE)]
+
+
+def _flatten(chunks):
+    return [row for chunk in chunks for row in chunk]
+
+
+def _faker(seed):
+    faker = Faker('en_GB')
+    faker.seed_instance(seed)
+    return faker
+
+
+def _generate_users(kind, indices, seed):
+    """Generates the names, emails and usernames of a chunk of users"""
+    faker = _faker(seed)
+    users = []
+    for index in indices:
+        first_name = faker.first_name()
+        last_name = faker.last_name()
+        email = f'{first_name.lower()}.{last_name.lower()}.{kind}{index}@example.org'
+        users.append({
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': email,
+            # bulk_create does not call User.save, which fills this in
+            'email_hash': gravatar_hash(email),
+            'username': f'@{first_name}{last_name}{kind}{index}',
+        })
+    return users
+
+
+def _seed_terms(now):
+    """Creates six terms of six weeks, the first starting about half a year ago, leaving out any that already exist"""
+    names = ['Term one', 'Term two', 'Term three', 'Term four', 'Term five', 'Term six']
+    first_start_date = (now - timedelta(weeks=26)).replace(hour=0, minute=0, second=0, microsecond=0)
+    terms = [
+        Term(name=name, start_date=first_start_date + timedelta(weeks=8 * index), end_date=first_start_date + timedelta(weeks=8 * index + 6))
+        for index, name in enumerate(names)
+    ]
+    Term.objects.bulk_create(terms, ignore_conflicts=True)
+    return list(Term.objects.filter(name__in=names).order_by('start_date'))
+
+
+def _guardian_profiles(generator, guardians, students):
+    """Gives each guardian one to three of the students as children, no student having two guardians"""
+    unclaimed_students = iter(generator.sample(students, len(students)))
+    guardian_profiles = []
+    for guardian in guardians:
+        for child in [student for _, student in zip(range(generator.randint(1, 3)), unclaimed_students)]:
+            guardian_profiles.append(GuardianProfile(
+                user=guardian,
+                student_first_name=child.first_name,
+                student_last_name=child.last_name,
+                student_email=child.email,
+            ))
+    return guardian_profiles
+
+
+def _generate_bookings(client_ids, term_dates, now, seed):
+    """Generates the rows of a chunk of clients, as dictionaries of field values
+    Every client books up to MAX_INVOICES_PER_CLIENT series of lessons, one invoice per series,
+    most invoices are paid, some in full, some under or over their price
+    Lessons and transfers refer to their invoice by its position in the returned invoices
+    Returns the lesson requests, invoices, lessons and transfers"""
+    generator = random.Random(seed)
+    faker = _faker(seed)
+    lesson_requests = []
+    invoices = []
+    lessons = []
+    transfers = []
+
+    for client_id in client_ids:
+        if generator.random() < LESSON_REQUESTS_PER_STUDENT:
+            lesson_number = generator.randint(1, 5)
+            interval = generator.randint(1, lesson_number)
+            availability_start = now + timedelta(days=generator.randint(1, 180))
+            availability_end = availability_start + timedelta(weeks=lesson_number * (interval + 1))
+            lesson_requests.append({
+                'author_id': client_id,
+                'availability': f'{availability_start:%d/%m/%Y} - {availability_end:%d/%m/%Y}',
+                'lessonNum': lesson_number,
+                'interval': interval,
+                'duration': generator.randint(30, 120),
+                'topic': faker.sentence(nb_words=2)[:50],
+                'teacher': faker.name(),
+            })
+
+        for invoice_number in range(1, generator.randint(0, MAX_INVOICES_PER_CLIENT) + 1):
+            start_date, end_date = generator.choice(term_dates)
+            lesson_number = generator.randint(1, MAX_LESSONS_PER_INVOICE)
+            duration = generator.randint(30, 120)
+            topic = faker.sentence(nb_words=2)[:50]
+            teacher = faker.name()
+            lesson_dates = generate_lesson_dates(
+                start_date,
+                time(generator.randint(8, 19), generator.choice([0, 15, 30, 45])),
+                generator.choice(DAYS_OF_THE_WEEK),
+                generator.randint(1, lesson_number),
+                lesson_number,
+            )
+            price = duration * lesson_number
+            invoice_index = len(invoices)
+            lessons += [
+                {'student_id': client_id, 'invoice_index': invoice_index, 'date': lesson_date, 'duration': duration, 'topic': topic, 'teacher': teacher}
+                for lesson_date in lesson_dates
+            ]
+
+            chance = generator.random()
+            amount = price
+            if chance < OVERPAID_PROBABILITY:
+                amount = price + round(chance * 100)
+            elif chance < UNDERPAID_PROBABILITY:
+                amount = max(price - round(chance * 100), round(chance * 100))
+            elif chance < UNPAID_PROBABILITY:
+                amount = None
+            invoice_date = min(now, start_date)
+            if amount is not None:
+                transfers.append({'invoice_index': invoice_index, 'date_received': invoice_date, 'amount_received': amount})
+
+            # bulk_create does not send signals, so the stored totals are filled in here
+            invoices.append({
+                'student_id': client_id,
+                'date': invoice_date,
+                'invoice_number': invoice_number,
+                'total_price': price,
+                'total_paid': amount or 0,
+            })
+
+    return lesson_requests, invoices, lessons, transfers
+
+
+def _write_bookings(lesson_requests, invoices, lessons, transfers, verifier, batch_size):
+    """Writes the generated rows of a chunk of clients"""
+    LessonRequest.objects.bulk_create([LessonRequest(**fields) for fields in lesson_requests], batch_size=batch_size)
+
+    invoice_objects = [Invoice(**fields) for fields in invoices]
+    Invoice.objects.bulk_create(invoice_objects, batch_size=batch_size)
+    Lesson.objects.bulk_create([
+        Lesson(invoice=invoice_objects[fields.pop('invoice_index')], **fields) for fields in lessons
+    ], batch_size=batch_size)
+    Transfer.objects.bulk_create([
+        Transfer(invoice=invoice_objects[fields.pop('invoice_index')], transfer_id=transfer_id, verifier=verifier, **fields)
+        for fields, transfer_id in zip(transfers, reserve_transfer_ids(len(transfers)))
+    ], batch_size=batch_size)
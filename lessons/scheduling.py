@@ -0,0 +1,127 @@
+"""Automatic scheduling of every open lesson request into a term.
+
+Each request is given a day of the week and a time for its whole series of
+lessons, greedily. The requests with the fewest days to choose from go first,
+then those with the most teaching time, and each takes the first slot on a day
+its availability allows at which every one of its lessons falls inside the
+term and neither its teacher nor its student already has a lesson. Clashes are
+looked up in an OccupancyIndex of the term that every placed series is added
+to, so trying a slot costs a binary search per lesson. Each teacher's search
+carries on from the slot after the one they were last placed in, so slots
+already filled are not tried again and again. The placed requests are then
+booked in bulk."""
+
+from django.utils import timezone
+from .booking import book_placements
+from .helpers import get_next_given_day_of_week_after_date_given
+from .models import LessonRequest
+from .occupancy import SLOT_STEP, OccupancyIndex
+import datetime
+import pytz
+import re
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Days and hours lessons are scheduled in, unless a request's availability names other days
+SCHEDULING_DAYS = WEEKDAYS[:5]
+SCHEDULING_DAY_START = datetime.timedelta(hours=9)
+SCHEDULING_DAY_END = datetime.timedelta(hours=18)
+
+_DAY_PATTERN = re.compile(r'\b(mon|tue|wed|thu|fri|sat|sun)', re.IGNORECASE)
+_DATE_PATTERN = re.compile(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b')
+
+
+def available_days(availability):
+    """Returns the days of the week named in the free text availability of a request, SCHEDULING_DAYS if it names none"""
+    named = {match.lower() for match in _DAY_PATTERN.findall(availability or '')}
+    days = [day for day in WEEKDAYS if day[:3].lower() in named]
+    return days or SCHEDULING_DAYS
+
+
+def available_from(availability):
+    """Returns the first date in the free text availability of a request (as dd/mm/yyyy), None if it has none"""
+    match = _DATE_PATTERN.search(availability or '')
+    if match is None:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return datetime.datetime(year, month, day, tzinfo=pytz.UTC)
+    except ValueError:
+        return None
+
+
+def _slot_offsets(duration):
+    """Returns the times of day, as offsets from midnight, that a lesson of the given duration can start at"""
+    offsets = []
+    offset = SCHEDULING_DAY_START
+    while offset + datetime.timedelta(minutes=duration) <= SCHEDULING_DAY_END:
+        offsets.append(offset)
+        offset += SLOT_STEP
+    return offsets
+
+
+def _priority(lesson_request):
+    return (len(available_days(lesson_request.availability)), -lesson_request.lessonNum * lesson_request.duration, lesson_request.id)
+
+
+def schedule_requests(lesson_requests, term, now=None):
+    """Places each lesson request in a slot of the term, without clashes between them or with the lessons already booked
+    Returns a list of (lesson request, dates of its lessons) for the placed requests, in the order they were placed,
+    and a dictionary of the ids of the requests that could not be placed to the reason"""
+    now = now or timezone.now()
+    occupancy = OccupancyIndex.for_term(term)
+    term_start = max(term.start_date, now)
+    next_slots = {}
+    placements = []
+    unplaced = {}
+
+    for lesson_request in sorted(lesson_requests, key=_priority):
+        if term.end_date < now:
+            unplaced[lesson_request.id] = f'{term.name} is out of date! Pick an in date term'
+        elif not lesson_request.teacher:
+            unplaced[lesson_request.id] = 'No teacher was requested, book this request on its own'
+        elif lesson_dates := _place(lesson_request, term, term_start, occupancy, next_slots):
+            placements.append((lesson_request, lesson_dates))
+        else:
+            unplaced[lesson_request.id] = f'No slot in {term.name} is free for the teacher and the student'
+
+    return placements, unplaced
+
+
+def _place(lesson_request, term, term_start, occupancy, next_slots):
+    """Returns the dates of the lessons of a request in the first free slot, added to the occupancy index, None if no slot is free"""
+    series_start = max(term_start, available_from(lesson_request.availability) or term_start)
+    midnight = datetime.datetime(series_start.year, series_start.month, series_start.day, tzinfo=pytz.UTC)
+    first_days = {day: get_next_given_day_of_week_after_date_given(midnight, day) for day in available_days(lesson_request.availability)}
+    # Slot by slot across the days, so a teacher's lessons spread over the week before filling a day
+    slots = [(day, offset) for offset in _slot_offsets(lesson_request.duration) for day in first_days]
+    length = datetime.timedelta(minutes=lesson_request.duration)
+    interval = datetime.timedelta(weeks=lesson_request.interval)
+
+    first_slot = next_slots.get(lesson_request.teacher, 0)
+    for position in range(first_slot, first_slot + len(slots)):
+        day, offset = slots[position % len(slots)]
+        first_date = first_days[day] + offset
+        if first_date < series_start:
+            first_date += datetime.timedelta(weeks=1)
+        lesson_dates = [first_date + interval * lesson for lesson in range(lesson_request.lessonNum)]
+        if lesson_dates[-1] + length > term.end_date:
+            continue
+        if not occupancy.is_free(lesson_dates, lesson_request.duration, lesson_request.teacher, lesson_request.author_id):
+            continue
+        for lesson_date in lesson_dates:
+            occupancy.add(None, lesson_request.teacher, lesson_request.author_id, lesson_date, lesson_request.duration)
+        next_slots[lesson_request.teacher] = (position + 1) % len(slots)
+        return lesson_dates
+    return None
+
+
+def schedule_term(term, batch_size=500, dry_run=False):
+    """Schedules and books every open lesson request into a term
+    Returns the placements made (see schedule_requests), a dictionary of booked request ids to their invoices,
+    and a dictionary of the ids of the requests not booked to the reason. Nothing is booked on a dry run"""
+    placements, failed = schedule_requests(LessonRequest.objects.order_by('id'), term)
+    if dry_run:
+        return placements, {}, failed
+    booked, booking_failed = book_placements(placements, batch_size)
+    failed.update(booking_failed)
+    return placements, booked, failed
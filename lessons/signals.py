@@ -0,0 +1,108 @@
+"""Signal receivers for the lessons app."""
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .balance_cache import invalidate_balances
+from .balances import refresh_invoice_totals
+from .conditional import mark_pages_changed
+from .database import tune_connection
+from .fragment_cache import bump_fragment_versions
+from .models import Invoice, Lesson, LessonRequest, Term, Transfer, User
+from .occupancy import forget_lesson, record_lessons
+from .terms import invalidate_term_calendar
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Transfer)
+@receiver(post_delete, sender=Transfer)
+def update_invoice_totals(sender, instance, **kwargs):
+    """Keeps the stored totals of an invoice in step with its lessons and transfers"""
+    refresh_invoice_totals(instance.invoice_id)
+
+
+@receiver(post_save, sender=Invoice)
+def restore_invoice_totals(sender, instance, **kwargs):
+    """Saving an invoice writes back the totals it was loaded with, which may be stale,
+    and fixtures can load an invoice after its lessons and transfers"""
+    refresh_invoice_totals(instance.pk)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def drop_lesson_or_invoice_balance(sender, instance, **kwargs):
+    """The balance and pages of the student the lesson or invoice is for have changed"""
+    invalidate_balances([instance.student_id])
+    mark_pages_changed([instance.student_id])
+
+
+@receiver(post_save, sender=Transfer)
+@receiver(post_delete, sender=Transfer)
+def drop_transfer_balance(sender, instance, **kwargs):
+    """The balance and pages of the student who paid the transfer, and the fragments showing their invoices and transfers, have changed"""
+    if Transfer.invoice.is_cached(instance):
+        student_ids = [instance.invoice.student_id]
+    else:
+        student_ids = list(Invoice.objects.filter(pk=instance.invoice_id).values_list('student_id', flat=True))
+    invalidate_balances(student_ids)
+    mark_pages_changed(student_ids)
+    bump_fragment_versions(['transfers', 'invoices'], student_ids)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def bump_lesson_or_invoice_fragments(sender, instance, **kwargs):
+    """Fragments showing lessons or invoices, or anything of the student they are for, are out of date
+    Changing a lesson changes the totals of its invoice too"""
+    bump_fragment_versions(['lessons', 'invoices'] if sender is Lesson else ['invoices'], [instance.student_id])
+
+
+@receiver(post_save, sender=LessonRequest)
+@receiver(post_delete, sender=LessonRequest)
+def bump_request_fragments(sender, instance, **kwargs):
+    """Fragments showing lesson requests, or anything of their author, are out of date"""
+    bump_fragment_versions(['requests'], [instance.author_id])
+
+
+# Fields saved when a user logs in, User.save adds pages_changed_at
+LOGIN_FIELDS = {'last_login', 'pages_changed_at'}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_user_fragments(sender, instance, update_fields=None, **kwargs):
+    """Fragments showing the names of users, and the calendar feeds of teachers, are out of date
+    Students, guardians and admins are proxies of User, so their signals are sent for the proxy classes.
+    Logging in only saves when the user last logged in, which no fragment shows"""
+    if isinstance(instance, User) and not (update_fields and update_fields <= LOGIN_FIELDS):
+        bump_fragment_versions(['users'], [instance.id])
+
+
+@receiver(post_save, sender=Lesson)
+def record_lesson_occupancy(sender, instance, **kwargs):
+    """The teacher and student of the lesson are busy at its new time"""
+    record_lessons([instance])
+
+
+@receiver(post_delete, sender=Lesson)
+def forget_lesson_occupancy(sender, instance, **kwargs):
+    """The teacher and student of the lesson are free again"""
+    forget_lesson(instance.id)
+
+
+@receiver(post_save, sender=Term)
+@receiver(post_delete, sender=Term)
+def drop_term_calendar(sender, **kwargs):
+    """Terms changed, so the cached term calendar is out of date"""
+    invalidate_term_calendar()
+
+
+@receiver(connection_created)
+def tune_new_connection(sender, connection, **kwargs):
+    """Sets the pragmas of every new SQLite connection"""
+    tune_connection(connection)
@@ -0,0 +1,72 @@
+"""Template tags for caching fragments under the versions of the data they show."""
+
+from django import template
+from django.conf import settings
+from django.templatetags.cache import CacheNode
+from lessons.fragment_cache import fragment_versions
+
+register = template.Library()
+
+
+class _Setting:
+    """Resolves to the current value of a setting, for CacheNode"""
+
+    def __init__(self, name):
+        self.var = name
+
+    def resolve(self, context):
+        return getattr(settings, self.var)
+
+
+class _Versions:
+    """Resolves to the versions of the tables and student a fragment shows, for CacheNode"""
+
+    def __init__(self, tables, student):
+        self.var = 'fragment versions'
+        self.tables = tables
+        self.student = student
+
+    def resolve(self, context):
+        tables = [table.resolve(context) for table in self.tables]
+        student_id = self.student.resolve(context) if self.student is not None else None
+        return fragment_versions(tables, student_id)
+
+
+class VersionedCacheNode(CacheNode):
+    def __init__(self, nodelist, fragment_name, tables, student, vary_on):
+        super().__init__(nodelist, _Setting('FRAGMENT_CACHE_TIMEOUT'), fragment_name, [_Versions(tables, student), *vary_on], _Setting('FRAGMENT_CACHE'))
+
+    def render(self, context):
+        if not settings.FRAGMENT_CACHE_TIMEOUT:
+            return self.nodelist.render(context)
+        return super().render(context)
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """Caches the contents of the block until the data it shows changes, or for settings.FRAGMENT_CACHE_TIMEOUT seconds
+
+    {% versioned_cache "fragment name" "table" ... student=student_id vary_on value ... %}
+        ...
+    {% endversioned_cache %}
+
+    The tables and student are those the fragment shows rows of (see lessons.fragment_cache.TABLES),
+    and each value after vary_on, such as the page shown, gets a cached copy of its own"""
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least a fragment name")
+    fragment_name = bits[1].strip('"\'')
+    tables = []
+    student = None
+    vary_on = []
+    arguments = iter(bits[2:])
+    for argument in arguments:
+        if argument == 'vary_on':
+            vary_on = [parser.compile_filter(value) for value in arguments]
+        elif argument.startswith('student='):
+            student = parser.compile_filter(argument[len('student='):])
+        else:
+            tables.append(parser.compile_filter(argument))
+    return VersionedCacheNode(nodelist, fragment_name, tables, student, vary_on)
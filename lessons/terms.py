@@ -0,0 +1,123 @@
+"""Cached calendar of school terms.
+
+Every term is loaded once into a list sorted by start date, so date lookups are
+binary searches instead of a scan of Term.objects.all() per question asked.
+The calendar is kept per process under a version held in the
+TERM_CALENDAR_CACHE cache, which is bumped whenever a term is saved or deleted
+(see lessons.signals), and bumped again once the transaction commits, so every
+process reloads the terms at its next lookup."""
+
+from bisect import bisect_left, bisect_right
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Term
+import time
+
+VERSION_KEY = 'term_calendar_version'
+
+
+class TermCalendar:
+    """Snapshot of every term, sorted by start date"""
+
+    def __init__(self, terms):
+        self.terms = sorted(terms, key=lambda term: term.start_date)
+        self.start_dates = [term.start_date for term in self.terms]
+        self.terms_by_name = {term.name: term for term in self.terms}
+
+        # Terms are not meant to overlap but nothing stops a term enclosing another,
+        # so keep the latest ending term out of every term starting up to each position
+        self.latest_ending_terms = []
+        latest_ending_term = None
+        for term in self.terms:
+            if latest_ending_term is None or term.end_date > latest_ending_term.end_date:
+                latest_ending_term = term
+            self.latest_ending_terms.append(latest_ending_term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_named(self, name):
+        """Returns the term with the given name, None if there is none"""
+        return self.terms_by_name.get(name)
+
+    def term_containing(self, date):
+        """Returns a term that the date falls inside, None if there is none"""
+        position = bisect_right(self.start_dates, date) - 1
+        if position < 0:
+            return None
+        term = self.latest_ending_terms[position]
+        if term.end_date >= date:
+            return term
+        return None
+
+    def next_term(self, date=None):
+        """Returns the term we are in at the given date (now by default)
+        otherwise the next term to start after it, None if there is none"""
+        date = date or timezone.now()
+        current_term = self.term_containing(date)
+        if current_term:
+            return current_term
+        position = bisect_left(self.start_dates, date)
+        if position < len(self.terms):
+            return self.terms[position]
+        return None
+
+    def all_outdated(self, date=None):
+        """Returns true if every term has ended by the given date (now by default)"""
+        date = date or timezone.now()
+        return not self.terms or self.latest_ending_terms[-1].end_date <= date
+
+
+_cached_calendar = None
+_cached_calendar_key = None
+
+
+def _cache():
+    return caches[settings.TERM_CALENDAR_CACHE]
+
+
+def calendar_version():
+    """Returns the version of the terms shared by every process"""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Starts from the time rather than 1, so an evicted version never comes back as one already loaded
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version():
+    try:
+        _cache().incr(VERSION_KEY)
+    except ValueError:
+        # Not cached yet, or evicted, so the next lookup starts a new version
+        pass
+
+
+def transaction_key():
+    """Identifies the transaction state of the connection
+    Terms read inside a savepoint may be rolled back, so they are only reused inside that same savepoint"""
+    if connection.in_atomic_block:
+        return tuple(connection.savepoint_ids)
+    return None
+
+
+def get_term_calendar():
+    """Returns the calendar of every term, loading the terms from the database only when needed"""
+    global _cached_calendar, _cached_calendar_key
+    key = (calendar_version(), transaction_key())
+    if _cached_calendar is None or _cached_calendar_key != key:
+        _cached_calendar = TermCalendar(Term.objects.all())
+        _cached_calendar_key = key
+    return _cached_calendar
+
+
+def invalidate_term_calendar():
+    """Drops the cached calendar of every process so their next lookup reloads the terms"""
+    global _cached_calendar
+    _cached_calendar = None
+    _bump_version()
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,81 @@
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from lessons.models import User, Transfer
+from lessons.benchmarking import BENCHMARKED_VIEWS, FRAGMENT_CACHED_VIEWS, BenchmarkError, benchmark_fragment_caching, benchmark_concurrency, benchmark_views, benchmark_helpers, time_call
+from lessons.database import DEFAULT_SQLITE_PRAGMAS
+from lessons.reporting import REPORTING_DATABASE
+from lessons.scale_seeding import seed_at_scale
+from unittest import mock
+import os
+import sqlite3
+import tempfile
+
+
+class BenchmarkCommandTestCase(TestCase):
+    """Tests for the timings gathered by the benchmark command"""
+
+    def test_time_call_counts_queries(self):
+        timing = time_call(lambda: list(User.objects.all()), repeat=3)
+        self.assertEqual(timing['queries'], 1)
+        self.assertLessEqual(timing['min_ms'], timing['median_ms'])
+        self.assertLessEqual(timing['median_ms'], timing['max_ms'])
+
+    def test_benchmarks_every_view_and_helper(self):
+        seed_at_scale(20)
+        views = benchmark_views(repeat=1)
+        self.assertEqual(list(views), [view_name for view_name, url_name, user_type in BENCHMARKED_VIEWS])
+        for timing in views.values():
+            self.assertGreater(timing['queries'], 0)
+        helpers = benchmark_helpers(repeat=1)
+        self.assertGreater(helpers['find_next_available_transfer_id']['queries'], 0)
+        self.assertEqual(helpers['get_next_term']['queries'], 0)
+
+    def test_cached_fragments_save_queries(self):
+        seed_at_scale(20)
+        runs = benchmark_fragment_caching(repeat=1)
+        view_names = [view_name for view_name, url_name, user_type in FRAGMENT_CACHED_VIEWS]
+        self.assertEqual(list(runs['uncached']), view_names)
+        for view_name in view_names:
+            self.assertLess(runs['cached'][view_name]['queries'], runs['uncached'][view_name]['queries'])
+
+    def test_benchmarking_an_empty_database_fails(self):
+        with self.assertRaises(BenchmarkError):
+            benchmark_views(repeat=1)
+
+    def test_a_fresh_snapshot_does_not_change_the_results(self):
+        seed_at_scale(20)
+        on_primary = benchmark_views(repeat=1)
+        with tempfile.TemporaryDirectory() as directory:
+            # A fresh snapshot of some other database, without the seeded data
+            snapshot = os.path.join(directory, 'reporting.sqlite3')
+            sqlite3.connect(snapshot).close()
+            with mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': snapshot}):
+                with_snapshot = benchmark_views(repeat=1)
+                connections[REPORTING_DATABASE].close()
+        for view_name, timing in on_primary.items():
+            self.assertEqual(with_snapshot[view_name]['queries'], timing['queries'])
+
+
+class ConcurrencyBenchmarkTestCase(TransactionTestCase):
+    """Tests for the throughput gathered by the benchmark_concurrency command
+    The reader and writer threads have connections of their own, so the seeded rows are committed"""
+
+    def test_readers_and_writers_run_with_each_set_of_pragmas(self):
+        seed_at_scale(20)
+        transfers_before = Transfer.objects.count()
+        # The test database is in memory with a shared cache, where a writer locks whole tables against readers
+        # until it commits, whatever the busy timeout, so the readers read uncommitted rows instead of starving
+        uncommitted = {'read_uncommitted': 1}
+        runs = benchmark_concurrency(
+            {'before': {**DEFAULT_SQLITE_PRAGMAS, **uncommitted}, 'after': {'synchronous': 'NORMAL', **uncommitted}},
+            readers=2, writers=1, seconds=0.2,
+        )
+        self.assertEqual(list(runs), ['before', 'after'])
+        for run in runs.values():
+            self.assertGreater(run['reads'], 0)
+            self.assertGreater(run['reads_per_second'], 0)
+        self.assertEqual(Transfer.objects.count(), transfers_before + sum(run['writes'] for run in runs.values()))
+
+    def test_benchmarking_an_empty_database_fails(self):
+        with self.assertRaises(BenchmarkError):
+            benchmark_concurrency({'before': DEFAULT_SQLITE_PRAGMAS}, readers=1, writers=1, seconds=0.1)
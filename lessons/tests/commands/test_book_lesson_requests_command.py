@@ -0,0 +1,42 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from lessons.models import Student, Lesson, LessonRequest, Term
+import datetime
+
+class BookLessonRequestsCommandTestCase(TestCase):
+    """Tests for the book_lesson_requests management command"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        # Every request is booked at the same time, so each is for a different student and teacher
+        self.other_student = Student.objects.create(email="janedoe@example.org", first_name="Jane", last_name="Doe", username="janedoe")
+        self.third_student = Student.objects.create(email="petrapickles@example.org", first_name="Petra", last_name="Pickles", username="petrapickles")
+        self.lesson_requests = [
+            LessonRequest.objects.create(author=student, availability="Monday", lessonNum=2,
+                                         interval=1, duration=60, topic="Piano", teacher=teacher)
+            for student, teacher in [(self.student, "Mr Bob"), (self.other_student, "Ms Ann"), (self.third_student, "Mr Cy")]
+        ]
+        tdelta = datetime.timedelta(weeks=12)
+        Term.objects.create(name='Summer Term', start_date=timezone.now() + tdelta, end_date=timezone.now() + tdelta * 2)
+
+    def test_book_all_requests_into_next_term(self):
+        output = StringIO()
+        call_command('book_lesson_requests', all=True, day='Monday', time='10:00', stdout=output)
+        self.assertEqual(LessonRequest.objects.count(), 0)
+        self.assertEqual(Lesson.objects.count(), 6)
+        self.assertIn('Booked 3 of 3 lesson requests into Summer Term', output.getvalue())
+
+    def test_book_given_requests_reports_missing_ones(self):
+        output = StringIO()
+        call_command('book_lesson_requests', self.lesson_requests[0].id, 9999, term='Summer Term', day='Monday', time='10:00', stdout=output)
+        self.assertEqual(LessonRequest.objects.count(), 2)
+        self.assertIn('Could not book request 9999', output.getvalue())
+
+    def test_unknown_term_is_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('book_lesson_requests', all=True, term='Winter Term', day='Monday', time='10:00', stdout=StringIO())
@@ -0,0 +1,35 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from lessons.calendar_feeds import feed_path
+from lessons.models import Student, Invoice, Lesson
+from io import StringIO
+
+class CalendarFeedUrlsCommandTestCase(TestCase):
+    """Tests for the calendar_feed_urls management command"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    def setUp(self):
+        student = Student.objects.get(email="johndoe@example.org")
+        invoice = Invoice.objects.get(invoice_number=100)
+        for teacher in ["Mr Jim", "Ms Ann", "Mr Jim"]:
+            Lesson.objects.create(student=student, invoice=invoice, date=timezone.now(), duration=30, topic="Drums", teacher=teacher)
+
+    def _call(self, *args):
+        output = StringIO()
+        call_command('calendar_feed_urls', *args, stdout=output, stderr=StringIO())
+        return output.getvalue().splitlines()
+
+    def test_lists_every_teacher_with_lessons(self):
+        self.assertEqual(self._call(), [f'Mr Jim: {feed_path("teacher", "Mr Jim")}', f'Ms Ann: {feed_path("teacher", "Ms Ann")}'])
+
+    def test_lists_the_given_teachers_under_the_base_url(self):
+        self.assertEqual(self._call('Ms Ann', '--base-url', 'https://msms.example.org/'),
+                         [f'Ms Ann: https://msms.example.org{feed_path("teacher", "Ms Ann")}'])
+
+    def test_skips_names_with_a_slash(self):
+        self.assertEqual(self._call('AC/DC'), [])
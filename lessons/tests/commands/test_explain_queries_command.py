@@ -0,0 +1,21 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from lessons.query_plans import explain_hot_queries, full_table_scans
+
+class ExplainQueriesCommandTestCase(TestCase):
+    """Tests for the explain_queries management command"""
+
+    def test_every_hot_query_uses_an_index(self):
+        for name, explained in explain_hot_queries().items():
+            self.assertEqual(explained['full_table_scans'], [], f'{name} scans a whole table:\n{explained["plan"]}')
+
+    def test_full_table_scans_are_spotted(self):
+        plan = '2 0 0 SCAN lessons_lesson\n5 0 0 SCAN lessons_transfer USING INDEX transfer_date_idx'
+        self.assertEqual(full_table_scans(plan), ['SCAN lessons_lesson'])
+
+    def test_check_passes_and_shows_plans(self):
+        output = StringIO()
+        call_command('explain_queries', '--check', stdout=output)
+        self.assertIn('USING INDEX lesson_student_date_idx', output.getvalue())
+        self.assertIn('0 hot queries scan a whole table', output.getvalue())
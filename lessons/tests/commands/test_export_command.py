@@ -0,0 +1,43 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from lessons.models import Student, Admin, Invoice, Transfer
+import csv
+import datetime
+import os
+import pytz
+import tempfile
+
+class ExportCommandTestCase(TestCase):
+    """Tests for the export management command"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        student = Student.objects.get(email="johndoe@example.org")
+        admin = Admin.objects.get(email="student_admin@example.org")
+        for count in range(1, 4):
+            date = datetime.datetime(2022, 10, count * 10, 12, tzinfo=pytz.UTC)
+            invoice = Invoice.objects.create(date=date, invoice_number=count, student=student)
+            Transfer.objects.create(date_received=date, transfer_id=count, amount_received=10, verifier=admin, invoice=invoice)
+
+    def test_exports_to_standard_output(self):
+        output = StringIO()
+        call_command('export', 'transfers', '--start', '2022-10-15', stdout=output)
+        rows = list(csv.DictReader(output.getvalue().splitlines()))
+        self.assertEqual([row['transfer_id'] for row in rows], ['2', '3'])
+
+    def test_exports_to_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'invoices.ndjson')
+            call_command('export', 'invoices', '--format', 'ndjson', '--output', path)
+            with open(path) as export:
+                self.assertEqual(len(export.readlines()), 3)
+
+    def test_unknown_term_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command('export', 'lessons', '--term', 'No such term', stdout=StringIO())
@@ -0,0 +1,45 @@
+from io import StringIO
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from lessons.instrumentation import PROCESSES_KEY, recorder, reset_stats
+from lessons.tests.views.test_performance_stats_view import TEST_CACHES
+import json
+
+@override_settings(CACHES=TEST_CACHES, PERFORMANCE_STATS_FLUSH_SECONDS=60)
+class PerformanceStatsCommandTestCase(TestCase):
+    """Tests for the performance_stats management command"""
+
+    def setUp(self):
+        reset_stats()
+        for queries in range(1, 11):
+            recorder.record('admin_lessons', 0.01 * queries, queries, 0.001 * queries, False)
+
+    def tearDown(self):
+        reset_stats()
+
+    def test_dumps_percentiles_as_json(self):
+        output = StringIO()
+        call_command('performance_stats', stdout=output)
+        stats = json.loads(output.getvalue())
+        self.assertEqual(stats['admin_lessons']['requests'], 10)
+        self.assertEqual(stats['admin_lessons']['queries']['p50'], 5)
+        self.assertEqual(stats['admin_lessons']['queries']['p90'], 9)
+        self.assertEqual(stats['admin_lessons']['queries']['max'], 10)
+
+    def test_samples_flushed_by_other_processes_are_included(self):
+        cache = caches['performance']
+        cache.set('performance_stats_0', {'admin_lessons': {'count': 1, 'over_budget': 1, 'samples': [[0.5, 40, 0.2]]}})
+        cache.set(PROCESSES_KEY, ['performance_stats_0'])
+        output = StringIO()
+        call_command('performance_stats', stdout=output)
+        stats = json.loads(output.getvalue())
+        self.assertEqual(stats['admin_lessons']['requests'], 11)
+        self.assertEqual(stats['admin_lessons']['over_query_budget'], 1)
+        self.assertEqual(stats['admin_lessons']['queries']['max'], 40)
+
+    def test_reset_forgets_samples(self):
+        call_command('performance_stats', reset=True, stdout=StringIO())
+        output = StringIO()
+        call_command('performance_stats', stdout=output)
+        self.assertEqual(json.loads(output.getvalue()), {})
@@ -0,0 +1,45 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+
+class RebuildInvoiceTotalsCommandTestCase(TestCase):
+    """Tests for the rebuild_invoice_totals management command"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+        'lessons/tests/fixtures/default_invoice.json',
+        'lessons/tests/fixtures/default_lesson.json',
+    ]
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.invoice = Invoice.objects.get(invoice_number=100)
+        Transfer.objects.create(transfer_id=1, amount_received=40, verifier=self.admin, invoice=self.invoice)
+
+    def test_fixture_totals_are_correct(self):
+        self.assertEqual(self.invoice.price, 100)
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).amount_paid, 40)
+
+    def test_check_passes_when_totals_are_correct(self):
+        output = StringIO()
+        call_command('rebuild_invoice_totals', check=True, stdout=output)
+        self.assertIn('All invoice totals are correct', output.getvalue())
+
+    def test_check_fails_when_totals_are_incorrect(self):
+        Invoice.objects.update(total_price=5, total_paid=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_invoice_totals', check=True, stdout=StringIO())
+        self.assertEqual(Invoice.objects.get(id=self.invoice.id).price, 5)
+
+    def test_rebuild_fixes_incorrect_totals(self):
+        Invoice.objects.update(total_price=5, total_paid=0)
+        output = StringIO()
+        call_command('rebuild_invoice_totals', stdout=output)
+        invoice = Invoice.objects.get(id=self.invoice.id)
+        self.assertEqual(invoice.price, 100)
+        self.assertEqual(invoice.amount_paid, 40)
+        self.assertIn('1 were incorrect', output.getvalue())
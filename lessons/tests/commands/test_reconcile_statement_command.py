@@ -0,0 +1,46 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from lessons.models import Student, Invoice, Lesson, Transfer
+import json
+import os
+import tempfile
+
+class ReconcileStatementCommandTestCase(TestCase):
+    """Tests for the reconcile_statement management command"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        student = Student.objects.get(email="johndoe@example.org")
+        invoice = Invoice.objects.create(date=timezone.now(), invoice_number=1, student=student)
+        Lesson.objects.create(student=student, invoice=invoice, duration=60, date=timezone.now())
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'statement.csv')
+        with open(self.path, 'w') as statement:
+            statement.write(f'date,reference,amount\n2022-10-10,{student.id}-1,60\n2022-10-10,{student.id}-1,60\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reconciles_statement_and_reports_duplicates(self):
+        output = StringIO()
+        call_command('reconcile_statement', self.path, '--verifier', 'student_admin@example.org', stdout=output)
+        self.assertEqual(Transfer.objects.count(), 1)
+        self.assertIn('duplicates: line 3', output.getvalue())
+        summary = json.loads(output.getvalue()[output.getvalue().index('{'):])
+        self.assertEqual(summary['transfers_created'], 1)
+        self.assertEqual(summary['duplicates'], 1)
+
+    def test_verifier_must_be_an_admin(self):
+        with self.assertRaises(CommandError):
+            call_command('reconcile_statement', self.path, '--verifier', 'johndoe@example.org', stdout=StringIO())
+
+    def test_missing_statement_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command('reconcile_statement', 'no_such_statement.csv', '--verifier', 'student_admin@example.org', stdout=StringIO())
@@ -0,0 +1,58 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import TransactionTestCase
+from lessons.reporting import REPORTING_DATABASE, snapshot_age
+from io import StringIO
+from unittest import mock
+import os
+import sqlite3
+import tempfile
+
+class RefreshReportingSnapshotCommandTestCase(TransactionTestCase):
+    """Tests for the refresh_reporting_snapshot management command
+    The snapshot is copied outside any transaction, so these tests commit"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot = os.path.join(directory.name, 'reporting.sqlite3')
+        patcher = mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': self.snapshot})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _read_snapshot(self, query):
+        snapshot = sqlite3.connect(self.snapshot)
+        try:
+            return snapshot.execute(query).fetchall()
+        finally:
+            snapshot.close()
+
+    def test_snapshot_is_a_copy_of_the_database(self):
+        output = StringIO()
+        call_command('refresh_reporting_snapshot', stdout=output)
+        self.assertIn(f'Refreshed {self.snapshot}', output.getvalue())
+        self.assertIsNotNone(snapshot_age())
+        self.assertEqual(self._read_snapshot('SELECT email FROM lessons_user'), [('johndoe@example.org',)])
+        self.assertFalse(os.path.exists(f'{self.snapshot}.copying'))
+
+    def test_snapshot_uses_a_rollback_journal(self):
+        call_command('refresh_reporting_snapshot', stdout=StringIO())
+        self.assertEqual(self._read_snapshot('PRAGMA journal_mode'), [('delete',)])
+
+    def test_refreshing_replaces_the_snapshot(self):
+        call_command('refresh_reporting_snapshot', stdout=StringIO())
+        call_command('loaddata', 'lessons/tests/fixtures/other_students.json', verbosity=0)
+        call_command('refresh_reporting_snapshot', stdout=StringIO())
+        self.assertEqual(self._read_snapshot('SELECT COUNT(*) FROM lessons_user'), [(2,)])
+
+    def test_interval_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            call_command('refresh_reporting_snapshot', every=0, stdout=StringIO())
+
+    def test_refusing_to_copy_is_a_command_error(self):
+        with mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': connections['default'].settings_dict['NAME']}):
+            with self.assertRaises(CommandError):
+                call_command('refresh_reporting_snapshot', stdout=StringIO())
@@ -0,0 +1,43 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from lessons.models import Student, Invoice, Lesson, LessonRequest, Term
+import datetime
+
+class ScheduleLessonRequestsCommandTestCase(TestCase):
+    """Tests for the schedule_lesson_requests management command"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.lesson_requests = [
+            LessonRequest.objects.create(author=self.student, availability="Monday", lessonNum=2,
+                                         interval=1, duration=60, topic="Piano", teacher="Mr Bob")
+            for count in range(3)
+        ]
+        tdelta = datetime.timedelta(weeks=12)
+        Term.objects.create(name='Summer Term', start_date=timezone.now() + tdelta, end_date=timezone.now() + tdelta * 2)
+
+    def test_schedule_every_request_into_next_term(self):
+        output = StringIO()
+        call_command('schedule_lesson_requests', stdout=output)
+        self.assertEqual(LessonRequest.objects.count(), 0)
+        self.assertEqual(Invoice.objects.count(), 3)
+        self.assertEqual(Lesson.objects.count(), 6)
+        self.assertEqual(Lesson.objects.values('date').distinct().count(), 6)
+        self.assertIn('Scheduled 3 of 3 lesson requests into Summer Term', output.getvalue())
+        self.assertIn('2 lessons with Mr Bob on Mondays', output.getvalue())
+
+    def test_dry_run_books_nothing(self):
+        output = StringIO()
+        call_command('schedule_lesson_requests', dry_run=True, stdout=output)
+        self.assertEqual(LessonRequest.objects.count(), 3)
+        self.assertEqual(Lesson.objects.count(), 0)
+        self.assertIn('Would schedule 3 of 3 lesson requests into Summer Term', output.getvalue())
+
+    def test_unknown_term_is_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('schedule_lesson_requests', term='Winter Term', stdout=StringIO())
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from lessons.models import Student,Lesson, Term, LessonRequest
 from lessons.forms import BookLessonRequestForm
+from lessons.booking import book_lessons
 from lessons.helpers import calculate_how_many_lessons_fit_in_given_dates, get_next_term
 from django.utils import timezone
 import datetime
@@ -377,8 +378,49 @@ class BookLessonRequestFromTestCase(TestCase):
         form = BookLessonRequestForm()
         self.assertEqual(form.fields["end_date"].initial.timestamp(),cloest_term.end_date.timestamp())
 
+    """---TEST CLASHES WITH BOOKED LESSONS---"""
+    def _book_mr_bob(self, student=None):
+        book_lessons(
+            student=student or self.student,
+            start_date=self.term.start_date,
+            time=datetime.time(12, 0),
+            day="Wednesday",
+            interval_between_lessons=1,
+            number_of_lessons=6,
+            duration=60,
+            topic="piano",
+            teacher="Mr Bob",
+        )
+
+    def test_reject_lessons_clashing_with_the_teacher(self):
+        self._book_mr_bob(Student.objects.create(email="other@example.org", first_name="Other", last_name="Student"))
+        self.form_input['time'] = "12:30"
+        form = BookLessonRequestForm(data=self.form_input)
+        self.assertFalse(form.is_valid())
+        self.assertIn("Mr Bob already has a lesson from 12:00 to 13:00", form.errors['time'][0])
 
+    def test_reject_lessons_clashing_with_the_student(self):
+        self._book_mr_bob()
+        self.form_input['teacher'] = "Mrs Sax"
+        form = BookLessonRequestForm(lesson_request_id=self.lesson_request.id, data=self.form_input)
+        self.assertFalse(form.is_valid())
+        self.assertIn("The student already has a lesson", form.errors['time'][0])
 
+    def test_accept_lessons_of_another_teacher_and_student(self):
+        self._book_mr_bob()
+        self.form_input['teacher'] = "Mrs Sax"
+        form = BookLessonRequestForm(data=self.form_input)
+        self.assertTrue(form.is_valid())
 
+    def test_accept_lessons_straight_after_the_booked_ones(self):
+        self._book_mr_bob()
+        self.form_input['time'] = "13:00"
+        form = BookLessonRequestForm(lesson_request_id=self.lesson_request.id, data=self.form_input)
+        self.assertTrue(form.is_valid())
 
+    def test_clashes_suggest_the_nearest_free_times(self):
+        self._book_mr_bob()
+        form = BookLessonRequestForm(lesson_request_id=self.lesson_request.id, data=self.form_input)
+        self.assertFalse(form.is_valid())
+        self.assertIn("Nearest free times that day: 11:00, 13:00, 10:45", form.errors['time'][0])
 
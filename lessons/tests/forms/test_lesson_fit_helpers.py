@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+from lessons.models import Term
+from lessons.helpers import get_next_given_day_of_week_after_date_given, check_lessons_fit_in_given_dates,\
+    calculate_how_many_lessons_fit_in_given_dates, score_lesson_options
+import datetime
+import pytz
+
+
+class LessonFitHelpersTestCase(SimpleTestCase):
+    """Unit tests for the helpers used to check that lessons fit in a term"""
+
+    def setUp(self):
+        self.start_date = datetime.datetime(2023,1,3,12,0,tzinfo=pytz.UTC)
+        self.end_date = datetime.datetime(2023,2,10,12,0,tzinfo=pytz.UTC)
+        self.days = ['Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday']
+
+    def _count_week_by_week(self, start_date, end_date, number_of_lessons, interval, day):
+        current_date = start_date
+        while current_date.strftime('%A') != day:
+            current_date += datetime.timedelta(days=1)
+        counter = 0
+        for i in range(number_of_lessons):
+            current_date += datetime.timedelta(weeks=interval)
+            if current_date > end_date:
+                return counter
+            counter += 1
+        return counter
+
+    def test_next_given_day_of_week(self):
+        for offset in range(7):
+            date = self.start_date + datetime.timedelta(days=offset)
+            for day in self.days:
+                next_date = get_next_given_day_of_week_after_date_given(date, day)
+                self.assertEqual(next_date.strftime('%A'), day)
+                self.assertTrue(datetime.timedelta(0) <= next_date - date < datetime.timedelta(weeks=1))
+
+    def test_lesson_fit_matches_week_by_week_count(self):
+        for day in self.days:
+            for interval in range(1, 5):
+                for number_of_lessons in range(1, 12):
+                    expected = self._count_week_by_week(self.start_date, self.end_date, number_of_lessons, interval, day)
+                    self.assertEqual(calculate_how_many_lessons_fit_in_given_dates(self.start_date, self.end_date, number_of_lessons, interval, day), expected)
+                    self.assertEqual(check_lessons_fit_in_given_dates(self.start_date, self.end_date, number_of_lessons, interval, day), expected == number_of_lessons)
+
+    def test_no_lessons_fit_when_first_lesson_is_after_end_date(self):
+        end_date = self.start_date + datetime.timedelta(days=2)
+        self.assertEqual(calculate_how_many_lessons_fit_in_given_dates(self.start_date, end_date, 3, 1, 'Monday'), 0)
+
+    def test_lesson_fit_with_huge_number_of_lessons(self):
+        self.assertEqual(calculate_how_many_lessons_fit_in_given_dates(self.start_date, self.end_date, 10**9, 1, 'Tuesday'), 5)
+
+    def test_score_lesson_options(self):
+        term = Term(name='Term three', start_date=self.start_date, end_date=self.end_date)
+        options = [('Friday', 2, None), ('Tuesday', 1, None), ('Monday', 1, None), ('Tuesday', 1, self.end_date)]
+        scored_options = score_lesson_options(term, 5, options)
+        self.assertEqual(scored_options[0], ('Tuesday', 1, self.start_date, 5))
+        self.assertEqual(scored_options[1], ('Monday', 1, self.start_date, 4))
+        self.assertEqual(scored_options[-1], ('Tuesday', 1, self.end_date, 0))
@@ -0,0 +1,85 @@
+from django.test import TestCase
+from django.utils import timezone
+from lessons.balance_cache import balance_cache_stats, get_balance, reset_balance_cache_stats
+from lessons.booking import book_lesson_requests
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer, Term
+from lessons.tests.helpers import create_requests
+import datetime
+
+class BalanceCacheTestCase(TestCase):
+    """Tests for the per-student balance cache and its invalidation"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        reset_balance_cache_stats()
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.unpaid_invoice = self._invoice(1, 60)
+        self.underpaid_invoice = self._invoice(2, 100)
+        self._pay(self.underpaid_invoice, 30, transfer_id=1)
+
+    def tearDown(self):
+        reset_balance_cache_stats()
+
+    def _invoice(self, invoice_number, duration, student=None):
+        invoice = Invoice.objects.create(date=timezone.now(), invoice_number=invoice_number, student=student or self.student)
+        Lesson.objects.create(student=invoice.student, invoice=invoice, duration=duration, date=timezone.now())
+        return invoice
+
+    def _pay(self, invoice, amount, transfer_id):
+        return Transfer.objects.create(date_received=timezone.now(), transfer_id=transfer_id, amount_received=amount, verifier=self.admin, invoice=invoice)
+
+    def test_balance_holds_total_and_pending_amounts(self):
+        balance = get_balance(self.student.id)
+        self.assertEqual(balance['total_due'], 130)
+        self.assertEqual([(invoice['unique_reference_number'], invoice['amount_pending']) for invoice in balance['invoices']],
+                         [(f'{self.student.id}-1', 60), (f'{self.student.id}-2', 70)])
+        self.assertEqual(balance['unpaid_ids'], [self.unpaid_invoice.id])
+        self.assertEqual(balance['underpaid'], {self.underpaid_invoice.id: 30})
+
+    def test_second_lookup_is_a_hit_without_queries(self):
+        get_balance(self.student.id)
+        with self.assertNumQueries(0):
+            get_balance(self.student.id)
+        self.assertEqual(balance_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_new_transfer_drops_the_balance(self):
+        get_balance(self.student.id)
+        self._pay(self.unpaid_invoice, 60, transfer_id=2)
+        self.assertEqual(get_balance(self.student.id)['total_due'], 70)
+        self.assertEqual(balance_cache_stats()['misses'], 2)
+
+    def test_deleted_lesson_drops_the_balance(self):
+        get_balance(self.student.id)
+        Lesson.objects.filter(invoice=self.unpaid_invoice).get().delete()
+        self.assertEqual(get_balance(self.student.id)['total_due'], 70)
+
+    def test_new_invoice_drops_the_balance(self):
+        get_balance(self.student.id)
+        self._invoice(3, 45)
+        self.assertEqual(get_balance(self.student.id)['total_due'], 175)
+
+    def test_changes_for_other_students_keep_the_balance(self):
+        get_balance(self.student.id)
+        self._invoice(1, 45, student=self.other_student)
+        get_balance(self.student.id)
+        self.assertEqual(balance_cache_stats()['hits'], 1)
+
+    def test_bulk_booking_drops_the_balance(self):
+        get_balance(self.student.id)
+        create_requests(self.student, 0, 1)
+        term = Term.objects.create(
+            name='Next term',
+            start_date=timezone.now() + datetime.timedelta(days=7),
+            end_date=timezone.now() + datetime.timedelta(days=70),
+        )
+        request_id = self.student.lessonrequest_set.get().id
+        booked, failed = book_lesson_requests([request_id], term, 'Monday', datetime.time(10))
+        self.assertEqual(failed, {})
+        self.assertEqual(get_balance(self.student.id)['total_due'], 190)
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template import Context, Template, TemplateSyntaxError
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+from lessons.fragment_cache import bump_fragment_versions, fragment_cache, fragment_versions
+from lessons.models import Invoice, Lesson, LessonRequest, Student, Transfer, Admin
+
+
+class FragmentCacheTestCase(TestCase):
+    """Unit tests for the versions cached template fragments are keyed by"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/admin_user.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    def setUp(self):
+        fragment_cache().clear()
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.invoice = Invoice.objects.get(invoice_number=100)
+
+    def test_versions_stay_the_same_until_bumped(self):
+        versions = fragment_versions(['lessons'], self.student.id)
+        self.assertEqual(fragment_versions(['lessons'], self.student.id), versions)
+        bump_fragment_versions(['lessons'])
+        self.assertNotEqual(fragment_versions(['lessons'], self.student.id), versions)
+
+    def test_bumping_a_student_leaves_other_students_alone(self):
+        other_versions = fragment_versions([], self.other_student.id)
+        versions = fragment_versions([], self.student.id)
+        bump_fragment_versions([], [self.student.id])
+        self.assertNotEqual(fragment_versions([], self.student.id), versions)
+        self.assertEqual(fragment_versions([], self.other_student.id), other_versions)
+
+    def test_fragments_have_a_cache_of_their_own_sized_for_every_student(self):
+        self.assertNotEqual(settings.FRAGMENT_CACHE, 'default')
+        self.assertGreaterEqual(fragment_cache()._max_entries, settings.CACHED_STUDENTS)
+
+    def test_bumping_versions_never_used_does_nothing(self):
+        bump_fragment_versions(['invoices'], [self.student.id])
+        self.assertEqual(fragment_versions(['invoices'], self.student.id), fragment_versions(['invoices'], self.student.id))
+
+    def test_saving_a_lesson_bumps_its_table_and_student(self):
+        lessons, invoices, requests = (fragment_versions([table]) for table in ['lessons', 'invoices', 'requests'])
+        student = fragment_versions([], self.student.id)
+        Lesson.objects.create(student=self.student, invoice=self.invoice, date="2022-12-03 12:00:00Z", duration=30, topic="Drums", teacher="Mr Jim")
+        self.assertNotEqual(fragment_versions(['lessons']), lessons)
+        self.assertNotEqual(fragment_versions(['invoices']), invoices)
+        self.assertEqual(fragment_versions(['requests']), requests)
+        self.assertNotEqual(fragment_versions([], self.student.id), student)
+
+    def test_saving_a_transfer_bumps_the_student_who_paid(self):
+        student = fragment_versions([], self.student.id)
+        transfers = fragment_versions(['transfers'])
+        Transfer.objects.create(transfer_id=1, amount_received=10, verifier=self.admin, invoice=self.invoice)
+        self.assertNotEqual(fragment_versions([], self.student.id), student)
+        self.assertNotEqual(fragment_versions(['transfers']), transfers)
+
+    def test_saving_a_request_bumps_its_author(self):
+        student = fragment_versions([], self.student.id)
+        LessonRequest.objects.create(author=self.student, availability="Monday", lessonNum=2, interval=1, duration=30, topic="Drums", teacher="Mr Jim")
+        self.assertNotEqual(fragment_versions([], self.student.id), student)
+
+    def test_saving_a_user_bumps_the_users_table(self):
+        users = fragment_versions(['users'])
+        self.other_student.first_name = "Janet"
+        self.other_student.save()
+        self.assertNotEqual(fragment_versions(['users']), users)
+
+
+class VersionedCacheTagTestCase(TestCase):
+    """Unit tests for the versioned_cache template tag"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    TEMPLATE = '{% load fragments %}{% versioned_cache "test" "lessons" student=student vary_on page %}{{ value }}{% endversioned_cache %}'
+
+    def setUp(self):
+        fragment_cache().clear()
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.template = Template(self.TEMPLATE)
+
+    def render(self, value, page=1):
+        return self.template.render(Context({'value': value, 'student': self.student.id, 'page': page}))
+
+    def test_fragment_is_cached_until_its_versions_are_bumped(self):
+        self.assertEqual(self.render('first'), 'first')
+        self.assertEqual(self.render('second'), 'first')
+        bump_fragment_versions([], [self.student.id])
+        self.assertEqual(self.render('third'), 'third')
+        bump_fragment_versions(['lessons'])
+        self.assertEqual(self.render('fourth'), 'fourth')
+
+    def test_each_vary_on_value_is_cached_apart(self):
+        self.assertEqual(self.render('first', page=1), 'first')
+        self.assertEqual(self.render('second', page=2), 'second')
+
+    @override_settings(FRAGMENT_CACHE_TIMEOUT=0)
+    def test_no_timeout_turns_caching_off(self):
+        self.assertEqual(self.render('first'), 'first')
+        self.assertEqual(self.render('second'), 'second')
+
+    def test_fragment_name_is_required(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template('{% load fragments %}{% versioned_cache %}{% endversioned_cache %}')
+
+    def test_navbar_is_cached_apart_for_each_type_of_user(self):
+        navbar = get_template('partials/navbar.html')
+        admin = Admin.objects.create_user(username='@admin', email='admin@example.org', first_name='Ad', last_name='Min')
+        self.assertIn('Invoices', navbar.render({'user': self.student}))
+        self.assertIn('Revenue', navbar.render({'user': admin}))
+        self.assertNotIn('Log out', navbar.render({'user': AnonymousUser()}))
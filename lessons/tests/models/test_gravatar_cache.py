@@ -0,0 +1,60 @@
+from django.test import TestCase
+from libgravatar import Gravatar
+from lessons.avatars import GravatarCache, clear_gravatar_cache, gravatar_cache_info, gravatar_hash
+from lessons.models import Student, User
+from unittest import mock
+
+
+class GravatarCacheTestCase(TestCase):
+    """Unit tests for the cached Gravatar URLs of users"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        clear_gravatar_cache()
+        self.addCleanup(clear_gravatar_cache)
+        self.student = Student.objects.get(email="johndoe@example.org")
+
+    def test_urls_match_libgravatar(self):
+        expected = Gravatar("johndoe@example.org")
+        self.assertEqual(self.student.gravatar(), expected.get_image(size=120, default='mp'))
+        self.assertEqual(self.student.mini_gravatar(), expected.get_image(size=60, default='mp'))
+
+    def test_saving_stores_the_email_hash(self):
+        self.student.save()
+        self.assertEqual(User.objects.get(id=self.student.id).email_hash, gravatar_hash("johndoe@example.org"))
+
+    def test_urls_are_worked_out_once(self):
+        self.student.mini_gravatar()
+        with mock.patch('lessons.avatars.gravatar_hash') as hashing:
+            for _ in range(3):
+                self.student.mini_gravatar()
+        hashing.assert_not_called()
+        self.assertEqual(gravatar_cache_info()['hits'], 3)
+        self.assertEqual(gravatar_cache_info()['misses'], 1)
+
+    def test_stored_hash_is_used(self):
+        self.student.save()
+        student = Student.objects.get(id=self.student.id)
+        clear_gravatar_cache()
+        with mock.patch('lessons.avatars.gravatar_hash') as hashing:
+            student.gravatar()
+        hashing.assert_not_called()
+
+    def test_changing_email_drops_the_old_urls(self):
+        old_url = self.student.gravatar()
+        self.student.email = "johnny@example.org"
+        self.student.save(update_fields=['email'])
+        self.assertEqual(gravatar_cache_info()['size'], 0)
+        self.assertNotEqual(self.student.gravatar(), old_url)
+        self.assertEqual(User.objects.get(id=self.student.id).email_hash, gravatar_hash("johnny@example.org"))
+
+    def test_cache_is_bounded_least_recently_used_first(self):
+        cache = GravatarCache(2)
+        cache.put(('a@example.org', 60), 'a')
+        cache.put(('b@example.org', 60), 'b')
+        cache.get(('a@example.org', 60))
+        cache.put(('c@example.org', 60), 'c')
+        self.assertEqual(cache.get(('a@example.org', 60)), 'a')
+        self.assertIsNone(cache.get(('b@example.org', 60)))
+        self.assertEqual(cache.info()['size'], 2)
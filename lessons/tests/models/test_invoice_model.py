@@ -1,6 +1,6 @@
 from django.core.exceptions import ValidationError
 from django.test import TestCase
-from lessons.models import LessonRequest, Student, Lesson, Admin,Invoice
+from lessons.models import LessonRequest, Student, Lesson, Admin,Invoice, Transfer
 import datetime
 import pytz
 
@@ -81,24 +81,81 @@ class InvoiceTestCase(TestCase):
         self._assert_invalid_invoice()
 
 
-    """---TEST UNIQUE_REFERENCE_NUMBER PROPERTY---"""
-
-    """---TEST LESSONS PROPERTY---"""
-
-    """---TEST PRICE PROPERTY---"""
-
-
-
-
-
-
-
-
-
-
+    def test_invoice_number_must_be_unique_for_the_student(self):
+        self.invoice.save()
+        self.invoice = Invoice(student=self.student, date=self.invoice.date, invoice_number=self.invoice.invoice_number)
+        self._assert_invalid_invoice()
 
+    def test_invoice_number_can_be_shared_by_students(self):
+        self.invoice.save()
+        other_student = Student.objects.create_user(username='@other', email='other@example.org', first_name='Other', last_name='Student')
+        self.invoice = Invoice(student=other_student, date=self.invoice.date, invoice_number=self.invoice.invoice_number)
+        self._assert_valid_invoice()
 
 
+    """---TEST UNIQUE_REFERENCE_NUMBER PROPERTY---"""
 
+    """---TEST LESSONS PROPERTY---"""
 
+    """---TEST PRICE PROPERTY---"""
 
+    def test_price_is_sum_of_lesson_prices(self):
+        self.invoice.save()
+        self.lesson.save()
+        Lesson.objects.create(student=self.student, invoice=self.invoice, date=self.lesson.date, duration=45, topic="Piano", teacher="bob")
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price, 105)
+
+    def test_price_updates_when_lesson_is_edited(self):
+        self.invoice.save()
+        self.lesson.save()
+        self.lesson.duration = 90
+        self.lesson.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price, 90)
+
+    def test_price_updates_when_lesson_is_deleted(self):
+        self.invoice.save()
+        self.lesson.save()
+        self.lesson.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price, 0)
+
+    def test_saving_invoice_keeps_price(self):
+        self.invoice.save()
+        self.lesson.save()
+        self.invoice.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.price, 60)
+
+    """---TEST AMOUNT_PAID PROPERTY---"""
+
+    def test_amount_paid_follows_transfers(self):
+        self.invoice.save()
+        self.lesson.save()
+        first_transfer = Transfer.objects.create(transfer_id=1, amount_received=20, verifier=self.admin, invoice=self.invoice)
+        Transfer.objects.create(transfer_id=2, amount_received=15, verifier=self.admin, invoice=self.invoice)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, 35)
+        self.assertEqual(self.invoice.amount_pending, 25)
+        first_transfer.amount_received = 45
+        first_transfer.save()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, 60)
+        self.assertTrue(self.invoice.paid)
+        first_transfer.delete()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.amount_paid, 15)
+        self.assertFalse(self.invoice.paid)
+
+    """---TEST WITH_TOTALS---"""
+
+    def test_with_totals_counts_lessons_and_transfers(self):
+        self.invoice.save()
+        self.lesson.save()
+        Lesson.objects.create(student=self.student, invoice=self.invoice, date=self.lesson.date, duration=45, topic="Piano", teacher="bob")
+        for transfer_id in range(1, 4):
+            Transfer.objects.create(transfer_id=transfer_id, amount_received=10, verifier=self.admin, invoice=self.invoice)
+        Invoice.objects.create(student=self.student, date=self.invoice.date, invoice_number=2)
+        counted = {invoice.invoice_number: (invoice.lesson_count, invoice.transfer_count) for invoice in Invoice.objects.with_totals()}
+        self.assertEqual(counted, {1: (2, 3), 2: (0, 0)})
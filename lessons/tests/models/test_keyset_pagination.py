@@ -0,0 +1,65 @@
+from django.core.exceptions import BadRequest
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+from lessons.models import Student, Admin, Lesson, Invoice, Transfer
+from lessons.pagination import keyset_page, page_size_from, MAX_PAGE_SIZE
+from lessons.tests.helpers import create_lesson_set
+import datetime
+
+class KeysetPaginationTestCase(TestCase):
+    """Tests for the keyset pagination of the admin lists"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json', 'lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        # Every lesson has the same date, so the pages are told apart by id
+        create_lesson_set(self.student, 0, 10)
+
+    def _all_pages(self, queryset, ordering, page_size):
+        pages = [keyset_page(queryset, ordering, page_size=page_size)]
+        while pages[-1].has_next:
+            pages.append(keyset_page(queryset, ordering, pages[-1].next_cursor, page_size))
+        return pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        pages = self._all_pages(Lesson.objects.all(), ['date', 'id'], 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([lesson.id for page in pages for lesson in page], list(Lesson.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_last_page_has_no_next_cursor(self):
+        page = keyset_page(Lesson.objects.all(), ['date', 'id'], page_size=10)
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_next)
+
+    def test_descending_ordering(self):
+        invoice = Invoice.objects.get()
+        for count in range(5):
+            Transfer.objects.create(
+                date_received=timezone.now() - datetime.timedelta(days=count % 2),
+                transfer_id=count, amount_received=1, verifier=self.admin, invoice=invoice,
+            )
+        pages = self._all_pages(Transfer.objects.all(), ['-date_received', '-id'], 2)
+        transfers = [transfer for page in pages for transfer in page]
+        self.assertEqual(transfers, list(Transfer.objects.order_by('-date_received', '-id')))
+
+    def test_rows_removed_before_the_cursor_do_not_shift_later_pages(self):
+        first_page = keyset_page(Lesson.objects.all(), ['id'], page_size=4)
+        Lesson.objects.filter(id=first_page.items[0].id).delete()
+        second_page = keyset_page(Lesson.objects.all(), ['id'], first_page.next_cursor, 4)
+        self.assertEqual(second_page.items[0].id, first_page.items[-1].id + 1)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        with self.assertRaises(BadRequest):
+            keyset_page(Lesson.objects.all(), ['date', 'id'], cursor='not a cursor')
+        cursor_for_other_ordering = keyset_page(Lesson.objects.all(), ['id'], page_size=1).next_cursor
+        with self.assertRaises(BadRequest):
+            keyset_page(Lesson.objects.all(), ['date', 'id'], cursor=cursor_for_other_ordering)
+
+    def test_page_size_is_limited(self):
+        factory = RequestFactory()
+        self.assertEqual(page_size_from(factory.get('/', {'page_size': 10})), 10)
+        self.assertEqual(page_size_from(factory.get('/', {'page_size': 100000})), MAX_PAGE_SIZE)
+        self.assertEqual(page_size_from(factory.get('/', {'page_size': 0})), 1)
+        self.assertEqual(page_size_from(factory.get('/', {'page_size': 'many'}), default=20), 20)
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.utils import timezone
+from lessons.booking import book_lessons
+from lessons.models import Lesson, LessonRequest, Student, Term
+from lessons.scheduling import SCHEDULING_DAYS, available_days, available_from, schedule_requests
+import datetime
+
+
+class LessonSchedulingTestCase(TestCase):
+    """Unit tests for scheduling every open lesson request into a term"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json', 'lessons/tests/fixtures/other_students.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        start_date = (timezone.now() + datetime.timedelta(weeks=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.term = Term.objects.create(name="Next Term", start_date=start_date, end_date=start_date + datetime.timedelta(weeks=10))
+
+    def _request(self, author, availability="Monday", lessonNum=4, interval=1, duration=60, teacher="Mr Bob"):
+        return LessonRequest.objects.create(author=author, availability=availability, lessonNum=lessonNum,
+                                            interval=interval, duration=duration, topic="Piano", teacher=teacher)
+
+    def _assert_no_clashes(self, placements):
+        lessons = [(lesson_request, date) for lesson_request, dates in placements for date in dates]
+        for position, (lesson_request, date) in enumerate(lessons):
+            for other_request, other_date in lessons[position + 1:]:
+                overlap = date < other_date + datetime.timedelta(minutes=other_request.duration) \
+                    and other_date < date + datetime.timedelta(minutes=lesson_request.duration)
+                shared = lesson_request.teacher == other_request.teacher or lesson_request.author_id == other_request.author_id
+                self.assertFalse(overlap and shared, f'Requests {lesson_request.id} and {other_request.id} clash')
+
+    def test_availability_days(self):
+        self.assertEqual(available_days("Monday"), ["Monday"])
+        self.assertEqual(available_days("tue or THURSDAY"), ["Tuesday", "Thursday"])
+        self.assertEqual(available_days("Whenever"), SCHEDULING_DAYS)
+
+    def test_availability_start(self):
+        self.assertEqual(available_from("01/12/2026 - 01/03/2027").date(), datetime.date(2026, 12, 1))
+        self.assertIsNone(available_from("Monday"))
+        self.assertIsNone(available_from("31/02/2026"))
+
+    def test_requests_of_one_teacher_do_not_clash(self):
+        lesson_requests = [self._request(self.student if count % 2 else self.other_student) for count in range(6)]
+        placements, unplaced = schedule_requests(lesson_requests, self.term)
+        self.assertEqual(len(placements), 6)
+        self.assertEqual(unplaced, {})
+        self._assert_no_clashes(placements)
+        for _, dates in placements:
+            self.assertTrue(all(date.strftime('%A') == "Monday" for date in dates))
+
+    def test_lessons_fall_inside_the_term(self):
+        lesson_request = self._request(self.student, lessonNum=5, interval=2)
+        placements, _ = schedule_requests([lesson_request], self.term)
+        _, dates = placements[0]
+        self.assertGreaterEqual(dates[0], self.term.start_date)
+        self.assertLessEqual(dates[-1] + datetime.timedelta(minutes=60), self.term.end_date)
+
+    def test_requests_too_long_for_the_term_are_not_placed(self):
+        lesson_request = self._request(self.student, lessonNum=8, interval=2)
+        placements, unplaced = schedule_requests([lesson_request], self.term)
+        self.assertEqual(placements, [])
+        self.assertIn("No slot in Next Term", unplaced[lesson_request.id])
+
+    def test_booked_lessons_are_avoided(self):
+        book_lessons(student=self.other_student, start_date=self.term.start_date, time=datetime.time(9, 0), day="Monday",
+                     interval_between_lessons=1, number_of_lessons=9, duration=60, topic="Piano", teacher="Mr Bob")
+        placements, _ = schedule_requests([self._request(self.student)], self.term)
+        _, dates = placements[0]
+        self.assertGreaterEqual(dates[0].hour, 10)
+
+    def test_requests_without_a_teacher_are_not_placed(self):
+        lesson_request = self._request(self.student, teacher="")
+        placements, unplaced = schedule_requests([lesson_request], self.term)
+        self.assertEqual(placements, [])
+        self.assertIn("No teacher was requested", unplaced[lesson_request.id])
+
+    def test_outdated_term_places_nothing(self):
+        lesson_request = self._request(self.student)
+        placements, unplaced = schedule_requests([lesson_request], self.term, now=self.term.end_date + datetime.timedelta(days=1))
+        self.assertEqual(placements, [])
+        self.assertIn("out of date", unplaced[lesson_request.id])
+
+    def test_many_requests_are_placed_without_clashes(self):
+        students = [self.student, self.other_student]
+        lesson_requests = [
+            self._request(students[count % 2], availability=["Monday", "Tue/Thu", ""][count % 3], lessonNum=1 + count % 5,
+                          interval=1 + count % 2, duration=[30, 45, 60, 90, 120][count % 5], teacher=f"Teacher {count % 3}")
+            for count in range(60)
+        ]
+        with self.assertNumQueries(1):
+            placements, unplaced = schedule_requests(lesson_requests, self.term)
+        self.assertEqual(len(placements) + len(unplaced), 60)
+        self._assert_no_clashes(placements)
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from lessons.booking import book_lessons
+from lessons.models import Lesson, Student, Term
+from lessons.occupancy import OccupancyIndex, get_occupancy_index
+from django.utils import timezone
+import datetime
+
+
+class OccupancyIndexTestCase(TestCase):
+    """Unit tests for the index of the lessons teachers and students are busy with"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        start_date = (timezone.now() + datetime.timedelta(weeks=2)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.term = Term.objects.create(name="Next Term", start_date=start_date, end_date=start_date + datetime.timedelta(weeks=10))
+        self.monday = self.term.start_date + datetime.timedelta(days=(7 - self.term.start_date.weekday()) % 7)
+        self.invoice = book_lessons(
+            student=self.student, start_date=self.term.start_date, time=datetime.time(12, 0), day="Monday",
+            interval_between_lessons=1, number_of_lessons=4, duration=60, topic="Piano", teacher="Mr Bob",
+        )
+
+    def _at(self, hour, minute=0, weeks=0):
+        return self.monday + datetime.timedelta(weeks=weeks, hours=hour, minutes=minute)
+
+    def test_overlapping_lessons_clash(self):
+        index = get_occupancy_index(self.term)
+        self.assertEqual(len(index.clashes(self._at(12, 30), 30, teacher="Mr Bob")), 1)
+        self.assertEqual(len(index.clashes(self._at(11, 30), 60, student_id=self.student.id)), 1)
+        self.assertEqual(len(index.clashes(self._at(11), 120, teacher="Mr Bob", student_id=self.student.id)), 2)
+
+    def test_touching_lessons_do_not_clash(self):
+        index = get_occupancy_index(self.term)
+        self.assertEqual(index.clashes(self._at(13), 60, teacher="Mr Bob"), [])
+        self.assertEqual(index.clashes(self._at(11), 60, teacher="Mr Bob"), [])
+
+    def test_other_teachers_do_not_clash(self):
+        index = get_occupancy_index(self.term)
+        self.assertEqual(index.clashes(self._at(12), 60, teacher="Mrs Sax"), [])
+
+    def test_long_lessons_starting_earlier_clash(self):
+        index = OccupancyIndex(self.term.start_date, self.term.end_date, [
+            (1, "Mr Bob", 1, self._at(9), 30),
+            (2, "Mr Bob", 1, self._at(10), 120),
+        ])
+        self.assertEqual(len(index.clashes(self._at(11, 45), 30, teacher="Mr Bob")), 1)
+
+    def test_index_is_loaded_once(self):
+        get_occupancy_index(self.term)
+        with self.assertNumQueries(0):
+            get_occupancy_index(self.term).series_clashes([self._at(12, weeks=week) for week in range(4)], 60, "Mr Bob", self.student.id)
+
+    def test_booked_lessons_are_added(self):
+        index = get_occupancy_index(self.term)
+        book_lessons(
+            student=self.student, start_date=self.term.start_date, time=datetime.time(15, 0), day="Monday",
+            interval_between_lessons=1, number_of_lessons=2, duration=30, topic="Piano", teacher="Mrs Sax",
+        )
+        self.assertIs(get_occupancy_index(self.term), index)
+        self.assertEqual(len(index.clashes(self._at(15), 30, teacher="Mrs Sax")), 1)
+
+    def test_moved_and_deleted_lessons_are_updated(self):
+        index = get_occupancy_index(self.term)
+        lessons = list(Lesson.objects.filter(invoice=self.invoice).order_by('date'))
+        lessons[0].date = self._at(16)
+        lessons[0].save()
+        self.assertEqual(index.clashes(self._at(12), 60, teacher="Mr Bob"), [])
+        self.assertEqual(len(index.clashes(self._at(16), 60, teacher="Mr Bob")), 1)
+        lessons[1].delete()
+        self.assertEqual(index.clashes(self._at(12, weeks=1), 60, teacher="Mr Bob"), [])
+
+    def test_free_times_are_nearest_first(self):
+        index = get_occupancy_index(self.term)
+        dates = [self._at(12, weeks=week) for week in range(4)]
+        self.assertEqual(index.free_times(dates, 60, teacher="Mr Bob"), [datetime.time(11), datetime.time(13), datetime.time(10, 45)])
@@ -0,0 +1,62 @@
+from django.db import connections, router
+from django.test import TestCase, override_settings
+from lessons.models import Student, Transfer
+from lessons.reporting import REPORTING_DATABASE, ReportingError, primary_reads, refresh_snapshot, reporting_reads, snapshot_age
+from unittest import mock
+import os
+import tempfile
+
+class ReportingRouterTestCase(TestCase):
+    """Tests for routing the reads of reports to the reporting snapshot"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot = os.path.join(directory.name, 'reporting.sqlite3')
+        patcher = mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': self.snapshot})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_the_primary_outside_reports(self):
+        with mock.patch('lessons.reporting.snapshot_age', return_value=0):
+            self.assertEqual(Transfer.objects.all().db, 'default')
+
+    def test_reports_read_from_a_fresh_snapshot(self):
+        with mock.patch('lessons.reporting.snapshot_age', return_value=0), reporting_reads():
+            self.assertEqual(Transfer.objects.all().db, REPORTING_DATABASE)
+            with primary_reads():
+                self.assertEqual(Transfer.objects.all().db, 'default')
+
+    def test_reports_read_from_the_primary_without_a_snapshot(self):
+        self.assertIsNone(snapshot_age())
+        with reporting_reads():
+            self.assertEqual(Transfer.objects.all().db, 'default')
+
+    @override_settings(REPORTING_MAX_STALENESS=60)
+    def test_reports_read_from_the_primary_once_the_snapshot_is_stale(self):
+        with mock.patch('lessons.reporting.snapshot_age', return_value=61), reporting_reads():
+            self.assertEqual(Transfer.objects.all().db, 'default')
+
+    @override_settings(REPORTING_FORCE_PRIMARY=True)
+    def test_reports_read_from_the_primary_when_forced(self):
+        with mock.patch('lessons.reporting.snapshot_age', return_value=0), reporting_reads():
+            self.assertEqual(Transfer.objects.all().db, 'default')
+
+    def test_writes_go_to_the_primary(self):
+        with mock.patch('lessons.reporting.snapshot_age', return_value=0), reporting_reads():
+            self.assertEqual(router.db_for_write(Student, instance=Student(id=1)), 'default')
+
+    def test_refresh_refuses_to_copy_inside_a_transaction(self):
+        with self.assertRaises(ReportingError):
+            refresh_snapshot()
+
+    def test_refresh_refuses_to_copy_the_primary_over_itself(self):
+        with mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': connections['default'].settings_dict['NAME']}):
+            with self.assertRaises(ReportingError):
+                refresh_snapshot()
+
+    def test_snapshot_connections_are_never_persistent(self):
+        # A persistent connection would keep reading the snapshot file replaced by the next refresh
+        self.assertEqual(connections[REPORTING_DATABASE].settings_dict['CONN_MAX_AGE'], 0)
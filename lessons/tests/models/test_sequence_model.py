@@ -0,0 +1,46 @@
+from django.test import TestCase
+from django.utils import timezone
+from lessons.models import Sequence, Student, Admin, Invoice, Transfer
+from lessons.helpers import reserve_sequence_values, find_next_available_transfer_id,\
+    find_next_available_invoice_number_for_student, reserve_invoice_numbers_for_student
+
+
+class SequenceTestCase(TestCase):
+    """Unit tests for the sequence model and the numbers it hands out"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+
+    def test_new_sequence_starts_after_last_used_value(self):
+        self.assertEqual(list(reserve_sequence_values('test', 3, lambda: 10)), [11, 12, 13])
+        self.assertEqual(Sequence.objects.get(name='test').value, 13)
+
+    def test_values_are_never_handed_out_twice(self):
+        values = [reserve_sequence_values('test')[0] for count in range(5)]
+        values += list(reserve_sequence_values('test', 5))
+        self.assertEqual(values, list(range(1, 11)))
+
+    def test_reserving_costs_no_scan_once_sequence_exists(self):
+        find_next_available_transfer_id()
+        # Savepoint, UPDATE, SELECT and release
+        with self.assertNumQueries(4):
+            find_next_available_transfer_id()
+
+    def test_transfer_ids_carry_on_from_existing_transfers(self):
+        invoice = Invoice.objects.get(invoice_number=100)
+        Transfer.objects.create(date_received=timezone.now(), transfer_id=41, amount_received=10, verifier=self.admin, invoice=invoice)
+        Transfer.objects.create(date_received=timezone.now() - timezone.timedelta(days=1), transfer_id=42, amount_received=10, verifier=self.admin, invoice=invoice)
+        self.assertEqual(find_next_available_transfer_id(), 43)
+        self.assertEqual(find_next_available_transfer_id(), 44)
+
+    def test_invoice_numbers_are_per_student(self):
+        self.assertEqual(find_next_available_invoice_number_for_student(self.student), 101)
+        self.assertEqual(list(reserve_invoice_numbers_for_student(self.student.id, 2)), [102, 103])
+        self.assertEqual(list(reserve_invoice_numbers_for_student(self.admin.id, 2)), [1, 2])
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from lessons.database import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+class SQLitePragmasTestCase(TestCase):
+    """Tests for the pragmas set on every new SQLite connection"""
+
+    def _pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        self.assertEqual(self._pragma('cache_size'), settings.SQLITE_PRAGMAS['cache_size'])
+        self.assertEqual(self._pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        # synchronous=NORMAL is 1
+        self.assertEqual(self._pragma('synchronous'), 1)
+
+    def test_applied_values_are_returned(self):
+        applied = apply_sqlite_pragmas(connection, {'cache_size': -4000})
+        self.assertEqual(applied, {'cache_size': -4000})
+        apply_sqlite_pragmas(connection, {'cache_size': settings.SQLITE_PRAGMAS['cache_size']})
+
+    def test_in_memory_databases_keep_their_journal_in_memory(self):
+        applied = apply_sqlite_pragmas(connection, {'journal_mode': DEFAULT_SQLITE_PRAGMAS['journal_mode']})
+        self.assertEqual(applied, {'journal_mode': 'memory'})
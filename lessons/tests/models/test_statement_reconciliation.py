@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.utils import timezone
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+from lessons.reconciliation import StatementError, reconcile_statement
+import datetime
+import pytz
+
+class StatementReconciliationTestCase(TestCase):
+    """Tests for reconciling bank statements against invoices"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.invoices = []
+        for count in range(1, 4):
+            invoice = Invoice.objects.create(date=timezone.now(), invoice_number=count, student=self.student)
+            Lesson.objects.create(student=self.student, invoice=invoice, duration=60, date=timezone.now())
+            self.invoices.append(invoice)
+
+    def _statement(self, *lines):
+        return ['date,reference,amount\n'] + [f'{line}\n' for line in lines]
+
+    def _reference(self, invoice_number):
+        return f'{self.student.id}-{invoice_number}'
+
+    def test_matched_lines_become_transfers_and_update_invoice_totals(self):
+        report = reconcile_statement(self._statement(
+            f'2022-10-10,{self._reference(1)},60',
+            f'11/10/2022,{self._reference(2)},£20.00',
+        ), self.admin)
+        self.assertEqual(report.summary(), {'transfers_created': 2, 'amount_received': 80, 'unmatched': 0, 'overpaid': 0, 'duplicates': 0})
+        transfer = Transfer.objects.get(invoice=self.invoices[1])
+        self.assertEqual(transfer.amount_received, 20)
+        self.assertEqual(transfer.date_received, datetime.datetime(2022, 10, 11, tzinfo=pytz.UTC))
+        self.assertEqual(transfer.verifier, self.admin)
+        self.assertTrue(Invoice.objects.get(id=self.invoices[0].id).paid)
+        self.assertEqual(Invoice.objects.get(id=self.invoices[1].id).total_paid, 20)
+        self.assertEqual(len(set(Transfer.objects.values_list('transfer_id', flat=True))), 2)
+
+    def test_unmatched_and_invalid_lines_are_reported(self):
+        report = reconcile_statement(self._statement(
+            f'2022-10-10,{self._reference(99)},60',
+            '2022-10-10,not a reference,60',
+            f'yesterday,{self._reference(1)},60',
+            f'2022-10-10,{self._reference(1)},12.50',
+            f'2022-10-10,{self._reference(1)},-60',
+        ), self.admin)
+        self.assertEqual(report.transfers_created, 0)
+        self.assertEqual([line['line'] for line in report.unmatched], [3, 4, 5, 6, 2])
+        self.assertEqual(report.unmatched[-1]['detail'], 'No invoice has this reference')
+
+    def test_overpaying_lines_are_paid_in_and_reported(self):
+        report = reconcile_statement(self._statement(
+            f'2022-10-10,{self._reference(1)},40',
+            f'2022-10-11,{self._reference(1)},40',
+        ), self.admin)
+        self.assertEqual(report.transfers_created, 2)
+        self.assertEqual([line['line'] for line in report.overpaid], [3])
+        self.assertEqual(report.overpaid[0]['detail'], f'Invoice {self._reference(1)} is overpaid by £20')
+
+    def test_repeated_lines_and_already_received_payments_are_duplicates(self):
+        reconcile_statement(self._statement(f'2022-10-10,{self._reference(1)},30'), self.admin)
+        report = reconcile_statement(self._statement(
+            f'2022-10-10,{self._reference(1)},30',
+            f'2022-10-12,{self._reference(2)},30',
+            f'2022-10-12,{self._reference(2)},30',
+        ), self.admin, batch_size=2)
+        self.assertEqual(report.transfers_created, 1)
+        self.assertEqual([line['line'] for line in report.duplicates], [2, 4])
+        self.assertEqual(Transfer.objects.count(), 2)
+
+    def test_queries_do_not_grow_with_lines_in_a_batch(self):
+        # The first transfers create the transfer id sequence
+        reconcile_statement(self._statement(f'2022-10-09,{self._reference(3)},1'), self.admin)
+        few = self._statement(*[f'2022-10-10,{self._reference(1)},{amount}' for amount in range(1, 3)])
+        many = self._statement(*[f'2022-10-11,{self._reference(2)},{amount}' for amount in range(1, 30)])
+        # Including the one update of when the pages of the students paying changed
+        with self.assertNumQueries(11):
+            reconcile_statement(few, self.admin)
+        with self.assertNumQueries(11):
+            reconcile_statement(many, self.admin)
+
+    def test_statement_without_the_expected_columns_is_an_error(self):
+        with self.assertRaises(StatementError):
+            reconcile_statement(['date,amount\n', '2022-10-10,60\n'], self.admin)
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from lessons.models import Term
+from lessons.terms import TermCalendar, _bump_version, get_term_calendar
+from lessons.helpers import get_next_term, does_date_fall_in_an_existing_term, are_all_terms_outdated, are_there_any_terms
+from django.utils import timezone
+import datetime
+
+
+class TermCalendarTestCase(TestCase):
+    """Unit tests for the cached term calendar"""
+
+    def setUp(self):
+        self.week = datetime.timedelta(weeks=1)
+        now = timezone.now()
+        self.past_term = Term.objects.create(name="Past Term", start_date=now - 10 * self.week, end_date=now - 5 * self.week)
+        self.next_term = Term.objects.create(name="Next Term", start_date=now + 2 * self.week, end_date=now + 8 * self.week)
+        self.later_term = Term.objects.create(name="Later Term", start_date=now + 10 * self.week, end_date=now + 16 * self.week)
+
+    def test_term_containing_date(self):
+        calendar = get_term_calendar()
+        self.assertEqual(calendar.term_containing(self.next_term.start_date), self.next_term)
+        self.assertEqual(calendar.term_containing(self.next_term.end_date), self.next_term)
+        self.assertEqual(calendar.term_containing(self.later_term.start_date + self.week), self.later_term)
+        self.assertIsNone(calendar.term_containing(timezone.now()))
+        self.assertIsNone(calendar.term_containing(self.past_term.start_date - self.week))
+
+    def test_term_containing_date_inside_enclosing_term(self):
+        enclosing_term = Term(name="Long Term", start_date=self.past_term.start_date - self.week, end_date=self.later_term.end_date)
+        calendar = TermCalendar([self.past_term, enclosing_term, self.next_term])
+        self.assertEqual(calendar.term_containing(self.next_term.end_date + self.week), enclosing_term)
+
+    def test_next_term(self):
+        self.assertEqual(get_next_term(), self.next_term)
+        self.assertEqual(get_term_calendar().next_term(self.next_term.start_date + self.week), self.next_term)
+        self.assertEqual(get_term_calendar().next_term(self.next_term.end_date + self.week), self.later_term)
+        self.assertIsNone(get_term_calendar().next_term(self.later_term.end_date + self.week))
+
+    def test_helpers_load_terms_once(self):
+        get_next_term()
+        with self.assertNumQueries(0):
+            get_next_term()
+            does_date_fall_in_an_existing_term(timezone.now())
+            are_all_terms_outdated()
+            are_there_any_terms()
+
+    def test_calendar_is_reloaded_after_terms_change(self):
+        self.assertFalse(are_all_terms_outdated())
+        self.next_term.delete()
+        self.later_term.delete()
+        self.assertTrue(are_all_terms_outdated())
+        self.past_term.end_date = timezone.now() + self.week
+        self.past_term.save()
+        self.assertEqual(get_next_term(), self.past_term)
+        Term.objects.all().delete()
+        self.assertFalse(are_there_any_terms())
+        self.assertIsNone(get_next_term())
+
+    def test_calendar_is_reloaded_when_another_process_changes_terms(self):
+        self.assertEqual(get_term_calendar().term_named("Next Term"), self.next_term)
+        # Written without signals, as if by another process, which bumps the shared version
+        Term.objects.filter(id=self.next_term.id).update(name="Renamed Term")
+        self.assertIsNotNone(get_term_calendar().term_named("Next Term"))
+        _bump_version()
+        self.assertIsNone(get_term_calendar().term_named("Next Term"))
+        self.assertIsNotNone(get_term_calendar().term_named("Renamed Term"))
@@ -0,0 +1,49 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from lessons.helpers import find_next_available_student_number, find_next_available_transfer_id
+from lessons.models import User, Student, StudentProfile, Guardian, GuardianProfile, Invoice, Lesson, Transfer, Term
+from lessons.scale_seeding import seed_at_scale
+
+
+class ScaleSeedingTestCase(TestCase):
+    """Tests for seeding a database in bulk at a chosen scale"""
+
+    def setUp(self):
+        self.created = seed_at_scale(50, batch_size=20)
+
+    def test_creates_the_reported_number_of_rows(self):
+        self.assertEqual(Student.students.count(), 50)
+        self.assertEqual(StudentProfile.objects.count(), 50)
+        self.assertEqual(Guardian.guardians.count(), self.created['guardians'])
+        self.assertEqual(Term.objects.count(), 6)
+        self.assertEqual(Invoice.objects.count(), self.created['invoices'])
+        self.assertEqual(Lesson.objects.count(), self.created['lessons'])
+        self.assertEqual(Transfer.objects.count(), self.created['transfers'])
+
+    def test_every_guardian_has_children(self):
+        self.assertFalse(Guardian.guardians.exclude(id__in=GuardianProfile.objects.values('user_id')).exists())
+
+    def test_stored_invoice_totals_are_correct(self):
+        call_command('rebuild_invoice_totals', check=True, stdout=StringIO())
+
+    def test_sequences_carry_on_after_the_seeded_rows(self):
+        self.assertNotIn(find_next_available_student_number(), StudentProfile.objects.values_list('student_number', flat=True))
+        self.assertNotIn(find_next_available_transfer_id(), Transfer.objects.values_list('transfer_id', flat=True))
+
+    def test_same_seed_generates_the_same_rows(self):
+        emails = list(Student.students.order_by('id').values_list('email', flat=True))
+        call_command('unseed')
+        seed_at_scale(50, batch_size=20)
+        self.assertEqual(list(Student.students.order_by('id').values_list('email', flat=True)), emails)
+
+    def test_rows_are_the_same_when_generated_in_parallel(self):
+        invoices = list(Invoice.objects.order_by('id').values_list('invoice_number', 'total_price', 'total_paid'))
+        call_command('unseed')
+        seed_at_scale(50, batch_size=20, processes=2)
+        self.assertEqual(list(Invoice.objects.order_by('id').values_list('invoice_number', 'total_price', 'total_paid')), invoices)
+
+    def test_seed_command_seeds_at_scale(self):
+        call_command('seed', scale=30, batch_size=10)
+        self.assertEqual(Student.students.count(), 30)
+        self.assertTrue(User.objects.filter(email='petra.pickles@example.org').exists())
@@ -3,6 +3,7 @@ from django.urls import reverse
 from django.utils import timezone
 from lessons.models import Student, Admin, Lesson, Invoice, Transfer
 from lessons.helpers import find_next_available_transfer_id
+from lessons.balances import students_with_outstanding_balance
 
 class AdminAllBalancesView(TestCase):
     """Tests of the balance view."""
@@ -75,4 +76,51 @@ class AdminAllBalancesView(TestCase):
         response = self.client.get(self.url, follow=True)
         self.assertContains(response, 'No balances to see')
 
+    def test_balances_match_per_invoice_calculation(self):
+        self.invoice.save()
+        self.lesson.save()
+        underpaid_invoice = Invoice.objects.create(date=timezone.now(), invoice_number=101, student=self.other_student)
+        Lesson.objects.create(student=self.other_student, invoice=underpaid_invoice, duration=90, date=timezone.now())
+        Transfer.objects.create(date_received=timezone.now(), amount_received=30, transfer_id=find_next_available_transfer_id(), verifier=self.admin, invoice=underpaid_invoice)
+        Transfer.objects.create(date_received=timezone.now(), amount_received=20, transfer_id=find_next_available_transfer_id(), verifier=self.admin, invoice=underpaid_invoice)
+        paid_invoice = Invoice.objects.create(date=timezone.now(), invoice_number=102, student=self.other_student)
+        Lesson.objects.create(student=self.other_student, invoice=paid_invoice, duration=45, date=timezone.now())
+        Transfer.objects.create(date_received=timezone.now(), amount_received=45, transfer_id=find_next_available_transfer_id(), verifier=self.admin, invoice=paid_invoice)
+
+        for student in students_with_outstanding_balance():
+            self.assertEqual(student.outstanding_balance, self._per_invoice_balance(student))
+        self.client.login(username=self.admin.email, password='Password123')
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['balances'], {self.student: 100, self.other_student: 50})
+
+    def test_balance_query_count_does_not_grow_with_students(self):
+        for count in range(10):
+            student = Student.objects.create_user(username=f'@student{count}', email=f'student{count}@example.org', first_name='Student', last_name=f'{count}')
+            invoice = Invoice.objects.create(date=timezone.now(), invoice_number=count, student=student)
+            Lesson.objects.create(student=student, invoice=invoice, duration=60, date=timezone.now())
+        self.client.login(username=self.admin.email, password='Password123')
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['balances']), 10)
+
+    def test_balances_are_paginated(self):
+        for count in range(5):
+            student = Student.objects.create_user(username=f'@student{count}', email=f'student{count}@example.org', first_name='Student', last_name=f'{count}')
+            invoice = Invoice.objects.create(date=timezone.now(), invoice_number=count, student=student)
+            Lesson.objects.create(student=student, invoice=invoice, duration=60, date=timezone.now())
+        self.client.login(username=self.admin.email, password='Password123')
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(len(response.context['balances']), 3)
+        self.assertContains(response, 'data-load-more="/admin/payments/balances?cursor=')
+        response = self.client.get(reverse('balances_page'), {'cursor': response.context['balance_page'].next_cursor})
+        self.assertTemplateUsed(response, 'partials/balance_cards.html')
+        self.assertEqual([student.last_name for student in response.context['balances']], ['3', '4'])
 
+    def _per_invoice_balance(self, student):
+        balance = 0
+        for invoice in Invoice.objects.filter(student=student):
+            if Transfer.objects.filter(invoice=invoice).count() == 0:
+                balance += invoice.price
+        for paid_amount in Student.objects.get(id=student.id).underpaid_invoices.values():
+            balance += paid_amount
+        return balance
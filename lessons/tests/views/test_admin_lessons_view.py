@@ -0,0 +1,58 @@
+from django.test import TestCase
+from django.urls import reverse
+from lessons.models import Student, Admin
+from lessons.tests.helpers import create_lesson_set
+
+class AdminLessonsViewTestCase(TestCase):
+    """Tests for the paginated admin-only lessons list view"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json', 'lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        self.url = reverse('admin_lessons')
+        self.page_url = reverse('admin_lessons_page')
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        create_lesson_set(self.student, 0, 5)
+
+    def test_request_url(self):
+        self.assertEqual(self.url, '/admin/lessons/')
+        self.assertEqual(self.page_url, '/admin/lessons/page/')
+
+    def test_get_request_as_student(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.page_url, follow=True)
+        self.assertRedirects(response, reverse('student_home'), status_code=302, target_status_code=200)
+
+    def test_first_page_has_load_more_button(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertTemplateUsed(response, 'admin_lesson_list.html')
+        self.assertEqual(len(response.context['lessons']), 2)
+        self.assertContains(response, 'Lesson__1')
+        self.assertNotContains(response, 'Lesson__2')
+        self.assertContains(response, 'data-load-more="/admin/lessons/page/?cursor=')
+
+    def test_load_more_returns_the_next_page_only(self):
+        self.client.force_login(self.admin)
+        cursor = self.client.get(self.url, {'page_size': 2}).context['lessons'].next_cursor
+        response = self.client.get(self.page_url, {'cursor': cursor, 'page_size': 10})
+        self.assertTemplateUsed(response, 'partials/admin_lesson_page.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertNotContains(response, 'Lesson__1')
+        self.assertContains(response, 'Lesson__2')
+        self.assertContains(response, 'Lesson__4')
+        self.assertNotContains(response, 'Load more')
+
+    def test_load_more_keeps_the_page_size(self):
+        self.client.force_login(self.admin)
+        first_page = self.client.get(self.url, {'page_size': 2}).context['lessons']
+        self.assertIn('page_size=2', first_page.next_query)
+        response = self.client.get(f'{self.page_url}?{first_page.next_query}')
+        self.assertEqual(len(response.context['lessons']), 2)
+        self.assertContains(response, 'page_size=2')
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.page_url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
@@ -33,4 +33,14 @@ class ShowAdminRequestListViewTestCase(TestCase):
     def test_not_logged_in_get_request(self):
         redirect_url = reverse("log_in") + f"?next={self.url}"
         response = self.client.get(self.url)
-        self.assertRedirects(response, redirect_url, status_code=302, target_status_code=200)
\ No newline at end of file
+        self.assertRedirects(response, redirect_url, status_code=302, target_status_code=200)
+
+    def test_requests_are_paginated(self):
+        create_requests(self.student, 0, 5)
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual([request.availability for request in response.context['data']], ['Request__0', 'Request__1', 'Request__2'])
+        response = self.client.get(reverse('admin_requests_page'), {'cursor': response.context['data'].next_cursor})
+        self.assertTemplateUsed(response, 'partials/admin_request_page.html')
+        self.assertEqual([request.availability for request in response.context['data']], ['Request__3', 'Request__4'])
+        self.assertNotContains(response, 'Load more')
@@ -0,0 +1,51 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from lessons.models import Student, Admin, Invoice, Transfer
+import datetime
+
+class AdminTransfersViewTestCase(TestCase):
+    """Tests for the paginated admin-only transfers list view"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    def setUp(self):
+        self.url = reverse('admin_transfers')
+        self.page_url = reverse('admin_transfers_page')
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        invoice = Invoice.objects.get(invoice_number=100)
+        for count in range(1, 6):
+            Transfer.objects.create(
+                date_received=timezone.now() - datetime.timedelta(days=count),
+                transfer_id=count, amount_received=count * 10, verifier=self.admin, invoice=invoice,
+            )
+
+    def test_request_url(self):
+        self.assertEqual(self.url, '/admin/all_transfers')
+        self.assertEqual(self.page_url, '/admin/all_transfers/page')
+
+    def test_newest_transfers_come_first_with_total_of_all_transfers(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertTemplateUsed(response, 'all_transfers.html')
+        self.assertEqual([transfer.transfer_id for transfer in response.context['transfers']], [1, 2])
+        self.assertEqual(response.context['total_revenue'], 150)
+        self.assertContains(response, 'Load more')
+
+    def test_load_more_returns_table_rows_of_the_next_page(self):
+        self.client.force_login(self.admin)
+        cursor = self.client.get(self.url, {'page_size': 2}).context['transfers'].next_cursor
+        response = self.client.get(self.page_url, {'cursor': cursor, 'page_size': 2})
+        self.assertTemplateUsed(response, 'partials/admin_transfer_rows.html')
+        self.assertEqual([transfer.transfer_id for transfer in response.context['transfers']], [3, 4])
+        self.assertContains(response, '<tr class="load-more">')
+
+    def test_get_request_as_student(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.page_url, follow=True)
+        self.assertRedirects(response, reverse('student_home'), status_code=302, target_status_code=200)
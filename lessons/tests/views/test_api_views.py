@@ -0,0 +1,115 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+import gzip
+import json
+
+class ApiViewsTestCase(TestCase):
+    """Tests for the read-only JSON API of the schedule, invoices and balance"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.client.force_login(self.student)
+
+    def _book(self, student, count, paid=0):
+        """Books count invoices for the student, each with a lesson next week and paid towards with the given amount"""
+        for number in range(1, count + 1):
+            invoice = Invoice.objects.create(date=timezone.now(), invoice_number=number, student=student)
+            Lesson.objects.create(student=student, invoice=invoice, duration=60, topic="Drums", teacher="Mr Jim",
+                                  date=timezone.now() + timezone.timedelta(days=7, hours=number))
+            if paid:
+                Transfer.objects.create(transfer_id=student.id * 100 + number, amount_received=paid, verifier=self.admin, invoice=invoice)
+
+    def _get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_api_urls(self):
+        self.assertEqual(reverse('api_schedule'), '/api/schedule/')
+        self.assertEqual(reverse('api_invoices'), '/api/invoices/')
+        self.assertEqual(reverse('api_balance'), '/api/balance/')
+
+    def test_schedule_lists_only_the_lessons_of_the_student(self):
+        self._book(self.student, 2)
+        self._book(self.other_student, 3)
+        payload = self._get('api_schedule')
+        self.assertEqual([lesson['id'] for lesson in payload['results']],
+                         list(Lesson.objects.filter(student=self.student).order_by('date', 'id').values_list('id', flat=True)))
+        self.assertEqual(payload['results'][0]['lesson_price'], 60)
+        self.assertIsNone(payload['next'])
+
+    def test_invoices_show_what_is_paid(self):
+        self._book(self.student, 2, paid=60)
+        invoice = self._get('api_invoices')['results'][0]
+        self.assertEqual(invoice['reference_number'], f'{self.student.id}-1')
+        self.assertEqual(invoice['amount_pending'], 0)
+        self.assertTrue(invoice['paid'])
+
+    def test_balance_matches_the_balance_page(self):
+        self._book(self.student, 3, paid=20)
+        payload = self._get('api_balance')
+        self.assertEqual(payload['total_due'], 120)
+        self.assertEqual([invoice['amount_pending'] for invoice in payload['invoices']], [40, 40, 40])
+
+    def test_fields_can_be_selected(self):
+        self._book(self.student, 1)
+        payload = self._get('api_schedule', fields='topic,date')
+        self.assertEqual(list(payload['results'][0]), ['topic', 'date'])
+        self.assertEqual(list(self._get('api_balance', fields='id')['invoices'][0]), ['id'])
+
+    def test_unknown_fields_are_a_bad_request(self):
+        response = self.client.get(reverse('api_invoices'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', json.loads(response.content)['error'])
+
+    def test_pages_follow_the_cursor(self):
+        self._book(self.student, 5)
+        ids = []
+        payload = self._get('api_invoices', page_size=2, fields='invoice_number')
+        ids += [invoice['invoice_number'] for invoice in payload['results']]
+        while payload['next']:
+            payload = self._get('api_invoices', page_size=2, fields='invoice_number', cursor=payload['next'])
+            ids += [invoice['invoice_number'] for invoice in payload['results']]
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    def test_queries_do_not_grow_with_rows(self):
+        self._book(self.student, 1)
+        with CaptureQueriesContext(connection) as few:
+            self._get('api_invoices')
+        self._book(self.other_student, 1)
+        Invoice.objects.filter(student=self.student).delete()
+        self._book(self.student, 10)
+        with CaptureQueriesContext(connection) as many:
+            self._get('api_invoices')
+        self.assertEqual(len(few), len(many))
+
+    def test_answers_are_gzipped_when_accepted(self):
+        self._book(self.student, 10)
+        response = self.client.get(reverse('api_schedule'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 10)
+
+    def test_unchanged_answers_are_not_modified(self):
+        response = self.client.get(reverse('api_invoices'))
+        not_modified = self.client.get(reverse('api_invoices'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_not_logged_in_is_unauthorized(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_schedule')).status_code, 401)
+
+    def test_admins_are_forbidden(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('api_balance')).status_code, 403)
@@ -1,7 +1,7 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
-from lessons.models import Student, Admin, Lesson, Invoice
+from lessons.models import Student, Admin, Lesson, Invoice, Transfer
 
 class BalanceView(TestCase):
     """Tests of the balance view."""
@@ -80,4 +80,12 @@ class BalanceView(TestCase):
         response = self.client.get(self.url)
         self.assertContains(response, 'you owe nothing, for now...')
 
-
+    def test_partly_paid_invoices_of_other_students_are_not_shown(self):
+        for student, invoice_number in [(self.student, 1), (self.other_student, 1), (self.other_student, 2)]:
+            invoice = Invoice.objects.create(student=student, date=timezone.now(), invoice_number=invoice_number)
+            Lesson.objects.create(student=student, invoice=invoice, date=timezone.now(), duration=60)
+            Transfer.objects.create(date_received=timezone.now(), transfer_id=invoice.id, amount_received=20, verifier=self.admin, invoice=invoice)
+        self.client.login(username=self.student.email, password='Password123')
+        response = self.client.get(self.url)
+        self.assertEqual([invoice['unique_reference_number'] for invoice in response.context['invoices']], [f'{self.student.id}-1'])
+        self.assertEqual(response.context['total_due'], 40)
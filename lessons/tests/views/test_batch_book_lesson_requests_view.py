@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.urls import reverse
+from lessons.booking import generate_lesson_dates
+from lessons.forms import BatchBookLessonRequestsForm
+from lessons.models import Student, Lesson, LessonRequest, Admin, Term, Invoice
+import datetime
+from django.utils import timezone
+
+class BatchBookLessonRequestsViewTestCase(TestCase):
+    """Tests for the batch book lesson requests view"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json',
+                'lessons/tests/fixtures/other_students.json',
+                'lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+
+        self.first_request = self._create_request(self.student, lessonNum=2)
+        # Booked at the same time as the first request, so the student would be double booked
+        self.second_request = self._create_request(self.student, lessonNum=3, teacher="Ms Cat")
+        self.other_request = self._create_request(self.other_student, lessonNum=1, teacher="Ms Ann")
+
+        # Term starts 3 months from now and lasts 12 weeks so the tests never become outdated
+        tdelta = datetime.timedelta(weeks=12)
+        self.term = Term.objects.create(
+            name='Summer Term',
+            start_date=timezone.now() + tdelta,
+            end_date=timezone.now() + tdelta * 2,
+        )
+
+        self.form_input = {
+            "lesson_requests": [self.first_request.id, self.other_request.id],
+            "term": self.term.name,
+            "day": "Tuesday",
+            "time": "15:30",
+        }
+        self.url = reverse('batch_book_lesson_requests')
+
+    def _create_request(self, author, lessonNum, interval=1, teacher="Mr Bob"):
+        return LessonRequest.objects.create(
+            author=author,
+            availability="Tuesday",
+            lessonNum=lessonNum,
+            interval=interval,
+            duration=45,
+            topic="Piano",
+            teacher=teacher
+        )
+
+    def test_batch_book_url(self):
+        self.assertEqual(self.url, '/admin/requests/book/')
+
+    def test_not_admin_get_request(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.url, follow=True)
+        self.assertRedirects(response, reverse("student_home"), status_code=302, target_status_code=200)
+
+    def test_get_batch_book(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'batch_book_lesson_requests.html')
+        form = response.context['form']
+        self.assertTrue(isinstance(form, BatchBookLessonRequestsForm))
+        self.assertEqual(form.fields['term'].initial, self.term)
+
+    def test_successful_batch_book(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['booked']), 2)
+        self.assertEqual(response.context['failed'], {})
+        self.assertEqual(list(LessonRequest.objects.all()), [self.second_request])
+        self.assertEqual(Lesson.objects.count(), 3)
+        self.assertEqual(list(Invoice.objects.filter(student=self.student).values_list('invoice_number', flat=True)), [1])
+        for invoice in Invoice.objects.all():
+            self.assertEqual(invoice.price, sum(lesson.price for lesson in invoice.lessons))
+        for lesson in Lesson.objects.all():
+            self.assertEqual(lesson.date.weekday(), 1)
+            self.assertEqual((lesson.date.hour, lesson.date.minute), (15, 30))
+            self.assertTrue(self.term.start_date <= lesson.date <= self.term.end_date)
+
+    def test_batch_book_reports_requests_clashing_with_each_other(self):
+        self.form_input['lesson_requests'] = [self.first_request.id, self.second_request.id, self.other_request.id]
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(set(response.context['booked']), {self.first_request.id, self.other_request.id})
+        self.assertEqual(list(response.context['failed']), [self.second_request.id])
+        self.assertIn('The student is booked by an earlier request', response.context['failed'][self.second_request.id])
+        self.assertEqual(Lesson.objects.count(), 3)
+
+    def test_batch_book_reports_requests_clashing_with_booked_lessons(self):
+        first_date = generate_lesson_dates(self.term.start_date, datetime.time(15, 30), "Tuesday", 1, 1)[0]
+        invoice = Invoice.objects.create(student=self.student, date=timezone.now(), invoice_number=50)
+        Lesson.objects.create(student=self.student, invoice=invoice, date=first_date, duration=30, topic="Drums", teacher="Mr Bob")
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(list(response.context['booked']), [self.other_request.id])
+        self.assertIn('Mr Bob already has a lesson from 15:30 to 16:00', response.context['failed'][self.first_request.id])
+        self.assertTrue(LessonRequest.objects.filter(id=self.first_request.id).exists())
+
+    def test_batch_book_reports_requests_that_do_not_fit(self):
+        too_many = self._create_request(self.other_student, lessonNum=20)
+        no_teacher = self._create_request(self.other_student, lessonNum=1, teacher="")
+        self.form_input['lesson_requests'] = [self.first_request.id, too_many.id, no_teacher.id]
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(list(response.context['booked']), [self.first_request.id])
+        self.assertEqual(set(response.context['failed']), {too_many.id, no_teacher.id})
+        self.assertTrue(LessonRequest.objects.filter(id=too_many.id).exists())
+        self.assertTrue(LessonRequest.objects.filter(id=no_teacher.id).exists())
+        self.assertEqual(Lesson.objects.count(), 2)
+
+    def test_unsuccessful_batch_book_with_invalid_day(self):
+        self.form_input['day'] = "Someday"
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, self.form_input)
+        self.assertTrue(response.context['form'].is_bound)
+        self.assertEqual(LessonRequest.objects.count(), 3)
+        self.assertEqual(Lesson.objects.count(), 0)
@@ -1,7 +1,9 @@
+from unittest import mock
+from django.db import DatabaseError
 from django.test import TestCase
 from django.urls import reverse
 from lessons.forms import BookLessonRequestForm
-from lessons.models import Student,Lesson,LessonRequest, Admin, Term
+from lessons.models import Student,Lesson,LessonRequest, Admin, Term, Invoice
 import datetime
 from django.utils import timezone
 
@@ -118,3 +120,19 @@ class BookLessonRequestViewTestCase(TestCase):
 
 
 
+
+    def test_successful_book_lesson_post_deletes_request_and_prices_invoice(self):
+        self.client.force_login(self.admin)
+        self.client.post(self.url, self.book_request_form_input)
+        self.assertFalse(LessonRequest.objects.filter(id=self.lesson_request.id).exists())
+        invoice = Invoice.objects.get(student=self.student)
+        self.assertEqual(invoice.price, 60 * self.number_of_lessons_to_generate)
+
+    def test_failed_booking_leaves_nothing_behind(self):
+        self.client.force_login(self.admin)
+        with mock.patch.object(Lesson.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(self.url, self.book_request_form_input)
+        self.assertEqual(Invoice.objects.count(), 0)
+        self.assertEqual(Lesson.objects.count(), 0)
+        self.assertTrue(LessonRequest.objects.filter(id=self.lesson_request.id).exists())
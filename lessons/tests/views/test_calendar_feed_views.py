@@ -0,0 +1,101 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from lessons.calendar_feeds import _fold, feed_cache, feed_path, feed_token
+from lessons.fragment_cache import fragment_cache
+from lessons.models import Student, Invoice, Lesson
+
+class CalendarFeedViewsTestCase(TestCase):
+    """Tests for the iCalendar feeds of students and teachers"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    def setUp(self):
+        feed_cache().clear()
+        fragment_cache().clear()
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.invoice = Invoice.objects.get(invoice_number=100)
+        self.lesson = self._lesson(self.student, "Drums, advanced", "Mr Jim")
+        self.url = feed_path('student', self.student.id)
+
+    def _lesson(self, student, topic, teacher):
+        invoice = self.invoice if student == self.student else Invoice.objects.get_or_create(invoice_number=1, student=student, defaults={'date': timezone.now()})[0]
+        return Lesson.objects.create(student=student, invoice=invoice, duration=45, topic=topic, teacher=teacher,
+                                     date=timezone.datetime(2030, 1, 7, 16, 0, tzinfo=timezone.utc))
+
+    def _feed(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        return b''.join(response.streaming_content if response.streaming else [response.content]).decode()
+
+    def test_feed_urls(self):
+        self.assertEqual(self.url, f'/calendar/student/{self.student.id}/{feed_token("student", self.student.id)}.ics')
+        self.assertEqual(feed_path('teacher', 'Mr Jim'), f'/calendar/teacher/Mr%20Jim/{feed_token("teacher", "Mr Jim")}.ics')
+
+    def test_student_feed_lists_their_lessons(self):
+        self._lesson(self.other_student, "Piano", "Mr Jim")
+        feed = self._feed(self.url)
+        self.assertTrue(feed.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(feed.endswith('END:VCALENDAR\r\n'))
+        self.assertIn(f'UID:lesson-{self.lesson.id}@msms\r\n', feed)
+        self.assertIn('DTSTART:20300107T160000Z\r\nDTEND:20300107T164500Z\r\n', feed)
+        self.assertIn('SUMMARY:Drums\\, advanced\r\n', feed)
+        self.assertNotIn('Piano', feed)
+
+    def test_teacher_feed_lists_the_lessons_they_teach(self):
+        self._lesson(self.other_student, "Piano", "Mr Jim")
+        self._lesson(self.other_student, "Violin", "Ms Ann")
+        feed = self._feed(feed_path('teacher', 'Mr Jim'))
+        self.assertEqual(feed.count('BEGIN:VEVENT'), 2)
+        self.assertNotIn('Violin', feed)
+
+    def test_wrong_token_is_not_found(self):
+        wrong_url = reverse('student_calendar_feed', args=[self.student.id, feed_token('student', self.other_student.id)])
+        self.assertEqual(self.client.get(wrong_url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('teacher_calendar_feed', args=['Mr Jim', 'guess'])).status_code, 404)
+
+    def test_feed_is_cached_until_its_lessons_change(self):
+        first = self._feed(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._feed(self.url), first)
+        self.assertEqual(len(queries), 0)
+        self.lesson.topic = "Guitar"
+        self.lesson.save()
+        self.assertIn('SUMMARY:Guitar', self._feed(self.url))
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get(self.url)
+        b''.join(response.streaming_content)
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self._lesson(self.student, "Guitar", "Mr Jim")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_long_lines_are_folded(self):
+        folded = _fold('DESCRIPTION:' + 'é' * 80)
+        lines = folded.split('\r\n')[:-1]
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertEqual(''.join(line[1:] if index else line for index, line in enumerate(lines)), 'DESCRIPTION:' + 'é' * 80)
+
+    def test_schedule_page_links_the_feed(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('show_schedule'))
+        self.assertContains(response, self.url)
+
+    def test_teacher_feed_is_not_changed_by_logging_in(self):
+        url = feed_path('teacher', 'Mr Jim')
+        response = self.client.get(url)
+        b''.join(response.streaming_content)
+        self.client.force_login(self.other_student)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.other_student.first_name = "Janet"
+        self.other_student.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from lessons.conditional import TIME_DEPENDENT_PERIOD
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+from unittest import mock
+
+class ConditionalPagesTestCase(TestCase):
+    """Tests for the ETag and Last-Modified of the pages students and guardians poll"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/other_students.json',
+        'lessons/tests/fixtures/admin_user.json',
+        'lessons/tests/fixtures/default_invoice.json',
+    ]
+
+    PAGES = ['show_schedule', 'balance', 'show_invoices', 'student_transfers']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.invoice = Invoice.objects.get(invoice_number=100)
+        self.client.force_login(self.student)
+
+    def _revalidate(self, name, response):
+        return self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_pages_have_validators_and_are_private(self):
+        for name in self.PAGES:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+            self.assertIn('Last-Modified', response)
+            self.assertIn('private', response['Cache-Control'])
+            self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_unchanged_pages_are_not_modified_without_running_the_view(self):
+        for name in self.PAGES:
+            response = self.client.get(reverse(name))
+            with CaptureQueriesContext(connection) as revalidation:
+                not_modified = self._revalidate(name, response)
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b'')
+            # Only the session and the user are loaded
+            self.assertEqual(len(revalidation), 2)
+
+    def test_pages_change_when_the_student_gets_a_lesson(self):
+        responses = {name: self.client.get(reverse(name)) for name in self.PAGES}
+        Lesson.objects.create(student=self.student, invoice=self.invoice, duration=60, date=timezone.now() + timezone.timedelta(days=7))
+        for name, response in responses.items():
+            self.assertEqual(self._revalidate(name, response).status_code, 200)
+
+    def test_pages_change_when_the_student_pays(self):
+        response = self.client.get(reverse('student_transfers'))
+        Transfer.objects.create(transfer_id=1, amount_received=10, verifier=self.admin, invoice=self.invoice)
+        self.assertEqual(self._revalidate('student_transfers', response).status_code, 200)
+
+    def test_pages_do_not_change_when_another_student_does(self):
+        response = self.client.get(reverse('balance'))
+        invoice = Invoice.objects.create(date=timezone.now(), invoice_number=200, student=self.other_student)
+        Lesson.objects.create(student=self.other_student, invoice=invoice, duration=60, date=timezone.now())
+        self.assertEqual(self._revalidate('balance', response).status_code, 304)
+
+    def test_pages_change_when_the_student_is_saved(self):
+        response = self.client.get(reverse('balance'))
+        self.student.refresh_from_db()
+        self.student.first_name = "Johnny"
+        self.student.save()
+        self.assertEqual(self._revalidate('balance', response).status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(reverse('show_invoices'))
+        not_modified = self.client.get(reverse('show_invoices'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        modified = self.client.get(reverse('show_invoices'), HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(modified.status_code, 200)
+
+    def test_schedule_changes_as_lessons_pass(self):
+        response = self.client.get(reverse('show_schedule'))
+        later = timezone.now() + TIME_DEPENDENT_PERIOD
+        with mock.patch('lessons.conditional.timezone.now', return_value=later):
+            self.assertEqual(self._revalidate('show_schedule', response).status_code, 200)
+        self.assertEqual(self._revalidate('show_invoices', self.client.get(reverse('show_invoices'))).status_code, 304)
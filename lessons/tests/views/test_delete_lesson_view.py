@@ -46,6 +46,12 @@ class DeleteLessonViewTestCase(TestCase):
         self.assertEqual(after, before-1)
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, redirect_url, status_code=302, target_status_code=200)
+
+    def test_delete_lesson_updates_invoice_price(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(Invoice.objects.get(invoice_number=100).price, 1)
+        self.client.get(self.url)
+        self.assertEqual(Invoice.objects.get(invoice_number=100).price, 0)
     
     def test_delete_invalid_lesson(self):
         self.client.force_login(self.admin)
@@ -82,6 +82,12 @@ class EditLessonViewTestCase(TestCase):
         self.assertEqual(self.lesson.duration, 65)
         self.assertEqual(self.lesson.topic, "Piano")
         self.assertEqual(self.lesson.teacher, "Mr Bob")
+
+    def test_successful_lesson_edit_updates_invoice_price(self):
+        self.client.force_login(self.admin)
+        self.form_input['duration'] = 65
+        self.client.post(self.url, self.form_input)
+        self.assertEqual(Invoice.objects.get(invoice_number=100).price, 65)
     
     def test_unsuccessful_lesson_edit(self):
         self.client.force_login(self.admin)
@@ -0,0 +1,93 @@
+from django.test import TestCase
+from django.urls import reverse
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer, Term
+import csv
+import datetime
+import json
+import pytz
+
+class ExportViewTestCase(TestCase):
+    """Tests for the admin-only streaming export view"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        for count in range(1, 4):
+            date = datetime.datetime(2022, 10, count * 10, 12, tzinfo=pytz.UTC)
+            invoice = Invoice.objects.create(date=date, invoice_number=count, student=self.student)
+            Lesson.objects.create(student=self.student, invoice=invoice, duration=60, date=date, topic='Piano', teacher='Mr Keys')
+            Transfer.objects.create(date_received=date, transfer_id=count, amount_received=count * 20, verifier=self.admin, invoice=invoice)
+        Term.objects.create(
+            name='Autumn',
+            start_date=datetime.datetime(2022, 10, 15, tzinfo=pytz.UTC),
+            end_date=datetime.datetime(2022, 10, 25, tzinfo=pytz.UTC),
+        )
+
+    def _export(self, kind, **filters):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=[kind]), filters)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_request_url(self):
+        self.assertEqual(reverse('export', args=['transfers']), '/admin/export/transfers')
+
+    def test_transfers_are_exported_as_csv(self):
+        rows = list(csv.DictReader(self._export('transfers').splitlines()))
+        self.assertEqual([row['transfer_id'] for row in rows], ['1', '2', '3'])
+        self.assertEqual(rows[0]['amount_received'], '20')
+        self.assertEqual(rows[0]['invoice_price'], '60')
+        self.assertEqual(rows[0]['invoice_paid'], '20')
+        self.assertEqual(rows[0]['student_id'], str(self.student.id))
+
+    def test_invoices_are_exported_with_their_totals_as_ndjson(self):
+        rows = [json.loads(line) for line in self._export('invoices', format='ndjson').splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]['reference_number'], f'{self.student.id}-2')
+        self.assertEqual(rows[1]['lesson_count'], 1)
+        self.assertEqual(rows[1]['transfer_count'], 1)
+        self.assertEqual(rows[1]['amount_pending'], 20)
+
+    def test_lessons_are_filtered_by_date_range(self):
+        rows = list(csv.DictReader(self._export('lessons', start='2022-10-20', end='2022-10-30').splitlines()))
+        self.assertEqual([row['date'] for row in rows], ['2022-10-20T12:00:00+00:00', '2022-10-30T12:00:00+00:00'])
+        self.assertEqual(rows[0]['lesson_price'], '60')
+
+    def test_formulas_are_exported_as_text_in_csv_only(self):
+        Lesson.objects.filter(topic='Piano').update(topic='=HYPERLINK("http://example.org")', teacher='@Mr Keys')
+        rows = list(csv.DictReader(self._export('lessons').splitlines()))
+        self.assertEqual(rows[0]['topic'], '\'=HYPERLINK("http://example.org")')
+        self.assertEqual(rows[0]['teacher'], "'@Mr Keys")
+        rows = [json.loads(line) for line in self._export('lessons', format='ndjson').splitlines()]
+        self.assertEqual(rows[0]['topic'], '=HYPERLINK("http://example.org")')
+
+    def test_transfers_are_filtered_by_term(self):
+        rows = list(csv.DictReader(self._export('transfers', term='Autumn').splitlines()))
+        self.assertEqual([row['transfer_id'] for row in rows], ['2'])
+
+    def test_export_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['invoices']))
+        with self.assertNumQueries(1):
+            b''.join(response.streaming_content)
+
+    def test_unknown_kind_is_not_found(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['students']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_filters_are_a_bad_request(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('export', args=['lessons']), {'start': '2022-10-30', 'end': '2022-10-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_students_cannot_export(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('export', args=['transfers']))
+        self.assertNotEqual(response.status_code, 200)
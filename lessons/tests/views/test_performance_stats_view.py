@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from lessons.instrumentation import recorder, reset_stats, percentile
+from lessons.models import Student, Admin
+from lessons.reporting import REPORTING_DATABASE, refresh_snapshot
+from unittest import mock
+import os
+import tempfile
+
+TEST_CACHES = {
+    **settings.CACHES,
+    'performance': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'performance-tests'},
+}
+
+@override_settings(PERFORMANCE_INSTRUMENTATION=True, PERFORMANCE_QUERY_BUDGET=30, CACHES=TEST_CACHES)
+class PerformanceStatsViewTestCase(TestCase):
+    """Tests for the performance instrumentation middleware and the admin-only performance stats view"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json',
+                'lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        self.url = reverse('performance_stats')
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        reset_stats()
+
+    def tearDown(self):
+        reset_stats()
+
+    def test_request_url(self):
+        self.assertEqual(self.url, '/admin/performance/')
+
+    def test_get_request_as_admin(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'performance_stats.html')
+
+    def test_get_request_as_student(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.url, follow=True)
+        self.assertRedirects(response, reverse('student_home'), status_code=302, target_status_code=200)
+
+    def test_response_has_server_timing_header(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('balance'))
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.force_login(self.student)
+        self.client.get(reverse('balance'))
+        self.client.get(reverse('balance'))
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        stats = response.context['stats']
+        self.assertEqual(stats['balance']['requests'], 2)
+        self.assertGreater(stats['balance']['queries']['p50'], 0)
+        self.assertContains(response, 'balance')
+
+    @override_settings(PERFORMANCE_QUERY_BUDGET=0)
+    def test_requests_over_the_query_budget_are_logged(self):
+        self.client.force_login(self.student)
+        with self.assertLogs('lessons.instrumentation', level='WARNING') as logs:
+            self.client.get(reverse('balance'))
+        self.assertIn('balance ran', logs.output[0])
+        self.assertEqual(recorder.snapshot()['balance']['over_budget'], 1)
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_nothing_is_recorded_when_turned_off(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('balance'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(recorder.snapshot(), {})
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+@override_settings(PERFORMANCE_INSTRUMENTATION=True, CACHES=TEST_CACHES)
+class ReportingPerformanceTestCase(TransactionTestCase):
+    """Tests for the instrumentation of reports reading from the reporting snapshot
+    The snapshot is copied outside any transaction, so these tests commit"""
+
+    databases = {'default', REPORTING_DATABASE}
+    fixtures = ['lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.dict(connections[REPORTING_DATABASE].settings_dict, {'NAME': os.path.join(directory.name, 'reporting.sqlite3')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connections[REPORTING_DATABASE].close)
+        refresh_snapshot()
+        reset_stats()
+        self.addCleanup(reset_stats)
+        self.client.force_login(Admin.objects.get(email="student_admin@example.org"))
+
+    def test_queries_of_reports_read_from_the_snapshot_are_counted(self):
+        with CaptureQueriesContext(connections[REPORTING_DATABASE]) as on_snapshot:
+            response = self.client.get(reverse('admin_transfers'))
+        self.assertGreater(len(on_snapshot), 0)
+        with override_settings(REPORTING_FORCE_PRIMARY=True):
+            self.client.get(reverse('admin_transfers'))
+        snapshot_sample, primary_sample = recorder.snapshot()['admin_transfers']['samples']
+        self.assertEqual(snapshot_sample[1], primary_sample[1])
+        self.assertIn(f'"{primary_sample[1]} queries"', response['Server-Timing'])
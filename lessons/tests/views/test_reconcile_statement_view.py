@@ -0,0 +1,55 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+
+class ReconcileStatementViewTestCase(TestCase):
+    """Tests for the admin-only bank statement upload view"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    def setUp(self):
+        self.url = reverse('reconcile_statement')
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        invoice = Invoice.objects.create(date=timezone.now(), invoice_number=1, student=self.student)
+        Lesson.objects.create(student=self.student, invoice=invoice, duration=60, date=timezone.now())
+
+    def _upload(self, content):
+        self.client.force_login(self.admin)
+        return self.client.post(self.url, {'statement': SimpleUploadedFile('statement.csv', content.encode(), content_type='text/csv')})
+
+    def test_request_url(self):
+        self.assertEqual(self.url, '/admin/payments/reconcile')
+
+    def test_get_shows_upload_form(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'reconcile_statement.html')
+        self.assertIsNone(response.context['report'])
+
+    def test_upload_creates_transfers_and_shows_report(self):
+        response = self._upload(
+            '\ufeffdate,reference,amount\r\n'
+            f'2022-10-10,{self.student.id}-1,70\r\n'
+            f'2022-10-10,{self.student.id}-7,70\r\n'
+        )
+        self.assertEqual(Transfer.objects.count(), 1)
+        report = response.context['report']
+        self.assertEqual(report.summary()['transfers_created'], 1)
+        self.assertContains(response, 'Overpaid')
+        self.assertContains(response, 'No invoice has this reference')
+
+    def test_statement_without_the_expected_columns_is_a_form_error(self):
+        response = self._upload('when,what\r\n2022-10-10,60\r\n')
+        self.assertEqual(Transfer.objects.count(), 0)
+        self.assertTrue(response.context['form'].errors['statement'])
+
+    def test_students_cannot_reconcile(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.url, follow=True)
+        self.assertTemplateNotUsed(response, 'reconcile_statement.html')
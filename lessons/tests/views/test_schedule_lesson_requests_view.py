@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from lessons.models import Admin, Lesson, LessonRequest, Student, Term
+import datetime
+
+class ScheduleLessonRequestsViewTestCase(TestCase):
+    """Tests for the view scheduling every open lesson request"""
+
+    fixtures = ['lessons/tests/fixtures/default_student.json',
+                'lessons/tests/fixtures/other_students.json',
+                'lessons/tests/fixtures/admin_user.json']
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.other_student = Student.objects.get(email="janedoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        for author in (self.student, self.other_student):
+            LessonRequest.objects.create(author=author, availability="Tuesday", lessonNum=3, interval=1,
+                                         duration=45, topic="Piano", teacher="Mr Bob")
+        tdelta = datetime.timedelta(weeks=12)
+        self.term = Term.objects.create(name='Summer Term', start_date=timezone.now() + tdelta, end_date=timezone.now() + tdelta * 2)
+        self.url = reverse('schedule_lesson_requests')
+
+    def test_schedule_url(self):
+        self.assertEqual(self.url, '/admin/requests/schedule/')
+
+    def test_not_admin_is_redirected(self):
+        self.client.force_login(self.student)
+        response = self.client.get(self.url, follow=True)
+        self.assertRedirects(response, reverse("student_home"), status_code=302, target_status_code=200)
+
+    def test_get_schedule(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'schedule_lesson_requests.html')
+        self.assertContains(response, 'Each of the 2 open lesson requests')
+        self.assertEqual(LessonRequest.objects.count(), 2)
+
+    def test_post_schedules_every_request(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LessonRequest.objects.count(), 0)
+        self.assertEqual(Lesson.objects.count(), 6)
+        self.assertEqual(Lesson.objects.values('date').distinct().count(), 6)
+        self.assertContains(response, 'Scheduled 2 lesson requests into Summer Term')
+        self.assertContains(response, '3 lessons with Mr Bob on Tuesdays')
+
+    def test_without_a_term_nothing_is_scheduled(self):
+        self.term.delete()
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url)
+        self.assertContains(response, 'There is no upcoming term')
+        self.assertEqual(LessonRequest.objects.count(), 2)
@@ -1,6 +1,12 @@
+import datetime
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from lessons.conditional import TIME_DEPENDENT_PERIOD
 from lessons.models import Student, Admin, Lesson, Invoice
+from unittest import mock
 
 class ShowScheduleTestCase(TestCase):
     """Tests for the show schedule view"""
@@ -44,4 +50,30 @@ class ShowScheduleTestCase(TestCase):
         self.client.force_login(self.admin)
         redirect_url = reverse("admin_home")
         response = self.client.get(self.url, follow=True)
-        self.assertRedirects(response, redirect_url, status_code=302, target_status_code=200)
\ No newline at end of file
+        self.assertRedirects(response, redirect_url, status_code=302, target_status_code=200)
+
+    def test_schedule_is_cached_until_the_student_has_a_new_lesson(self):
+        self.client.force_login(self.student)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as first_render:
+            self.client.get(self.url)
+        Lesson.objects.create(
+            student=self.student, invoice=Invoice.objects.get(invoice_number=100),
+            date=timezone.now() + datetime.timedelta(days=7), duration=1, topic="Guitar", teacher="Mr Jim",
+        )
+        with CaptureQueriesContext(connection) as second_render:
+            response = self.client.get(self.url)
+        self.assertContains(response, "Guitar")
+        self.assertLess(len(first_render), len(second_render))
+
+    def test_cached_schedule_drops_lessons_as_they_pass(self):
+        self.client.force_login(self.student)
+        lesson = Lesson.objects.create(
+            student=self.student, invoice=Invoice.objects.get(invoice_number=100),
+            date=timezone.now() + datetime.timedelta(days=7), duration=1, topic="Guitar", teacher="Mr Jim",
+        )
+        self.assertContains(self.client.get(self.url), "Guitar")
+        # Time passing saves nothing, so no version is bumped
+        Lesson.objects.filter(id=lesson.id).update(date=timezone.now() - datetime.timedelta(minutes=1))
+        with mock.patch('lessons.conditional.timezone.now', return_value=timezone.now() + TIME_DEPENDENT_PERIOD):
+            self.assertNotContains(self.client.get(self.url), "Guitar")
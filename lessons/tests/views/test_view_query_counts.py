@@ -0,0 +1,77 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from lessons.models import Student, Admin, Invoice, Lesson, Transfer
+
+class ViewQueryCountsTestCase(TestCase):
+    """Tests pinning the number of queries each list page makes, whatever the number of rows it shows"""
+
+    fixtures = [
+        'lessons/tests/fixtures/default_student.json',
+        'lessons/tests/fixtures/admin_user.json',
+    ]
+
+    # Page names, with any url arguments, and the number of queries each makes
+    STUDENT_PAGES = {
+        ('lesson_list',): 3,
+        ('show_invoices',): 3,
+        # The first balance page works the balance out, the second is served it from the balance cache
+        ('balance',): 6,
+        ('guardian_balance',): 2,
+        ('student_transfers',): 3,
+        ('show_schedule',): 3,
+    }
+    ADMIN_PAGES = {
+        ('admin_lessons',): 3,
+        ('admin_lessons_page',): 3,
+        ('admin_transfers',): 4,
+        ('admin_transfers_page',): 3,
+        ('payments',): 4,
+        ('payment_transfers_page',): 3,
+        # Booking more drops the balance of the student, so it is worked out again
+        ('student_payments', 'student'): 10,
+    }
+
+    def setUp(self):
+        self.student = Student.objects.get(email="johndoe@example.org")
+        self.admin = Admin.objects.get(email="student_admin@example.org")
+        self.booked = 0
+
+    def _book(self, count):
+        """Books count more invoices for the student, each with a lesson next week and a part payment"""
+        for _ in range(count):
+            self.booked += 1
+            invoice = Invoice.objects.create(date=timezone.now(), invoice_number=self.booked, student=self.student)
+            Lesson.objects.create(student=self.student, invoice=invoice, duration=60, date=timezone.now() + timezone.timedelta(days=7))
+            Transfer.objects.create(
+                date_received=timezone.now(), transfer_id=self.booked, amount_received=10,
+                verifier=self.admin, invoice=invoice,
+            )
+
+    def _url(self, page):
+        name, *arguments = page
+        return reverse(name, args=[self.student.id for _ in arguments])
+
+    def _count_queries(self, page):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self._url(page))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def _assert_pinned(self, pages):
+        self._book(1)
+        few = {page: self._count_queries(page) for page in pages}
+        self._book(5)
+        many = {page: self._count_queries(page) for page in pages}
+        self.assertEqual(few, pages)
+        self.assertEqual(many, pages)
+
+    def test_student_pages_make_a_constant_number_of_queries(self):
+        self.client.force_login(self.student)
+        self._assert_pinned(self.STUDENT_PAGES)
+
+    def test_admin_pages_make_a_constant_number_of_queries(self):
+        self.client.force_login(self.admin)
+        self._assert_pinned(self.ADMIN_PAGES)
@@ -1,7 +1,7 @@
 import pytz
 from django.shortcuts import render, redirect
 
-from .forms import LessonRequestForm, StudentSignUpForm, LogInForm, BookLessonRequestForm, EditForm, PasswordForm, UserForm, EditLessonForm, GuardianSignUpForm, GuradianAddStudent, GuradianBookStudent, TermForm, ConfirmTransferForm
+from .forms import LessonRequestForm, StudentSignUpForm, LogInForm, BookLessonRequestForm, EditForm, PasswordForm, UserForm, EditLessonForm, GuardianSignUpForm, GuradianAddStudent, GuradianBookStudent, TermForm, ConfirmTransferForm, BatchBookLessonRequestsForm, ExportForm, StatementUploadForm
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
@@ -9,13 +9,36 @@ from django.contrib.auth.hashers import check_password
 from django.contrib.auth.decorators import login_required
 
 from .models import Admin, LessonRequest, Lesson, Student, User, Invoice, Transfer, GuardianProfile, Guardian, Term
-from .helpers import only_admins, all_students, only_students, only_guardians, get_next_given_day_of_week_after_date_given, find_next_available_invoice_number_for_student, login_prohibited, redirect_user_after_login, find_next_available_transfer_id
-
-from django.core.exceptions import ObjectDoesNotExist
+from .api import api_response, api_view, balance_payload, list_payload
+from .avatars import gravatar_cache_info
+from .balance_cache import balance_cache_stats, get_balance
+from .balances import students_with_outstanding_balance
+from .booking import book_lessons, book_lesson_requests
+from .calendar_feeds import check_feed_token, feed_path, feed_response
+from .conditional import conditional_page, current_period
+from .exports import EXPORTS, EXPORT_FORMATS, stream_export
+from .instrumentation import collected_stats
+from .pagination import keyset_page, keyset_page_from, page_size_from
+from .reconciliation import StatementError, reconcile_statement
+from .reporting import reporting_view
+from .scheduling import schedule_term
+from .helpers import only_admins, all_students, only_students, only_guardians, login_prohibited, redirect_user_after_login, find_next_available_transfer_id, get_next_term
+
+from django.conf import settings
+from django.core.exceptions import BadRequest, ObjectDoesNotExist
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.gzip import gzip_page
 from django.utils import timezone
 from django.db.models import Sum
 
 import datetime
+import io
+
+# Stable orderings the admin lists are paginated on, each ending in a unique field
+LESSON_ORDERING = ['date', 'id']
+REQUEST_ORDERING = ['id']
+TRANSFER_ORDERING = ['-date_received', '-id']
+BALANCE_ORDERING = ['id']
 
 # Create your views here.
 @login_prohibited
@@ -63,7 +86,7 @@ def book_for_student(request):
 @all_students
 def lessons_success(request):
     current_student_id = request.user.id
-    lessons = Lesson.objects.filter(student_id=current_student_id)
+    lessons = Lesson.objects.filter(student_id=current_student_id).with_related()
     return render(request, 'successful_lessons_list.html', {'lessons': lessons})
 
 @login_required
@@ -132,49 +155,66 @@ def book_lesson_request(request, request_id):
     if request.method == 'POST':
         form = BookLessonRequestForm(lesson_request.id,request.POST)
         if form.is_valid():
-            student = student_making_request
-            duration = form.cleaned_data.get('duration')
-            topic = form.cleaned_data.get('topic')
-            teacher = form.cleaned_data.get('teacher')
-            start_date = form.cleaned_data.get('start_date')
-            time = form.cleaned_data.get('time')
-            interval_between_lessons = form.cleaned_data.get('interval_between_lessons')
-            number_of_lessons = form.cleaned_data.get('number_of_lessons')
-            day = form.cleaned_data.get('day')
-
-            #combines the start date picked and the time each day into one dateTime object
-            new_date = datetime.datetime(start_date.year,start_date.month,start_date.day,time.hour,time.minute,tzinfo=pytz.UTC)
-            new_date = get_next_given_day_of_week_after_date_given(new_date,day)
-
-            #generate an invoice for the lessons we will generate
-            new_invoice_number = find_next_available_invoice_number_for_student(student)
-            invoice = Invoice.objects.create(
-                student=student,
-                date=datetime.datetime.now(tz=pytz.UTC),
-                invoice_number=new_invoice_number,
+            book_lessons(
+                student=student_making_request,
+                start_date=form.cleaned_data.get('start_date'),
+                time=form.cleaned_data.get('time'),
+                day=form.cleaned_data.get('day'),
+                interval_between_lessons=form.cleaned_data.get('interval_between_lessons'),
+                number_of_lessons=form.cleaned_data.get('number_of_lessons'),
+                duration=form.cleaned_data.get('duration'),
+                topic=form.cleaned_data.get('topic'),
+                teacher=form.cleaned_data.get('teacher'),
+                lesson_request=lesson_request,
             )
-            invoice.save()
-
-            #we will generate a lesson every lesson interval weeks at the time given
-            tdelta = datetime.timedelta(weeks=interval_between_lessons)
-            for i in range(number_of_lessons):
-                lesson = Lesson.objects.create(
-                    student=student,
-                    invoice=invoice,
-                    date=new_date,
-                    duration=duration,
-                    topic=topic,
-                    teacher=teacher
-                )
-                lesson.save()
-                new_date = new_date + tdelta
-
-            lesson_request.delete()
             return redirect('admin_requests')
     else:
         form = BookLessonRequestForm(lesson_request.id)
     return render(request, 'book_lesson_request.html', {'form': form,'lesson_request':lesson_request,'student':student_making_request})
 
+@login_required
+@only_admins
+def batch_book_lesson_requests(request):
+    """View to allow admins to book many lesson requests into the same term at once"""
+    booked = {}
+    failed = {}
+    if request.method == 'POST':
+        form = BatchBookLessonRequestsForm(request.POST)
+        if form.is_valid():
+            booked, failed = book_lesson_requests(
+                [lesson_request.id for lesson_request in form.cleaned_data.get('lesson_requests')],
+                term=form.cleaned_data.get('term'),
+                day=form.cleaned_data.get('day'),
+                time=form.cleaned_data.get('time'),
+            )
+            messages.add_message(request, messages.SUCCESS, f'Booked {len(booked)} lesson requests')
+            if failed:
+                messages.add_message(request, messages.ERROR, f'{len(failed)} lesson requests could not be booked')
+            form = BatchBookLessonRequestsForm()
+    else:
+        form = BatchBookLessonRequestsForm()
+    return render(request, 'batch_book_lesson_requests.html', {'form': form, 'booked': booked, 'failed': failed})
+
+@login_required
+@only_admins
+def schedule_lesson_requests(request):
+    """View to allow admins to schedule every open lesson request into the next term automatically"""
+    term = get_next_term()
+    placements = []
+    failed = {}
+    if request.method == 'POST' and term is not None:
+        placements, booked, failed = schedule_term(term)
+        placements = [(lesson_request, lesson_dates) for lesson_request, lesson_dates in placements if lesson_request.id in booked]
+        messages.add_message(request, messages.SUCCESS, f'Scheduled {len(booked)} lesson requests into {term.name}')
+        if failed:
+            messages.add_message(request, messages.ERROR, f'{len(failed)} lesson requests could not be scheduled')
+    return render(request, 'schedule_lesson_requests.html', {
+        'term': term,
+        'open_requests': LessonRequest.objects.count(),
+        'placements': placements,
+        'failed': failed,
+    })
+
 @login_required
 @only_students
 def student_home(request):
@@ -244,15 +284,29 @@ def guardian_sign_up(request):
 @login_required
 @only_admins
 def admin_requests(request):
-    lesson_request_data = LessonRequest.objects.all()
+    lesson_request_data = keyset_page_from(request, LessonRequest.objects.all(), REQUEST_ORDERING)
     return render(request, 'admin_request_list.html', {'data': lesson_request_data})
 
+@login_required
+@only_admins
+def admin_requests_page(request):
+    """Next page of the admin requests list, for its load more button"""
+    lesson_request_data = keyset_page_from(request, LessonRequest.objects.all(), REQUEST_ORDERING)
+    return render(request, 'partials/admin_request_page.html', {'data': lesson_request_data})
+
 @login_required
 @only_admins
 def admin_lessons(request):
-    lessons = Lesson.objects.all()
+    lessons = keyset_page_from(request, Lesson.objects.with_related(), LESSON_ORDERING)
     return render(request, 'admin_lesson_list.html', {'lessons': lessons})
 
+@login_required
+@only_admins
+def admin_lessons_page(request):
+    """Next page of the admin lessons list, for its load more button"""
+    lessons = keyset_page_from(request, Lesson.objects.with_related(), LESSON_ORDERING)
+    return render(request, 'partials/admin_lesson_page.html', {'lessons': lessons})
+
 @login_required
 @all_students
 def show_requests(request):
@@ -360,68 +414,37 @@ def delete_lessons(request, lesson_id):
 
 @login_required
 @only_students
+@conditional_page()
 def show_invoices(request):
     current_student = request.user
-    invoices = Invoice.objects.filter(student=current_student)
+    invoices = Invoice.objects.filter(student=current_student).with_totals()
     return render(request, 'invoices_list.html', {'invoices': invoices})
 
 @login_required
 @only_students
+@conditional_page()
 def balance(request):
-    # first we need to get the student
-    current_student_id = request.user.id
-    student = Student.objects.get(id=current_student_id)
-
-    underpaid_invoices = student.underpaid_invoices
-    underpaid_ids = [invoice.invoice_number for invoice in underpaid_invoices]
-    invoices = student.unpaid_invoices
-
-    # total money owed
-    total_due = 0
-    for invoice in invoices:
-        total_due += invoice.price
-
-    invoices = student.unpaid_invoices | Invoice.objects.filter(invoice_number__in=underpaid_ids)
-
-    for underpaid_invoice in underpaid_invoices:
-        total_due += underpaid_invoice.amount_pending
-
-    return render(request, 'balance.html', {'invoices': invoices, 'total_due': total_due})
+    # What the student owes on each invoice, from the balance cache
+    client_balance = get_balance(request.user.id)
+    return render(request, 'balance.html', {'invoices': client_balance['invoices'], 'total_due': client_balance['total_due']})
 
 @login_required
 @all_students
+@conditional_page()
 def guardian_balance(request):
-    # first we need to get the student
-    current_student_id = request.user.id
-
-    # then we retrieve all the lessons they have from the db
-    # invoices = Invoice.objects.filter(student_id=current_student_id)
-    client = Guardian.objects.get(id=current_student_id)
-    invoices = client.unpaid_invoices
-
-    underpaid_invoices = client.underpaid_invoices
-    underpaid_ids = [invoice.invoice_number for invoice in underpaid_invoices]
-
-    # total money owed
-    total = 0
-    for invoice in invoices:
-        total += invoice.price
-
-    invoices = client.unpaid_invoices | Invoice.objects.filter(invoice_number__in=underpaid_ids)
-
-    for underpaid_invoice in underpaid_invoices:
-        total += underpaid_invoice.amount_pending
-
-    return render(request, 'balance.html', {'invoices': invoices, 'total_due':total})
+    # Guardians owe for the lessons booked under their own id
+    client_balance = get_balance(request.user.id)
+    return render(request, 'balance.html', {'invoices': client_balance['invoices'], 'total_due': client_balance['total_due']})
 
 @login_required
 @all_students
+@conditional_page()
 def transfers(request):
     # first we need to get the student
     current_student_id = request.user.id
 
     # then we retrieve all the lessons they have from the db
-    transfers = Transfer.objects.filter(invoice__student_id=current_student_id)
+    transfers = Transfer.objects.filter(invoice__student_id=current_student_id).with_related()
 
     total_paid = 0
     for transfer in transfers:
@@ -431,48 +454,68 @@ def transfers(request):
 
 @login_required
 @only_admins
+@reporting_view
 def admin_transfers(request):
     # then we retrieve all the lessons they have from the db
     # invoices = Invoice.objects.filter(student_id=current_student_id)
-    transfers = Transfer.objects.all()
-    total_revenue = transfers.aggregate(Sum('amount_received'))['amount_received__sum']
+    transfers = keyset_page_from(request, Transfer.objects.with_related(), TRANSFER_ORDERING)
+    total_revenue = Transfer.objects.aggregate(Sum('amount_received'))['amount_received__sum']
 
     return render(request, 'all_transfers.html', {'transfers': transfers, 'total_revenue': total_revenue})
 
+@login_required
+@only_admins
+@reporting_view
+def admin_transfers_page(request):
+    """Next page of the admin transfers list, for its load more button"""
+    transfers = keyset_page_from(request, Transfer.objects.with_related(), TRANSFER_ORDERING)
+    return render(request, 'partials/admin_transfer_rows.html', {'transfers': transfers})
+
 
 @login_required
 @only_admins
+@reporting_view
 def all_student_balances(request):
-    all_students = Student.objects.all()
-    all_transfers = Transfer.objects.all()
+    all_transfers = keyset_page(Transfer.objects.with_related(), TRANSFER_ORDERING, page_size=page_size_from(request))
+    balance_page = keyset_page_from(request, students_with_outstanding_balance().filter(outstanding_balance__gt=0), BALANCE_ORDERING)
     balances = {}
     non_zero_balances = 1
-    for student in all_students:
-        student_invoices = Invoice.objects.filter(student=student)
-        balance = 0
-        for invoice in student_invoices:
-            if(Transfer.objects.filter(invoice=invoice).count() == 0):
-                balance += invoice.price
-        
-        underpaid_invoices = student.underpaid_invoices
+    for student in balance_page:
+        balances[student] = student.outstanding_balance
+        non_zero_balances += 1
 
-        for underpaid_invoice in underpaid_invoices:
-            balance += underpaid_invoices[underpaid_invoice]
+    return render(request, 'admin_payments.html', {'balances': balances, 'balance_page': balance_page, 'transfers': all_transfers, 'non_zero_balances': non_zero_balances})
 
-        if(balance > 0):
-            balances[student] = balance
-            non_zero_balances += 1
+@login_required
+@only_admins
+@reporting_view
+def balances_page(request):
+    """Next page of outstanding balances on the admin payments page, for its load more button"""
+    balance_page = keyset_page_from(request, students_with_outstanding_balance().filter(outstanding_balance__gt=0), BALANCE_ORDERING)
+    balances = {student: student.outstanding_balance for student in balance_page}
+    return render(request, 'partials/balance_cards.html', {'balances': balances, 'balance_page': balance_page})
 
-    return render(request, 'admin_payments.html', {'balances': balances,'transfers': all_transfers, 'non_zero_balances': non_zero_balances})
+@login_required
+@only_admins
+@reporting_view
+def payment_transfers_page(request):
+    """Next page of transactions on the admin payments page, for its load more button"""
+    transfers = keyset_page_from(request, Transfer.objects.with_related(), TRANSFER_ORDERING)
+    return render(request, 'partials/payment_transfer_rows.html', {'transfers': transfers})
 
 @login_required
 @only_admins
 def student_balance(request, student_id):
     student = Student.objects.filter(id=student_id).first()
 
-    transfer_list = student.transfers
-    invoice_list = student.unpaid_invoices
-    underpaid_invoices_and_paid_amount = student.underpaid_invoices
+    client_balance = get_balance(student.id)
+    transfer_list = student.transfers.with_related()
+    # Unpaid and partly paid invoices are fetched together, by the ids in the balance cache
+    owed_invoices = Invoice.objects.filter(id__in=client_balance['unpaid_ids'] + list(client_balance['underpaid'])).with_related()
+    invoice_list = [invoice for invoice in owed_invoices if invoice.id not in client_balance['underpaid']]
+    underpaid_invoices_and_paid_amount = {
+        invoice: client_balance['underpaid'][invoice.id] for invoice in owed_invoices if invoice.id in client_balance['underpaid']
+    }
 
     return render(request, 'admin_student_payments.html', {'invoices': invoice_list, 'underpaid_invoices': underpaid_invoices_and_paid_amount, 'transfers': transfer_list, 'student': student})
 
@@ -481,7 +524,7 @@ def student_balance(request, student_id):
 def approve_transaction(request, student_id, invoice_id):
     try:
         student_paying = Student.objects.get(id=student_id)
-        invoice_being_fulfilled = Invoice.objects.filter(student_id=student_id).get(invoice_number=invoice_id)
+        invoice_being_fulfilled = Invoice.objects.filter(student_id=student_id).with_related().get(invoice_number=invoice_id)
     except ObjectDoesNotExist:
         return redirect('student_payments', student_id=student_id)
 
@@ -507,31 +550,83 @@ def approve_transaction(request, student_id, invoice_id):
     else:
         form = ConfirmTransferForm()
 
-    already_paid = None
-    if student_paying.underpaid_invoices.get(invoice_being_fulfilled):
-        already_paid = student_paying.underpaid_invoices.get(invoice_being_fulfilled)
+    already_paid = get_balance(student_paying.id)['underpaid'].get(invoice_being_fulfilled.id)
     return render(request, 'confirm_transfer.html', {'form': form,'invoice':invoice_being_fulfilled,'student':student_paying, 'already_paid_amount': already_paid})
 
 
+@login_required
+@only_admins
+def reconcile_bank_statement(request):
+    """View to allow admins to pay in every line of a bank statement at once"""
+    report = None
+    if request.method == 'POST':
+        form = StatementUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            statement = io.TextIOWrapper(form.cleaned_data['statement'].file, encoding='utf-8-sig', newline='')
+            try:
+                report = reconcile_statement(statement, request.user)
+            except (StatementError, UnicodeDecodeError) as error:
+                form.add_error('statement', str(error))
+            else:
+                messages.add_message(request, messages.SUCCESS, f'Created {report.transfers_created} transfers for £{report.amount_received}')
+                form = StatementUploadForm()
+    else:
+        form = StatementUploadForm()
+    return render(request, 'reconcile_statement.html', {'form': form, 'report': report})
+
+
 @login_required
 @only_students
 def show_invoice_lessons(request, invoice_id):
     """Shows the lessons associated with a given invoice"""
     try:
-        current_invoice = Invoice.objects.get(id=invoice_id)
+        current_invoice = Invoice.objects.with_related().get(id=invoice_id)
     except ObjectDoesNotExist:
         return redirect('show_invoices')
     else:
-        lessons_to_display = current_invoice.lessons
+        lessons_to_display = Lesson.objects.filter(invoice=current_invoice).with_totals()
         return render(request, 'show_invoice_lessons.html', {'lessons': lessons_to_display, 'invoice':current_invoice})
 
 @login_required
 @all_students
+@conditional_page(time_dependent=True)
 def show_schedule(request):
     current_student_id = request.user.id
     # only shows lessons in the future
-    lessons = Lesson.objects.filter(student_id=current_student_id, date__gte=datetime.datetime.now(tz=datetime.timezone.utc))
-    return render(request, 'lesson_schedule.html', {'lessons': lessons})
+    lessons = Lesson.objects.filter(student_id=current_student_id, date__gte=datetime.datetime.now(tz=datetime.timezone.utc)).with_related()
+    calendar_url = request.build_absolute_uri(feed_path('student', current_student_id))
+    return render(request, 'lesson_schedule.html', {'lessons': lessons, 'calendar_url': calendar_url, 'period': current_period()})
+
+def student_calendar_feed(request, student_id, token):
+    """Lessons of a student as an iCalendar feed, for calendar apps, which poll it with its token instead of logging in"""
+    check_feed_token('student', student_id, token)
+    return feed_response(request, 'student', student_id)
+
+def teacher_calendar_feed(request, teacher, token):
+    """Lessons taught by a teacher as an iCalendar feed"""
+    check_feed_token('teacher', teacher, token)
+    return feed_response(request, 'teacher', teacher)
+
+@gzip_page
+@api_view
+@conditional_page(time_dependent=True)
+def api_schedule(request):
+    """Upcoming lessons of the student as JSON, see lessons/api.py"""
+    return api_response(list_payload(request, 'schedule', request.user.id))
+
+@gzip_page
+@api_view
+@conditional_page()
+def api_invoices(request):
+    """Invoices of the student as JSON"""
+    return api_response(list_payload(request, 'invoices', request.user.id))
+
+@gzip_page
+@api_view
+@conditional_page()
+def api_balance(request):
+    """What the student owes as JSON, from the balance cache"""
+    return api_response(balance_payload(request, get_balance(request.user.id)))
 
 @login_required
 @only_admins
@@ -597,4 +692,33 @@ def edit_terms(request, term_id):
                 term.save()
         else:
             form = TermForm(instance=term)
-        return render(request, 'edit_terms.html', {'form': form, 'term_id': term_id})
\ No newline at end of file
+        return render(request, 'edit_terms.html', {'form': form, 'term_id': term_id})
+
+@login_required
+@only_admins
+def performance_stats(request):
+    """Shows the response time and SQL query percentiles recorded for each page"""
+    return render(request, 'performance_stats.html', {
+        'stats': collected_stats(),
+        'balance_cache': balance_cache_stats(),
+        'gravatar_cache': gravatar_cache_info(),
+        'enabled': settings.PERFORMANCE_INSTRUMENTATION,
+        'query_budget': settings.PERFORMANCE_QUERY_BUDGET,
+    })
+
+@login_required
+@only_admins
+def export(request, kind):
+    """Streams the transfers, invoices or lessons dated in the chosen range as CSV or NDJSON"""
+    if kind not in EXPORTS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        raise BadRequest('Invalid export filters')
+    export_format = form.cleaned_data['format']
+    response = StreamingHttpResponse(
+        stream_export(kind, export_format, form.cleaned_data['start'], form.cleaned_data['end'], form.cleaned_data['term']),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+    return response
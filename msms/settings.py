@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'lessons.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,11 +77,55 @@ WSGI_APPLICATION = 'msms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+def _conn_max_age(value):
+    """Seconds to keep a database connection open for, 'none' to keep it open for good"""
+    return None if value.lower() == 'none' else int(value)
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Persistent connections, turned on by setting MSMS_DB_CONN_MAX_AGE in the environment
+        'CONN_MAX_AGE': _conn_max_age(os.environ.get('MSMS_DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': os.environ.get('MSMS_DB_CONN_HEALTH_CHECKS') == '1',
+    },
+    # Snapshot of the default database that the heavy admin reports read from (see lessons/reporting.py),
+    # refreshed with the refresh_reporting_snapshot command
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'reporting.sqlite3',
+        # Never persistent, refreshing replaces the file and an open connection would keep reading the old one
+        'CONN_MAX_AGE': 0,
+        # Only ever read, so it keeps its rollback journal and refuses writes
+        'PRAGMAS': {
+            'query_only': 1,
+            'cache_size': int(os.environ.get('MSMS_SQLITE_CACHE_SIZE', -64 * 1024)),
+            'mmap_size': int(os.environ.get('MSMS_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            'busy_timeout': int(os.environ.get('MSMS_SQLITE_BUSY_TIMEOUT', 5000)),
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['lessons.reporting.ReportingRouter']
+
+# Reports read from the primary database instead once the snapshot is older than this many seconds,
+# or always when MSMS_REPORTING_FORCE_PRIMARY=1 is set in the environment
+REPORTING_MAX_STALENESS = int(os.environ.get('MSMS_REPORTING_MAX_STALENESS', 60 * 5))
+REPORTING_FORCE_PRIMARY = os.environ.get('MSMS_REPORTING_FORCE_PRIMARY') == '1'
+
+# Pragmas set on every new SQLite connection, unless its database has its own PRAGMAS (see lessons/database.py)
+# A write-ahead log lets readers carry on while a booking or payment is written,
+# and with it synchronous=NORMAL is safe from corruption, only waiting for the disk at checkpoints
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Negative sizes are in KiB, so 64 MiB of page cache
+    'cache_size': int(os.environ.get('MSMS_SQLITE_CACHE_SIZE', -64 * 1024)),
+    'mmap_size': int(os.environ.get('MSMS_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Milliseconds a connection waits for a lock before giving up
+    'busy_timeout': int(os.environ.get('MSMS_SQLITE_BUSY_TIMEOUT', 5000)),
 }
 
 
@@ -148,4 +193,94 @@ MESSAGE_TAGS = {
 
 AUTHENTICATION_BACKENDS = [
     'lessons.backends.EmailLogin',
-]
\ No newline at end of file
+]
+
+# Per-view timing and SQL query instrumentation (see lessons/instrumentation.py)
+# Turned on by setting MSMS_PERFORMANCE_INSTRUMENTATION=1 in the environment
+PERFORMANCE_INSTRUMENTATION = os.environ.get('MSMS_PERFORMANCE_INSTRUMENTATION') == '1'
+# Requests running more SQL queries than this are logged as warnings
+PERFORMANCE_QUERY_BUDGET = int(os.environ.get('MSMS_PERFORMANCE_QUERY_BUDGET', 30))
+# Number of latest requests per URL name that percentiles are worked out from
+PERFORMANCE_STATS_WINDOW = 1000
+# Each process copies its samples into this cache every PERFORMANCE_STATS_FLUSH_SECONDS,
+# where they stay for PERFORMANCE_STATS_TIMEOUT seconds after the process stops flushing
+PERFORMANCE_STATS_CACHE = 'performance'
+PERFORMANCE_STATS_FLUSH_SECONDS = 10
+PERFORMANCE_STATS_TIMEOUT = 60 * 60
+
+# Balance of each student (see lessons/balance_cache.py), dropped whenever their lessons, invoices or transfers change
+BALANCE_CACHE = 'balances'
+BALANCE_CACHE_TIMEOUT = 60 * 5
+
+# Version of the school terms (see lessons/terms.py), so every process reloads them when one changes
+# Point this at a cache shared by every process when running several
+TERM_CALENDAR_CACHE = 'default'
+
+# Rendered fragments of the list templates (see lessons/fragment_cache.py), and the versions of the data they show
+# 0 seconds turns caching off
+FRAGMENT_CACHE = 'fragments'
+FRAGMENT_CACHE_TIMEOUT = 60 * 10
+
+# Whole iCalendar feeds, cached under the versions of their lessons (see lessons/calendar_feeds.py)
+CALENDAR_FEED_CACHE = 'calendar_feeds'
+CALENDAR_FEED_CACHE_TIMEOUT = 60 * 60
+
+# Number of students the balance, fragment and calendar feed caches are sized for,
+# so the data seeded by seed --scale fits in them without their entries evicting each other
+CACHED_STUDENTS = int(os.environ.get('MSMS_CACHED_STUDENTS', 10000))
+
+# Number of Gravatar URLs each process keeps (see lessons/avatars.py)
+GRAVATAR_CACHE_SIZE = 4096
+
+# Seconds each process reuses the lessons of a term for finding clashes (see lessons/occupancy.py)
+# before reloading them, to catch up with lessons booked by other processes
+OCCUPANCY_INDEX_MAX_AGE = 60
+
+# The in-memory caches are local to each process: with several processes each one fills its own,
+# versions bumped in one are not seen by the others, and balance_cache_stats counts the hits of one process only.
+# Point the BALANCE_CACHE, TERM_CALENDAR_CACHE, FRAGMENT_CACHE and CALENDAR_FEED_CACHE settings
+# at a cache shared by every process, such as Redis or Memcached, when running several
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # A balance for every student and guardian, and the hit and miss counts
+    'balances': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'balances',
+        'OPTIONS': {'MAX_ENTRIES': CACHED_STUDENTS * 2},
+    },
+    # Every student's schedule, invoice list, invoice and request cards, and the versions of their data
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': CACHED_STUDENTS * 20},
+    },
+    # A feed for every student and teacher
+    'calendar_feeds': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'calendar_feeds',
+        'OPTIONS': {'MAX_ENTRIES': CACHED_STUDENTS * 2},
+    },
+    # Shared by every process, so the stats page and command see all of them
+    'performance': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'performance',
+    },
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'lessons.instrumentation': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
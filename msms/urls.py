@@ -32,16 +32,26 @@ urlpatterns = [
     path('admin/home/', views.admin_home, name='admin_home'),
     path('admin/book_lesson_request/<int:request_id>', views.book_lesson_request, name='book_lesson_request'),
     path('admin/requests/', views.admin_requests, name='admin_requests'),
+    path('admin/requests/page/', views.admin_requests_page, name='admin_requests_page'),
+    path('admin/requests/book/', views.batch_book_lesson_requests, name='batch_book_lesson_requests'),
+    path('admin/requests/schedule/', views.schedule_lesson_requests, name='schedule_lesson_requests'),
     path('admin/lessons/', views.admin_lessons, name='admin_lessons'),
+    path('admin/lessons/page/', views.admin_lessons_page, name='admin_lessons_page'),
     path('admin/lessons/edit/<lesson_id>', views.edit_lessons, name='edit_lessons'),
     path('admin/payments', views.all_student_balances, name='payments'),
+    path('admin/payments/balances', views.balances_page, name='balances_page'),
+    path('admin/payments/transfers', views.payment_transfers_page, name='payment_transfers_page'),
     path('admin/all_transfers', views.admin_transfers, name='admin_transfers'),
+    path('admin/all_transfers/page', views.admin_transfers_page, name='admin_transfers_page'),
+    path('admin/payments/reconcile', views.reconcile_bank_statement, name='reconcile_statement'),
     path('admin/payments/<int:student_id>', views.student_balance, name='student_payments'),
     path('admin/payments/<int:student_id>/<int:invoice_id>', views.approve_transaction, name='approve_transaction'),
     path('admin/lessons/delete/<lesson_id>', views.delete_lessons, name='delete_lessons'),
     path('admin/terms', views.admin_terms, name='admin_terms'),
     path('admin/terms/delete/<term_id>', views.delete_terms, name='delete_terms'),
     path('admin/terms/edit/<term_id>', views.edit_terms, name='edit_terms'),
+    path('admin/performance/', views.performance_stats, name='performance_stats'),
+    path('admin/export/<str:kind>', views.export, name='export'),
 
     # Student paths
     path('student/lesson_request/', views.lesson_request, name='lesson_request'),
@@ -56,6 +66,15 @@ urlpatterns = [
     path('student/transfers/', views.transfers, name='student_transfers'),
     path('student/schedule/', views.show_schedule, name='show_schedule'),
 
+    # Read-only JSON API of the student pages
+    path('api/schedule/', views.api_schedule, name='api_schedule'),
+    path('api/invoices/', views.api_invoices, name='api_invoices'),
+    path('api/balance/', views.api_balance, name='api_balance'),
+
+    # iCalendar feeds, authenticated by the token in the URL
+    path('calendar/student/<int:student_id>/<str:token>.ics', views.student_calendar_feed, name='student_calendar_feed'),
+    path('calendar/teacher/<str:teacher>/<str:token>.ics', views.teacher_calendar_feed, name='teacher_calendar_feed'),
+
     # Guardian paths
     path('guardian_sign_up/', views.guardian_sign_up, name='guardian_sign_up'),
     path('guardian/home/', views.guardian_home, name='guardian_home'),
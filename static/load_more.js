@@ -0,0 +1,24 @@
+// Replaces a "load more" button with the next page of its list,
+// which brings its own button along when there are more pages after it
+document.addEventListener('click', function (event) {
+  const button = event.target.closest('[data-load-more]');
+  if (!button) {
+    return;
+  }
+  button.disabled = true;
+  fetch(button.dataset.loadMore, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      const placeholder = button.closest('.load-more');
+      placeholder.insertAdjacentHTML('afterend', html);
+      placeholder.remove();
+    })
+    .catch(function () {
+      button.disabled = false;
+    });
+});